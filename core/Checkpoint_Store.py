@@ -0,0 +1,183 @@
+from collections.abc import MutableMapping
+
+import numpy as np
+
+from core.RNN import RNN
+
+
+class Checkpoint_Store(MutableMapping):
+    """Compact storage for the checkpoints of a Simulation.
+
+    Behaves like the dict of checkpoints indexed by time step i_t that
+    Simulation keeps by default, but instead of a deep copy of the RNN, each
+    checkpoint keeps only the network parameters [W_rec, W_in, b_rec, W_out,
+    b_out] and state (h, a). Each parameter is stored in one contiguous array
+    stacked across checkpoints, optionally in a smaller dtype and/or as
+    differences from the previous checkpoint. The functions and constants
+    shared by all checkpoints (activation, output, loss, alpha, reset_sigma)
+    are stored once.
+
+    Accessing store[i_t] returns a new dict with an RNN rebuilt from the
+    stored values under 'rnn', alongside any other entries of the checkpoint
+    (e.g. 'i_t', 'learn_alg', 'optimizer'), which are stored as given.
+    Modifying that dict does not modify the store; assign it back to
+    store[i_t] instead.
+
+    With delta encoding, every keyframe_interval-th stored checkpoint holds
+    full parameter values, and the others hold the difference from the
+    previous one, computed from the decoded previous values so that rounding
+    errors do not accumulate. Overwriting or deleting a checkpoint leaves its
+    stored values in place, so that later differences stay valid.
+
+    Attributes:
+        dtype (numpy dtype or None): Dtype in which parameters are stored. If
+            None, parameters are stored in their own dtype.
+        delta (bool): Whether parameters are delta encoded.
+        keyframe_interval (int): Number of stored checkpoints between full
+            copies of the parameters, if delta encoded.
+        rows (dict): Maps each i_t to its row in the stacked arrays, or to
+            None if the checkpoint has no RNN.
+        params (list): Stacked arrays of shape (capacity, *shape) for each
+            parameter, of which the first n_rows are filled.
+        states (list): The (h, a) state of the network for each row.
+        extras (dict): Maps each i_t to the other entries of its checkpoint.
+        rnn_kwargs (dict): Arguments shared by all rebuilt RNNs."""
+
+    param_names = ['W_rec', 'W_in', 'b_rec', 'W_out', 'b_out']
+
+    def __init__(self, dtype=None, delta=False, keyframe_interval=100,
+                 capacity=16):
+        """Inits an empty Checkpoint_Store.
+
+        Args:
+            dtype (numpy dtype): Dtype in which to store parameters, e.g.
+                np.float32 to halve their size. Default is the parameters' own
+                dtype.
+            delta (bool): If True, stores differences between consecutive
+                checkpoints, which compress better when saved.
+            keyframe_interval (int): Number of stored checkpoints between full
+                copies of the parameters if delta is True, bounding the
+                number of differences summed to decode a checkpoint.
+            capacity (int): Number of checkpoints the arrays are initially
+                sized for. Capacity doubles as needed."""
+
+        self.dtype = dtype
+        self.delta = delta
+        self.keyframe_interval = keyframe_interval
+        self.capacity = capacity
+
+        self.rows = {}
+        self.extras = {}
+        self.params = None
+        self.param_dtypes = None
+        self.states = []
+        self.n_rows = 0
+        self.rnn_kwargs = None
+        self.last_params = None
+
+    def __setitem__(self, i_t, checkpoint):
+
+        checkpoint = dict(checkpoint)
+        rnn = checkpoint.pop('rnn', None)
+        if rnn is None:
+            self.rows[i_t] = None
+        else:
+            self.rows[i_t] = self.store_rnn(rnn)
+        self.extras[i_t] = checkpoint
+
+    def __getitem__(self, i_t):
+
+        row = self.rows[i_t]
+        checkpoint = dict(self.extras[i_t])
+        if row is not None:
+            checkpoint['rnn'] = self.get_rnn(row)
+
+        return checkpoint
+
+    def __delitem__(self, i_t):
+
+        del self.rows[i_t]
+        del self.extras[i_t]
+
+    def __iter__(self):
+
+        return iter(self.rows)
+
+    def __len__(self):
+
+        return len(self.rows)
+
+    def store_rnn(self, rnn):
+        """Appends the parameters and state of rnn as a new row and returns
+        its index."""
+
+        params = [getattr(rnn, name) for name in self.param_names]
+        if self.params is None:
+            self.param_dtypes = [p.dtype for p in params]
+            self.params = [np.zeros((self.capacity,) + p.shape,
+                                    dtype=self.dtype or p.dtype)
+                           for p in params]
+            self.rnn_kwargs = {'activation': rnn.activation,
+                               'alpha': rnn.alpha,
+                               'output': rnn.output,
+                               'loss': rnn.loss,
+                               'reset_sigma': rnn.reset_sigma,
+                               'dtype': rnn.dtype}
+        if self.n_rows == self.params[0].shape[0]:  # Double capacity
+            self.params = [np.concatenate([p, np.zeros((max(len(p), 1),) +
+                                                       p.shape[1:], p.dtype)])
+                           for p in self.params]
+
+        row = self.n_rows
+        keyframe = not self.delta or row % self.keyframe_interval == 0
+        for i_param, param in enumerate(params):
+            if keyframe:
+                self.params[i_param][row] = param
+            else:
+                self.params[i_param][row] = param - self.last_params[i_param]
+        self.n_rows += 1
+
+        # Decoded values, which differences of the next row are taken from
+        if self.delta:
+            if keyframe:
+                self.last_params = [p[row].astype(d) for p, d in
+                                    zip(self.params, self.param_dtypes)]
+            else:
+                self.last_params = [l + p[row].astype(d) for l, p, d in
+                                    zip(self.last_params, self.params,
+                                        self.param_dtypes)]
+
+        self.states.append((np.copy(rnn.h), np.copy(rnn.a)))
+
+        return row
+
+    def get_params(self, row):
+        """Decodes the list of parameters stored in row."""
+
+        if not self.delta:
+            return [p[row].astype(d) for p, d in
+                    zip(self.params, self.param_dtypes)]
+
+        keyframe = row - row % self.keyframe_interval
+        return [p[keyframe:row + 1].astype(d).sum(axis=0) if row > keyframe
+                else p[row].astype(d)
+                for p, d in zip(self.params, self.param_dtypes)]
+
+    def get_rnn(self, row):
+        """Rebuilds the RNN stored in row."""
+
+        W_rec, W_in, b_rec, W_out, b_out = self.get_params(row)
+        rnn = RNN(W_in, W_rec, W_out, b_rec, b_out, **self.rnn_kwargs)
+        h, a = self.states[row]
+        rnn.reset_network(h=np.copy(h), a=np.copy(a))
+
+        return rnn
+
+    def __getstate__(self):
+        """Drops the unfilled rows of the stacked arrays when pickling."""
+
+        state = self.__dict__.copy()
+        if self.params is not None:
+            state['params'] = [p[:self.n_rows] for p in self.params]
+
+        return state
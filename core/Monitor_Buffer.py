@@ -0,0 +1,302 @@
+import re
+from copy import deepcopy
+
+import numpy as np
+
+from utils import temporary_memmap
+
+
+def parse_monitor_key(key):
+    """Splits a monitor key into the address of the monitored attribute and
+    its recording policy.
+
+    Policies are appended to the address after an '@', e.g. 'rnn.a@every10'
+    records every 10th value, 'rnn.loss_@mean100' records means over windows
+    of 100 values, 'rnn.loss_@welford100' records mean and variance over
+    windows of 100 values, and 'rnn.loss_@welford' records mean and variance
+    over the whole run.
+
+    Returns:
+        attr (str): Address of the monitored attribute.
+        policy (str or None): One of None, 'every', 'mean' or 'welford'.
+        k (int or None): Stride or window size of the policy, if any."""
+
+    if '@' not in key:
+        return key, None, None
+
+    attr, policy_str = key.split('@')
+    match = re.fullmatch(r'(every|mean|welford)(\d*)', policy_str)
+    if match is None:
+        raise ValueError('Unknown monitor policy: ' + policy_str)
+    policy, k = match.group(1), match.group(2)
+    if k == '':
+        if policy != 'welford':
+            raise ValueError('Monitor policy {} requires a number, e.g. '
+                             '{}100'.format(policy, policy))
+        k = None
+    else:
+        k = int(k)
+
+    return attr, policy, k
+
+
+class Monitor_Buffer:
+    """Storage for the values of one monitor over the course of a run.
+
+    Values are written into an array preallocated from the number of time
+    steps in the run and the shape and dtype of the first value observed, so
+    that no per-step Python objects accumulate. A recording policy (see
+    parse_monitor_key) may decimate or reduce the values as they arrive, so
+    that raw values are never stored:
+
+    'every', k: Stores values at steps 0, k, 2k, ...
+    'mean', k: Stores the mean of each complete window of k values.
+    'welford', k: Stores the mean and variance of each complete window of k
+        values, stacked along axis 1, i.e. shape (n_windows, 2, *value_shape).
+    'welford', None: Stores the mean and variance over the whole run,
+        stacked along axis 0, i.e. shape (2, *value_shape).
+
+    Mean and variance are accumulated with Welford's algorithm.
+
+    Optionally, large buffers are backed by an np.memmap file so that long
+    traces spill to disk rather than exhausting memory. Values whose shapes
+    change over the run (or that are not numeric) fall back to being stored in
+    a list, as monitors were originally.
+
+    Attributes:
+        capacity (int): Number of values the buffer is initially sized for.
+        policy (str or None): Recording policy, one of None, 'every', 'mean'
+            or 'welford'.
+        k (int or None): Stride or window size of the policy.
+        memmap_dir (str or None): Directory in which to create a memory-mapped
+            file backing the buffer, if its size exceeds memmap_min_bytes.
+        memmap_min_bytes (int): Minimum size in bytes of a buffer for it to
+            be memory mapped.
+        n (int): Number of values stored so far.
+        data (numpy array or None): Preallocated array of shape
+            (capacity, *value_shape), the first n entries of which are filled.
+        values (list or None): Fallback storage if values are irregular."""
+
+    def __init__(self, capacity, policy=None, k=None, memmap_dir=None,
+                 memmap_min_bytes=0, name='monitor'):
+        """Inits a Monitor_Buffer by specifying its expected number of values
+        and whether it may be memory mapped.
+
+        Args:
+            capacity (int): Expected number of raw values, typically the number
+                of time steps in the run.
+            policy (str): Recording policy, see class docstring.
+            k (int): Stride or window size for the policy.
+            memmap_dir (str): Directory for memory-mapped files. If None, the
+                buffer is always held in memory.
+            memmap_min_bytes (int): Buffers smaller than this many bytes are
+                held in memory even if memmap_dir is given.
+            name (str): Prefix for the name of the memory-mapped file."""
+
+        self.policy = policy
+        self.k = k
+        if policy == 'every':
+            capacity = -(-capacity // k)
+        elif policy in ['mean', 'welford'] and k is not None:
+            capacity = capacity // k
+        elif policy == 'welford':
+            capacity = 1
+        self.capacity = max(capacity, 1)
+        self.memmap_dir = memmap_dir
+        self.memmap_min_bytes = memmap_min_bytes
+        self.name = name
+        self.n = 0
+        self.data = None
+        self.values = None
+
+        # Policy state
+        self.i_step = 0
+        self.count = 0
+        self.mean = 0
+        self.M2 = 0
+
+    def wants_value(self):
+        """Returns whether the next value would be used, so that computing it
+        can be skipped otherwise."""
+
+        return self.policy != 'every' or self.i_step % self.k == 0
+
+    def skip(self):
+        """Advances by one step without a value."""
+
+        self.i_step += 1
+
+    def append(self, value):
+        """Passes one more value through the recording policy."""
+
+        i_step = self.i_step
+        self.i_step += 1
+
+        if self.policy is None:
+            self.store(value)
+        elif self.policy == 'every':
+            if i_step % self.k == 0:
+                self.store(value)
+        elif self.policy == 'mean':
+            self.count += 1
+            self.mean = self.mean + value
+            if self.count == self.k:
+                self.store(self.mean / self.k)
+                self.count, self.mean = 0, 0
+        elif self.policy == 'welford':
+            self.count += 1
+            delta = value - self.mean
+            self.mean = self.mean + delta / self.count
+            self.M2 = self.M2 + delta * (value - self.mean)
+            if self.count == self.k:
+                self.store(np.stack([self.mean, self.M2 / self.count]))
+                self.count, self.mean, self.M2 = 0, 0, 0
+
+    def store(self, value):
+        """Stores one value in the buffer. Irregular values are copied into
+        the fallback list, since monitored attributes may be views of buffers
+        that are reused (e.g. rnn.params or grads_list)."""
+
+        if self.values is None:
+            try:
+                array = np.asarray(value)
+            except ValueError:  # Ragged, e.g. arrays of different shapes
+                array = None
+            if self.data is None:
+                if array is None or array.dtype == object:
+                    self.values = []
+            elif array is None or array.shape != self.data.shape[1:]:
+                self.values = list(self.data[:self.n])
+                self.data = None
+
+        if self.values is not None:
+            self.values.append(deepcopy(value))
+            return
+
+        value = array
+        if self.data is None:
+            self.data = self.allocate(self.capacity, value.shape, value.dtype)
+        elif not np.can_cast(value.dtype, self.data.dtype, 'same_kind'):
+            self.data = self.data.astype(np.result_type(self.data, value))
+
+        if self.n == self.data.shape[0]:
+            self.grow()
+        self.data[self.n] = value
+        self.n += 1
+
+    def extend(self, values):
+        """Passes a whole array of values, stacked along the first axis,
+        through the recording policy, vectorized if the buffer is fresh."""
+
+        values = np.asarray(values)
+        if self.i_step > 0 or values.dtype == object:
+            for value in values:
+                self.append(value)
+            return
+
+        n_values = values.shape[0]
+        self.i_step = n_values
+        if self.policy == 'every':
+            self.store_all(values[::self.k])
+            return
+        if self.policy == 'welford' and self.k is None:
+            self.count = n_values
+            self.mean = values.mean(axis=0)
+            self.M2 = np.square(values - self.mean).sum(axis=0)
+            return
+        if self.policy in ['mean', 'welford']:
+            n_windows = n_values // self.k
+            windows = values[:n_windows * self.k]
+            windows = windows.reshape((n_windows, self.k) + values.shape[1:])
+            if self.policy == 'mean':
+                self.store_all(windows.mean(axis=1))
+            else:
+                self.store_all(np.stack([windows.mean(axis=1),
+                                         windows.var(axis=1)], axis=1))
+            self.i_step = n_windows * self.k
+            for value in values[n_windows * self.k:]:
+                self.append(value)
+            return
+
+        self.store_all(values)
+
+    def store_all(self, values):
+        """Stores a whole array of values at once. If the buffer is empty and
+        held in memory, the array is adopted without copying."""
+
+        n_values = values.shape[0]
+
+        if (self.values is None and self.data is None and
+                values.dtype != object):
+            if (self.memmap_dir is None or
+                    values.nbytes < self.memmap_min_bytes):
+                self.data = values
+            else:
+                self.data = self.allocate(max(self.capacity, n_values),
+                                          values.shape[1:], values.dtype)
+                self.data[:n_values] = values
+            self.n = n_values
+        elif (self.values is None and self.data is not None and
+              values.shape[1:] == self.data.shape[1:]):
+            while self.n + n_values > self.data.shape[0]:
+                self.grow()
+            self.data[self.n:self.n + n_values] = values
+            self.n += n_values
+        else:
+            for value in values:
+                self.store(value)
+
+    def allocate(self, capacity, shape, dtype):
+        """Creates an empty array for capacity values of given shape and
+        dtype, memory mapped if it is large enough."""
+
+        shape = (capacity,) + tuple(shape)
+        nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        if self.memmap_dir is not None and nbytes >= self.memmap_min_bytes:
+            return temporary_memmap(shape, dtype, dir=self.memmap_dir,
+                                    prefix=self.name + '_')
+        else:
+            return np.empty(shape, dtype=dtype)
+
+    def grow(self):
+        """Doubles the capacity of the buffer if more values than expected
+        arrive."""
+
+        data = self.allocate(2 * self.data.shape[0], self.data.shape[1:],
+                             self.data.dtype)
+        data[:self.n] = self.data[:self.n]
+        self.data = data
+
+    def array(self):
+        """Returns the stored values as an array of shape (n, *value_shape),
+        or as a list if they could not be stacked. For a whole-run 'welford'
+        policy, returns the stacked mean and variance of all values."""
+
+        if self.policy == 'welford' and self.k is None:
+            if self.count == 0:
+                return np.array([])
+            return np.stack([self.mean, self.M2 / self.count])
+
+        if self.values is not None:
+            try:
+                return np.array(self.values)
+            except ValueError:
+                return self.values
+        if self.data is None:
+            return np.array([])
+
+        return self.data[:self.n]
+
+    def __len__(self):
+
+        if self.values is not None:
+            return len(self.values)
+
+        return self.n
+
+    def __getitem__(self, index):
+
+        if self.values is not None:
+            return self.values[index]
+
+        return self.array()[index]
@@ -0,0 +1,268 @@
+import numpy as np
+
+from core.RNN import RNN
+
+
+class Population(RNN):
+    """A population of K independent vanilla RNNs of identical dimensions,
+    functions and alpha, simulated together.
+
+    The parameters of the members are stacked along a leading population
+    axis, e.g. W_rec has shape (K, n_h, n_h), and so is the state, e.g. a has
+    shape (K, n_h). Each time step advances all members with one batched
+    matrix product, so that K small networks cost roughly the Python overhead
+    of one. Inputs x of shape (n_in) are shared by all members, or may be
+    given per member with shape (K, n_in).
+
+    Unlike the batch axis of RNN, which runs several streams through one
+    set of parameters, each member here has its own parameters, and learning
+    algorithms and optimizers keep separate learning variables per member
+    (see learning_algorithms.Population_Learning_Algorithm).
+
+    Attributes:
+        n_members (int): Number of networks K in the population.
+        n_in, n_h, n_out (int): Dimensions of each member.
+        member_shape (tuple): (K,), the leading axes of all parameters.
+        params (list): Stacked parameters [W_rec, W_in, b_rec, W_out, b_out],
+            each with a leading axis of size K, as views into theta, which
+            holds the parameters of all members with the layout of RNN.theta
+            and a leading axis of size K on each block.
+        shapes (list): The stacked shape of each parameter.
+        n_params, n_h_params (int): Number of parameters of each member.
+
+    Other attributes are as for RNN, with a leading axis of size K. The
+    network speed methods of RNN are not supported."""
+
+    def __init__(self, rnns, dtype=None):
+        """Initializes a Population by stacking the parameters and states of
+        a list of RNNs, which are left unchanged.
+
+        Args:
+            rnns (list): Instances of RNN with identical dimensions, whose
+                activation, alpha, output, loss and reset_sigma are taken from
+                the first one.
+            dtype (numpy dtype): Dtype of the population, default that of the
+                first RNN."""
+
+        if len(rnns) == 0:
+            raise ValueError('A Population requires at least one RNN.')
+        rnn = rnns[0]
+        for other in rnns[1:]:
+            if other.shapes != rnn.shapes:
+                raise ValueError('All members of a Population must have the '
+                                 'same parameter shapes.')
+
+        self.n_members = len(rnns)
+        if dtype is None:
+            dtype = rnn.dtype
+        self.dtype = np.dtype(dtype)
+
+        # Dimensions and number of parameters of each member
+        self.member_shape = (self.n_members,)
+        self.n_in = rnn.n_in
+        self.n_h = rnn.n_h
+        self.n_out = rnn.n_out
+        self.n_h_params = rnn.n_h_params
+        self.n_params = rnn.n_params
+        self.L2_indices = [0, 1, 3]
+
+        # Stacked parameter values, copied into theta
+        self.cache = {}
+        self.init_params([np.stack([r_.params[i] for r_ in rnns])
+                          for i in range(len(rnn.params))])
+
+        # Functions and constants shared by all members
+        self.alpha = rnn.alpha
+        self.activation = rnn.activation
+        self.output = rnn.output
+        self.loss = rnn.loss
+        self.reset_sigma = rnn.reset_sigma
+
+        self.reset_network(h=np.stack([r.h for r in rnns]),
+                           a=np.stack([r.a for r in rnns]))
+
+    def reset_network(self, sigma=1, batch_size=None, **kwargs):
+        """Resets the hidden state of every member, either randomly or by
+        specifying with kwargs.
+
+        Args:
+            sigma (float): Standard deviation of (zero-mean) Gaussian random
+                reset of pre-activations h. Used if neither h or a is
+                specified.
+            batch_size (None): Batches of streams are not supported.
+            h (numpy array): The specification of the pre-activation values,
+                of shape (K, n_h), or (n_h) to be copied to all members.
+            a (numpy array): The specification of the post-activation values,
+                of shape (K, n_h) or (n_h), otherwise determined by h."""
+
+        if batch_size is not None:
+            raise ValueError('Population does not support batched states.')
+        shape = (self.n_members, self.n_h)
+
+        if 'h' in kwargs.keys():
+            self.h = np.asarray(kwargs['h'], dtype=self.dtype)
+        else:
+            self.h = np.random.normal(0, sigma, shape).astype(self.dtype,
+                                                              copy=False)
+        self.h = np.broadcast_to(self.h, shape).copy()
+
+        self.a = self.activation.f(self.h)
+        if 'a' in kwargs.keys():
+            self.a = np.asarray(kwargs['a'], dtype=self.dtype)
+            self.a = np.broadcast_to(self.a, shape).copy()
+
+        self.z = self.matvec(self.W_out, self.a) + self.b_out
+        self.clear_cache()
+
+    @staticmethod
+    def matvec(W, v):
+        """Multiplies each member's matrix W[k] by its vector v[k], for W of
+        shape (K, n, m) and v of shape (K, m), or v of shape (m) shared by all
+        members."""
+
+        if np.ndim(v) == 1:
+            return W.dot(v)
+
+        return np.matmul(W, v[..., np.newaxis])[..., 0]
+
+    def next_state(self, x, a=None, update=True, sigma=0):
+        """Advances every member forward by one time step.
+
+        Args:
+            x (numpy array): Input of shape (n_in), shared by all members, or
+                of shape (K, n_in).
+            update (bool): Specifies whether to update the population using
+                its current state (if True) or return the would-be next state
+                using a provided "current" state a.
+            a (numpy array): Array of shape (K, n_h) of recurrent inputs, to
+                be provided only if update is False.
+            sigma (float): Standard deviation of white noise added to the
+                activations.
+
+        Returns:
+            Updates self.x, self.h, self.a, and self.*_prev, or returns the
+            would-be update from given previous state a."""
+
+        x = np.asarray(x, dtype=self.dtype)
+
+        if update:
+            self.clear_cache()
+            self.x = x
+            self.h_prev = np.copy(self.h)
+            self.a_prev = np.copy(self.a)
+
+            self.h = (self.matvec(self.W_rec, self.a) +
+                      self.matvec(self.W_in, self.x) + self.b_rec)
+            if sigma > 0:
+                self.noise = sigma * np.random.normal(0, self.alpha,
+                                                      self.h.shape)
+                self.noise = self.noise.astype(self.dtype, copy=False)
+            else:
+                self.noise = 0
+            phi = self.activation.f(self.h)
+            self.cache['phi'] = ((self.h,), phi)
+            self.a = ((1 - self.alpha) * self.a + self.alpha * phi +
+                      self.noise)
+            self.a = self.a.astype(self.dtype, copy=False)
+        else:
+            h = (self.matvec(self.W_rec, a) + self.matvec(self.W_in, x) +
+                 self.b_rec)
+            ret = (1 - self.alpha) * a + self.alpha * self.activation.f(h)
+            if sigma > 0:
+                noise = np.random.normal(0, sigma, ret.shape)
+                ret += noise.astype(ret.dtype, copy=False)
+            return ret
+
+    def z_out(self):
+        """Update outputs using current state of the population."""
+
+        self.z_prev = np.copy(self.z)
+        self.z = self.matvec(self.W_out, self.a) + self.b_out
+
+    def get_a_hat(self):
+        """Returns a_hat = [a_prev, x, 1] of shape (K, m) at the current time
+        step, with shared inputs copied to every member."""
+
+        def compute():
+            shape = (self.n_members, self.n_in)
+            return np.concatenate([self.a_prev,
+                                   np.broadcast_to(self.x, shape),
+                                   np.ones((self.n_members, 1),
+                                           dtype=self.a_prev.dtype)], axis=1)
+
+        return self.get_cached('a_hat', (self.a_prev, self.x), compute)
+
+    def get_a_jacobian(self, update=True, out=None, **kwargs):
+        """Calculates the Jacobian of every member, of shape (K, n_h, n_h).
+        Arguments are as for RNN.get_a_jacobian, with a leading population
+        axis on all arrays."""
+
+        if update and 'h' not in kwargs and 'W_rec' not in kwargs:
+            self.a_J = self.get_cached('a_J', (self.h, self.W_rec),
+                                       lambda: self.get_a_jacobian(
+                                           update=False, out=out, h=self.h,
+                                           W_rec=self.W_rec))
+            return
+
+        D, W_rec = self.get_jacobian_factors(kwargs.get('h'), None,
+                                             kwargs.get('W_rec'))
+        a_J = np.multiply(W_rec, D[:, :, np.newaxis], out=out)
+        diagonal = np.arange(self.n_h)
+        a_J[:, diagonal, diagonal] += (1 - self.alpha)
+
+        if update:
+            self.a_J = a_J
+        else:
+            return a_J
+
+    def jvp(self, v, h=None, phi_prime=None, W_rec=None):
+        """Computes each member's Jacobian-vector product J[k] v[k] without
+        forming J, for v of shape (K, n_h), or (K, n_h, c) in which case each
+        column is multiplied by J[k]."""
+
+        D, W_rec = self.get_jacobian_factors(h, phi_prime, W_rec)
+        if np.ndim(v) == 2:
+            return D * self.matvec(W_rec, v) + (1 - self.alpha) * v
+
+        return D[:, :, np.newaxis] * np.matmul(W_rec, v) + (1 - self.alpha) * v
+
+    def vjp(self, v, h=None, phi_prime=None, W_rec=None):
+        """Computes each member's vector-Jacobian product v[k] J[k] without
+        forming J, for v of shape (K, n_h), or (K, c, n_h) in which case each
+        row is multiplied by J[k]."""
+
+        D, W_rec = self.get_jacobian_factors(h, phi_prime, W_rec)
+        if np.ndim(v) == 2:
+            return (np.matmul((v * D)[:, np.newaxis, :], W_rec)[:, 0] +
+                    (1 - self.alpha) * v)
+
+        return (np.matmul(v * D[:, np.newaxis, :], W_rec) +
+                (1 - self.alpha) * v)
+
+    def get_member(self, k):
+        """Returns a new RNN with the current parameters and state of member
+        k."""
+
+        rnn = RNN(self.W_in[k].copy(), self.W_rec[k].copy(),
+                  self.W_out[k].copy(), self.b_rec[k].copy(),
+                  self.b_out[k].copy(), activation=self.activation,
+                  alpha=self.alpha, output=self.output, loss=self.loss,
+                  reset_sigma=self.reset_sigma, dtype=self.dtype)
+        rnn.reset_network(h=self.h[k].copy(), a=self.a[k].copy())
+
+        return rnn
+
+    def get_network_speed(self, a=None):
+
+        raise NotImplementedError('Network speed is not supported for a '
+                                  'Population; use get_member.')
+
+    def get_network_speed_gradient(self, a=None):
+
+        raise NotImplementedError('Network speed is not supported for a '
+                                  'Population; use get_member.')
+
+    def get_network_speed_gradient_wrt_weights(self, a=None):
+
+        raise NotImplementedError('Network speed is not supported for a '
+                                  'Population; use get_member.')
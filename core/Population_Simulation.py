@@ -0,0 +1,61 @@
+from copy import deepcopy
+
+from core.Simulation import Simulation
+
+
+class Population_Simulation(Simulation):
+    """Simulates a core.Population of K networks on the same data, training
+    each member independently.
+
+    Runs exactly like Simulation, except that every network variable carries
+    a leading population axis of size K, e.g. monitors of 'rnn.loss_' have
+    shape (T, K). Training requires a population-aware learning algorithm
+    (see learning_algorithms.Population_Learning_Algorithm). Optimizers act
+    elementwise on the stacked parameters, so that their state (e.g. the
+    moments of Adam) is kept per member, but gradient clipping, normalization
+    and projections, which would mix members, are not supported. Batched data
+    and comparison algorithms are not supported either."""
+
+    def run(self, data, mode='train', monitors=[], **kwargs):
+        """Runs the population forward as many time steps as given by data.
+        Arguments are as for Simulation.run, where inputs of shape (T, n_in)
+        are shared by all members."""
+
+        if data[mode]['X'].ndim != 2:
+            raise ValueError('Population_Simulation does not support batched '
+                             'data (of shape (T, B, n_in)).')
+        if len(kwargs.get('comp_algs', [])) > 0:
+            raise ValueError('Population_Simulation does not support '
+                             'comparison algorithms.')
+        optimizer = kwargs.get('optimizer')
+        if optimizer is not None:
+            for attr in ['clip_norm', 'normalize',
+                         'rec_proj_mats', 'out_proj_mats']:
+                if getattr(optimizer, attr, None) is not None:
+                    raise ValueError('Optimizer option {} is not supported '
+                                     'for populations.'.format(attr))
+
+        super().run(data, mode=mode, monitors=monitors, **kwargs)
+
+    def match_state_to_batch(self):
+        """The population axis of the state is kept as is."""
+
+        pass
+
+    def fast_test_supported(self):
+        """Test runs always use the time loop."""
+
+        return False
+
+    def get_test_sim(self):
+        """Creates a Population_Simulation with a copy of the current
+        population, omitting monitors or other large attributes."""
+
+        sim = Population_Simulation(
+            deepcopy(self.rnn),
+            time_steps_per_trial=self.time_steps_per_trial,
+            trial_mask=self.trial_mask,
+            reset_sigma=self.reset_sigma,
+            i_job=self.i_job,
+            save_dir=self.save_dir)
+        return sim
@@ -0,0 +1,90 @@
+from contextlib import nullcontext
+from time import perf_counter
+
+
+class Phase:
+    """Context manager accumulating the wall time and number of calls of one
+    phase of a simulation.
+
+    Attributes:
+        time (float): Total wall time spent in the phase, in seconds.
+        calls (int): Number of times the phase was entered."""
+
+    __slots__ = ('time', 'calls', 't_start')
+
+    def __init__(self):
+
+        self.time = 0.
+        self.calls = 0
+
+    def __enter__(self):
+
+        self.t_start = perf_counter()
+
+    def __exit__(self, *exc_info):
+
+        self.time += perf_counter() - self.t_start
+        self.calls += 1
+
+
+class Profiler:
+    """Times named phases of a simulation, e.g.
+
+        with profiler('forward_pass'):
+            sim.forward_pass(x, y)
+
+    Each phase name accumulates its own wall time and call count. Phases may
+    be nested, in which case the time of the inner phase is also counted in
+    the outer one; by convention, the inner name then extends the outer one
+    after a '/', e.g. 'compare_algorithms/RTRL'.
+
+    A disabled profiler returns a shared no-op context for every phase, so
+    that timing code may be left in place at negligible cost.
+
+    Attributes:
+        enabled (bool): Whether phases are timed.
+        phases (dict): The Phase of each name timed so far."""
+
+    null_phase = nullcontext()
+
+    def __init__(self, enabled=True):
+        """Inits a Profiler.
+
+        Args:
+            enabled (bool): Whether phases are timed. Default is True."""
+
+        self.enabled = enabled
+        self.phases = {}
+
+    def __call__(self, name):
+        """Returns the context manager timing the phase of given name."""
+
+        if not self.enabled:
+            return self.null_phase
+
+        phase = self.phases.get(name)
+        if phase is None:
+            phase = self.phases[name] = Phase()
+
+        return phase
+
+    def get_totals(self):
+        """Returns a dict with the total wall time (in seconds) and number of
+        calls of each phase, as a dict with keys 'time' and 'calls', in the
+        order in which the phases were first entered."""
+
+        return {name: {'time': phase.time, 'calls': phase.calls}
+                for name, phase in self.phases.items()}
+
+    def summary(self):
+        """Returns a table of the total and mean wall time of each phase, one
+        line per phase."""
+
+        lines = []
+        for name, phase in self.phases.items():
+            mean = phase.time / max(phase.calls, 1)
+            lines.append('{:<40} {:>10.3f}s {:>10} calls {:>10.1f}us/call '
+                         '\n'.format(name, phase.time, phase.calls,
+                                     mean * 1e6))
+
+        return ''.join(lines)
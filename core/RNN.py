@@ -1,5 +1,22 @@
 import numpy as np
 
+from utils import get_default_dtype
+
+
+def param_property(i_param, name):
+    """Returns a property exposing the view of parameter i_param (in the
+    order of RNN.params) into the flat parameter vector theta, assignment to
+    which copies the assigned values into theta."""
+
+    def fget(self):
+        return self.param_views[i_param]
+
+    def fset(self, value):
+        self.param_views[i_param][...] = value
+        self.clear_cache()
+
+    return property(fget, fset, doc='View of {} into theta.'.format(name))
+
 
 class RNN:
     """A vanilla recurrent neural network.
@@ -20,14 +37,30 @@ class RNN:
             output-layer weights.
         b_rec (numpy array): Array of shape (n_h), represents the bias term
             in the recurrent update equation.
+        theta (numpy array): Flat, contiguous vector of all trainable
+            parameters, laid out as the recurrent parameters [W_rec, W_in,
+            b_rec] concatenated along columns into a matrix of shape
+            (n_h, n_h + n_in + 1), followed by the output parameters [W_out,
+            b_out] as a matrix of shape (n_out, n_h + 1), each flattened in
+            row-major order. This matches the shapes of the recurrent and
+            output gradients computed by learning algorithms.
+        rec_params (numpy array): View of the recurrent parameters into theta
+            as a matrix of shape (n_h, n_h + n_in + 1).
+        out_params (numpy array): View of the output parameters into theta as
+            a matrix of shape (n_out, n_h + 1).
+        W_rec, W_in, b_rec, W_out, b_out (numpy array): Views into theta (see
+            get_param_views). Assigning to them copies the values into theta.
         params (list): The list of each parameter's current value, in the order
-            [W_rec, W_in, b_rec, W_out, b_out].
+            [W_rec, W_in, b_rec, W_out, b_out], as views into theta. Assigning
+            a list copies its values into theta.
         shapes (list): The shape of each trainable set of parameters, in the
             same order.
         n_params (int): Number of total trainable parameters.
         n_h_params (int): Number of total trainble parameters in the recurrent
             update ewquation, i.e. all parameters excluding the output weights
             and biases.
+        dtype (numpy dtype): Floating point dtype of the parameters and state
+            of the network.
         L2_indices (list): A list of integers representing which indices in
             the list of params should be subject to L2 regularization if the
             learning algorithm dictates (all weights but not biases).
@@ -57,21 +90,44 @@ class RNN:
             Not computed in any methods in this class.
         *_prev (numpy array): Array representing any of x, h, a, or z at the
             previous time step.
+
+        Each of x, h, a, z, error and y_hat may instead carry a leading batch
+        axis, e.g. shape (B, n_h) for a, when B independent streams are run
+        together (see reset_network). The methods below that compute learning
+        quantities (Jacobians, network speed) assume a single stream.
+
         a_J (numpy array): Array of shape (n_h, n_h) representing the Jacobian
             of the network at current time, based on the equation (in TeX)
-            J_{ij} = \alpha\phi'(h_i) W_{rec,ij} + (1 - \alpha)\delta_{ij}."""
+            J_{ij} = \alpha\phi'(h_i) W_{rec,ij} + (1 - \alpha)\delta_{ij}.
+        cache (dict): Per-time-step cache of quantities shared by learning
+            algorithms (a_hat, \phi'(h) and the Jacobian), emptied by
+            next_state and reset_network. Each entry remembers the arrays it
+            was computed from and is recomputed if any of them is reassigned.
+            Code that modifies h, a_prev, x or W_rec in place must call
+            clear_cache."""
+
+    # Default for networks pickled before dtype was an attribute
+    dtype = np.dtype(np.float64)
+
+    # Leading axes of all parameters, e.g. (K,) for a core.Population
+    member_shape = ()
+
+    W_rec = param_property(0, 'W_rec')
+    W_in = param_property(1, 'W_in')
+    b_rec = param_property(2, 'b_rec')
+    W_out = param_property(3, 'W_out')
+    b_out = param_property(4, 'b_out')
 
     def __init__(self, W_in, W_rec, W_out, b_rec, b_out,
-                 activation, alpha, output, loss, reset_sigma=None):
+                 activation, alpha, output, loss, reset_sigma=None,
+                 dtype=None):
         """Initializes an RNN by specifying its initial parameter values;
-        its activation, output, and loss functions; and alpha."""
+        its activation, output, and loss functions; and alpha. The parameters
+        are cast to dtype, which defaults to utils.get_default_dtype()."""
 
-        # Initial parameter values
-        self.W_in = W_in
-        self.W_rec = W_rec
-        self.W_out = W_out
-        self.b_rec = b_rec
-        self.b_out = b_out
+        if dtype is None:
+            dtype = get_default_dtype()
+        self.dtype = np.dtype(dtype)
 
         # Network dimensions
         self.n_in = W_in.shape[1]
@@ -86,10 +142,9 @@ class RNN:
         assert self.n_h == b_rec.shape[0]
         assert self.n_out == b_out.shape[0]
 
-        # Define shapes and params lists for convenience later.
-        self.params = [self.W_rec, self.W_in, self.b_rec,
-                       self.W_out, self.b_out]
-        self.shapes = [w.shape for w in self.params]
+        # Initial parameter values, copied into theta
+        self.cache = {}
+        self.init_params([W_rec, W_in, b_rec, W_out, b_out])
 
         # Activation and loss functions
         self.alpha = alpha
@@ -114,7 +169,89 @@ class RNN:
         # Initial state values
         self.reset_network()
 
-    def reset_network(self, sigma=1, **kwargs):
+    def init_params(self, params):
+        """Allocates the flat parameter vector theta, sets up the parameter
+        views into it and copies in the values of params, a list [W_rec, W_in,
+        b_rec, W_out, b_out] of arrays with leading axes member_shape."""
+
+        m = self.n_h + self.n_in + 1
+        n_theta = int(np.prod(self.member_shape, dtype=int) *
+                      (self.n_h * m + self.n_out * (self.n_h + 1)))
+        self.theta = np.zeros(n_theta, dtype=self.dtype)
+        self.set_param_views()
+        for view, param in zip(self.param_views, params):
+            view[...] = param
+        self.shapes = [w.shape for w in self.param_views]
+
+    def set_param_views(self):
+        """Sets rec_params, out_params and the views of params into theta."""
+
+        self.rec_params, self.out_params, self.param_views = (
+            self.get_param_views(self.theta))
+
+    def get_param_views(self, theta):
+        """Returns views into a flat array with the layout of theta, e.g.
+        into a flat gradient.
+
+        Returns:
+            The recurrent part as a matrix of shape (n_h, n_h + n_in + 1), the
+            output part as a matrix of shape (n_out, n_h + 1), both with
+            leading axes member_shape, and the list of views with the shapes
+            of [W_rec, W_in, b_rec, W_out, b_out]."""
+
+        m = self.n_h + self.n_in + 1
+        n_rec = int(np.prod(self.member_shape, dtype=int) * self.n_h * m)
+        rec = theta[:n_rec].reshape(self.member_shape + (self.n_h, m))
+        out = theta[n_rec:].reshape(self.member_shape + (self.n_out,
+                                                         self.n_h + 1))
+        views = [rec[..., :self.n_h], rec[..., self.n_h:-1], rec[..., -1],
+                 out[..., :-1], out[..., -1]]
+
+        return rec, out, views
+
+    def split_params(self, theta):
+        """Returns the views of [W_rec, W_in, b_rec, W_out, b_out] into a flat
+        array with the layout of theta."""
+
+        return self.get_param_views(theta)[2]
+
+    @property
+    def params(self):
+        return list(self.param_views)
+
+    @params.setter
+    def params(self, params):
+        for view, param in zip(self.param_views, params):
+            if param is not view:
+                view[...] = param
+        self.clear_cache()
+
+    def __getstate__(self):
+        """Pickles theta only, not the views into it."""
+
+        state = self.__dict__.copy()
+        for key in ['rec_params', 'out_params', 'param_views']:
+            state.pop(key, None)
+        state['cache'] = {}
+
+        return state
+
+    def __setstate__(self, state):
+        """Restores the views into theta. Networks pickled before theta was
+        introduced are converted."""
+
+        if 'theta' in state:
+            self.__dict__.update(state)
+            self.set_param_views()
+        else:
+            params = [state.pop(key) for key in ['W_rec', 'W_in', 'b_rec',
+                                                 'W_out', 'b_out']]
+            state.pop('params', None)
+            self.__dict__.update(state)
+            self.init_params(params)
+        self.cache = {}
+
+    def reset_network(self, sigma=1, batch_size=None, **kwargs):
         """Resets hidden state of the network, either randomly or by
         specifying with kwargs.
 
@@ -122,24 +259,42 @@ class RNN:
             sigma (float): Standard deviation of (zero-mean) Gaussian random
                 reset of pre-activations h. Used if neither h or a is
                 specified.
+            batch_size (int or None): If provided, the state is given a leading
+                batch axis of this size, i.e. shape (batch_size, self.n_h),
+                so that batch_size independent streams are simulated at once.
+                Specified h or a of shape (self.n_h) are copied across the
+                batch.
             h (numpy array): The specification of the pre-activation values,
-                must be of shape (self.n_h). The a values are determined by
-                application of the nonlinearity to h.
+                must be of shape (self.n_h) or (batch_size, self.n_h). The a
+                values are determined by application of the nonlinearity to h.
             a (numpy array): The specification of the post-activation values,
-                must be of shape (self.n_h). If not specified, determined
-                by h."""
+                must be of shape (self.n_h) or (batch_size, self.n_h). If not
+                specified, determined by h."""
+
+        if batch_size is None:
+            shape = self.n_h
+        else:
+            shape = (batch_size, self.n_h)
 
         if 'h' in kwargs.keys():  # Manual reset if specified.
-            self.h = kwargs['h']
+            self.h = np.asarray(kwargs['h'], dtype=self.dtype)
         else:  # Random reset by sigma if not.
-            self.h = np.random.normal(0, sigma, self.n_h)
+            self.h = np.random.normal(0, sigma, shape).astype(self.dtype,
+                                                              copy=False)
+
+        if batch_size is not None and np.ndim(self.h) == 1:
+            self.h = np.tile(self.h, (batch_size, 1))
 
         self.a = self.activation.f(self.h)  # Specify activations by \phi.
 
         if 'a' in kwargs.keys():  # Override with manual activations if given.
-            self.a = kwargs['a']
+            self.a = np.asarray(kwargs['a'], dtype=self.dtype)
+            if batch_size is not None and np.ndim(self.a) == 1:
+                self.a = np.tile(self.a, (batch_size, 1))
 
-        self.z = self.W_out.dot(self.a) + self.b_out  # Specify outputs from a
+        # Specify outputs from a
+        self.z = self.a.dot(self.W_out.T) + self.b_out
+        self.clear_cache()
 
     def next_state(self, x, a=None, update=True, sigma=0):
         """Advances the network forward by one time step.
@@ -149,8 +304,14 @@ class RNN:
         and activatation a. Can either update the network (if update=True)
         or return what the update would be.
 
+        All network variables may carry a leading batch axis, in which case x
+        has shape (B, n_in) and the state has shape (B, n_h). Each row is an
+        independent stream, and the recurrent update is computed as one
+        matrix-matrix product.
+
         Args:
-            x (numpy array): Input provided to the network, of shape (n_in).
+            x (numpy array): Input provided to the network, of shape (n_in)
+                or (B, n_in).
             update (bool): Specifies whether to update the network using the
                 current network state (if True) or return the would-be next
                 network state using a provided "current" network state a.
@@ -163,41 +324,109 @@ class RNN:
             Updates self.x, self.h, self.a, and self.*_prev, or returns the
             would-be update from given previous state a."""
 
+        x = np.asarray(x, dtype=self.dtype)
+
         if update:  # Update network if update is True
+            self.clear_cache()
             self.x = x
             self.h_prev = np.copy(self.h)
             self.a_prev = np.copy(self.a)
 
-            self.h = (self.W_rec.dot(self.a) + self.W_in.dot(self.x) +
+            self.h = (self.a.dot(self.W_rec.T) + self.x.dot(self.W_in.T) +
                       self.b_rec)  # Calculate new pre-activations
             if sigma > 0:  # Add noise to h if sigma is more than 0.
-                self.noise = sigma * np.random.normal(0, self.alpha, self.n_h)
+                self.noise = sigma * np.random.normal(0, self.alpha,
+                                                      self.h.shape)
+                self.noise = self.noise.astype(self.dtype, copy=False)
                 # self.h += self.noise
             else:
                 self.noise = 0
-            # Implement recurrent update equation
-            self.a = ((1 - self.alpha) * self.a +
-                      self.alpha * self.activation.f(self.h)) + self.noise
+            # Implement recurrent update equation, caching \phi(h)
+            phi = self.activation.f(self.h)
+            self.cache['phi'] = ((self.h,), phi)
+            self.a = ((1 - self.alpha) * self.a + self.alpha * phi +
+                      self.noise)
+            self.a = self.a.astype(self.dtype, copy=False)
         else:  # Otherwise calculate would-be next state from provided input a.
-            h = self.W_rec.dot(a) + self.W_in.dot(x) + self.b_rec
+            h = a.dot(self.W_rec.T) + x.dot(self.W_in.T) + self.b_rec
             ret = (1 - self.alpha) * a + self.alpha * self.activation.f(h)
             if sigma > 0:
-                noise = np.random.normal(0, sigma, self.n_h)
-                ret += noise
+                noise = np.random.normal(0, sigma, ret.shape)
+                ret += noise.astype(ret.dtype, copy=False)
             return ret
 
     def z_out(self):
         """Update outputs using current state of the network."""
 
         self.z_prev = np.copy(self.z)
-        self.z = self.W_out.dot(self.a) + self.b_out
+        self.z = self.a.dot(self.W_out.T) + self.b_out
+
+    def clear_cache(self):
+        """Empties the per-time-step cache of derivative quantities."""
+
+        self.cache = {}
+
+    def get_cached(self, key, inputs, compute):
+        """Returns the cached value under key if it was computed from the
+        very same input arrays, otherwise computes, caches and returns it.
+
+        Args:
+            key (str): Name of the cached quantity.
+            inputs (tuple): The arrays the quantity depends on, compared by
+                identity.
+            compute (function): Computes the quantity if it is not cached."""
+
+        entry = self.cache.get(key)
+        if entry is not None:
+            cached_inputs, value = entry
+            if all(a is b for a, b in zip(cached_inputs, inputs)):
+                return value
+
+        value = compute()
+        self.cache[key] = (inputs, value)
+
+        return value
+
+    def get_a_hat(self):
+        """Returns a_hat = [a_prev, x, 1], the presynaptic activity of all
+        recurrent update parameters, at the current time step. The returned
+        array is shared between callers and must not be modified."""
 
-    def get_a_jacobian(self, update=True, **kwargs):
+        return self.get_cached('a_hat', (self.a_prev, self.x),
+                               lambda: np.concatenate([
+                                   self.a_prev, self.x,
+                                   np.ones(1, dtype=self.a_prev.dtype)]))
+
+    def get_phi(self):
+        """Returns \\phi(h) at the current time step, as computed by
+        next_state. The returned array is shared between callers and must not
+        be modified."""
+
+        return self.get_cached('phi', (self.h,),
+                               lambda: self.activation.f(self.h))
+
+    def get_phi_prime(self):
+        """Returns \\phi'(h) at the current time step, computed from \\phi(h)
+        if the activation allows it (see functions.Function). The returned
+        array is shared between callers and must not be modified."""
+
+        def compute():
+            if self.activation.f_prime_from_f is None:
+                return self.activation.f_prime(self.h)
+            return self.activation.f_prime_from_f(self.get_phi())
+
+        return self.get_cached('phi_prime', (self.h,), compute)
+
+    def get_a_jacobian(self, update=True, out=None, **kwargs):
         """Calculates the Jacobian of the network.
 
         Follows the equation
         J_{ij} = \alpha\phi'(h_i) W_{rec,ij} + (1 - \alpha)\delta_{ij}
 
+        which is computed as a scaling of the rows of W_rec followed by an
+        update of the diagonal, in O(n_h^2) time and without forming any
+        diagonal matrices.
+
         If update is True, the network attribute a_J updates to this Jacobian,
         based on current values of h and W_rec. If update is False, this method
         returns the Jacobian calculated based on current values of h and W_rec
@@ -205,31 +434,102 @@ class RNN:
 
         Args:
             update (bool): Specifies whether to update or return the Jacobian.
+            out (numpy array): Optional array of shape (n_h, n_h) into which
+                the Jacobian is written, to avoid allocating a new one.
             h (numpy array): Array of shape (n_h) that specifies what values of
                 the pre-activations to use in calculating the Jacobian.
             W_rec (numpy array): Array of shape (n_h, n_h) that specifies
                 what values of the recurrent weights to use in calculating
-                the Jacobian."""
+                the Jacobian.
+
+        If update is True and neither h nor W_rec is specified, the Jacobian
+        is cached for the current time step, so that several learning
+        algorithms can share it. A new array is allocated for it at each time
+        step unless out is given, so that an a_J kept from an earlier time
+        step is never overwritten. Callers that only need products of the
+        Jacobian with vectors or matrices should use jvp or vjp instead."""
+
+        if update and 'h' not in kwargs and 'W_rec' not in kwargs:
+            self.a_J = self.get_cached('a_J', (self.h, self.W_rec),
+                                       lambda: self.get_a_jacobian(
+                                           update=False, out=out, h=self.h,
+                                           W_rec=self.W_rec))
+            return
 
         # Use kwargs instead of defaults if provided
-        if 'h' in kwargs.keys():
-            h = kwargs['h']
-        else:
-            h = np.copy(self.h)
-        if 'W_rec' in kwargs.keys():
-            W_rec = kwargs['W_rec']
-        else:
-            W_rec = np.copy(self.W_rec)
+        h = kwargs.get('h', self.h)
+        W_rec = kwargs.get('W_rec', self.W_rec)
 
         # Calculate Jacobian
-        D = np.diag(self.activation.f_prime(h))  # Nonlinearity derivative
-        a_J = self.alpha * D.dot(W_rec) + (1 - self.alpha) * np.eye(self.n_h)
+        if h is self.h:
+            D = self.get_phi_prime()  # Nonlinearity derivative
+        else:
+            D = self.activation.f_prime(h)
+        a_J = np.multiply(W_rec, (self.alpha * D)[:, np.newaxis], out=out)
+        a_J.flat[::self.n_h + 1] += (1 - self.alpha)
 
         if update:  # Update if update is True
-            self.a_J = np.copy(a_J)
+            self.a_J = a_J
         else:  # Otherwise return
             return a_J
 
+    def get_jacobian_factors(self, h=None, phi_prime=None, W_rec=None):
+        """Returns the scaled nonlinearity derivative \alpha\phi'(h) and W_rec
+        that together define the Jacobian, defaulting to current values."""
+
+        if phi_prime is None:
+            if h is None or h is self.h:
+                phi_prime = self.get_phi_prime()
+            else:
+                phi_prime = self.activation.f_prime(h)
+        if W_rec is None:
+            W_rec = self.W_rec
+
+        return self.alpha * phi_prime, W_rec
+
+    def jvp(self, v, h=None, phi_prime=None, W_rec=None):
+        """Computes the Jacobian-vector product J v without forming J.
+
+        Uses J v = \alpha\phi'(h) * (W_rec v) + (1 - \alpha) v.
+
+        Args:
+            v (numpy array): Array of shape (n_h) or (n_h, k), in which case
+                each column is multiplied by J, or a stack of such matrices of
+                shape (..., n_h, k).
+            h (numpy array): Pre-activations at which to evaluate J, default
+                current h.
+            phi_prime (numpy array): Precomputed \phi'(h), overrides h.
+            W_rec (numpy array): Recurrent weights, default current W_rec.
+
+        Returns:
+            An array of the same shape as v."""
+
+        D, W_rec = self.get_jacobian_factors(h, phi_prime, W_rec)
+        if np.ndim(v) > 1:
+            D = D[:, np.newaxis]
+
+        return D * np.matmul(W_rec, v) + (1 - self.alpha) * v
+
+    def vjp(self, v, h=None, phi_prime=None, W_rec=None):
+        """Computes the vector-Jacobian product v J without forming J.
+
+        Uses v J = (v * \alpha\phi'(h)) W_rec + (1 - \alpha) v.
+
+        Args:
+            v (numpy array): Array of shape (n_h) or (k, n_h), in which case
+                each row is multiplied by J.
+            h (numpy array): Pre-activations at which to evaluate J, default
+                current h.
+            phi_prime (numpy array): Precomputed \phi'(h), overrides h.
+            W_rec (numpy array): Recurrent weights, default current W_rec.
+
+        Returns:
+            An array of the same shape as v."""
+
+        D, W_rec = self.get_jacobian_factors(h, phi_prime, W_rec)
+
+        return (v * D).dot(W_rec) + (1 - self.alpha) * v
+
     def get_network_speed(self, a=None):
         """Calculates and returns the (squared) 'speed' of the network given
         its current state and parameters. Option to specify a state value."""
@@ -0,0 +1,201 @@
+import json
+import os
+import pickle
+from collections.abc import Mapping
+
+import numpy as np
+
+from core.RNN import RNN
+
+param_names = ['W_rec', 'W_in', 'b_rec', 'W_out', 'b_out']
+array_files = (['params/{}.npy'.format(name) for name in param_names] +
+               ['state/h.npy', 'state/a.npy'])
+
+
+def save_run_directory(path, sim, task=None, save_monitors=True):
+    """Saves the checkpoints (and optionally monitors) of a simulation, along
+    with the task, as a directory that can be opened with Run_Directory.
+
+    The directory contains
+
+    manifest.json: Checkpoint indices, network constants and run metadata.
+    params/<name>.npy: Each parameter of every checkpoint stacked along the
+        first axis, in the order of the indices.
+    state/h.npy, state/a.npy: The network state of every checkpoint.
+    functions.pkl: The activation, output and loss functions of the network.
+    task.pkl: The task, if provided.
+    extras/<i_t>.pkl: Any other entries of a checkpoint, e.g. its learn_alg.
+    monitors/<key>.npy: Each numeric monitor, if save_monitors is True.
+
+    The manifest is written last, so a directory without one is incomplete.
+
+    Args:
+        path (str): Path of the directory to create.
+        sim (core.Simulation): Simulation whose checkpoints are saved. Its
+            checkpoints may be a dict or a core.Checkpoint_Store.
+        task (gen_data.Task): Task to save alongside, if desired.
+        save_monitors (bool): Whether to save sim.mons as well."""
+
+    for subdir in ['params', 'state', 'extras', 'monitors']:
+        os.makedirs(os.path.join(path, subdir), exist_ok=True)
+
+    checkpoints = getattr(sim, 'checkpoints', None) or {}
+    indices = sorted(checkpoints.keys())
+    n_checkpoints = len(indices)
+
+    manifest = {'indices': [int(i_t) for i_t in indices],
+                'extras': [],
+                'monitors': [],
+                'has_task': task is not None}
+    for attr in ['total_time_steps', 'checkpoint_interval']:
+        value = getattr(sim, attr, None)
+        if value is not None:
+            value = np.array(value).tolist()  # JSON-compatible
+        manifest[attr] = value
+
+    arrays = None
+    for row, i_t in enumerate(indices):
+        checkpoint = checkpoints[i_t]
+        rnn = checkpoint['rnn']
+        values = [getattr(rnn, name) for name in param_names]
+        values += [rnn.h, rnn.a]
+        if arrays is None:
+            arrays = [np.lib.format.open_memmap(
+                os.path.join(path, file_name), mode='w+', dtype=value.dtype,
+                shape=(n_checkpoints,) + value.shape)
+                for file_name, value in zip(array_files, values)]
+            manifest['rnn'] = {'alpha': float(rnn.alpha),
+                               'reset_sigma': None}
+            if rnn.reset_sigma is not None:
+                manifest['rnn']['reset_sigma'] = float(rnn.reset_sigma)
+            with open(os.path.join(path, 'functions.pkl'), 'wb') as f:
+                pickle.dump({'activation': rnn.activation,
+                             'output': rnn.output,
+                             'loss': rnn.loss}, f)
+        for array, value in zip(arrays, values):
+            array[row] = value
+
+        extras = {k: v for k, v in checkpoint.items()
+                  if k not in ['rnn', 'i_t']}
+        if len(extras) > 0:
+            manifest['extras'].append(int(i_t))
+            with open(os.path.join(path, 'extras',
+                                   '{}.pkl'.format(int(i_t))), 'wb') as f:
+                pickle.dump(extras, f)
+
+    if arrays is not None:
+        for array in arrays:
+            array.flush()
+        del arrays
+
+    if task is not None:
+        with open(os.path.join(path, 'task.pkl'), 'wb') as f:
+            pickle.dump(task, f)
+
+    if save_monitors:
+        for key, value in getattr(sim, 'mons', {}).items():
+            if isinstance(value, np.ndarray) and value.dtype != object:
+                np.save(os.path.join(path, 'monitors', key + '.npy'), value)
+                manifest['monitors'].append(key)
+
+    with open(os.path.join(path, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f)
+
+
+class Run_Directory(Mapping):
+    """Read access to a run saved by save_run_directory.
+
+    Behaves like the dict of checkpoints of the saved simulation, indexed by
+    time step i_t. Opening a Run_Directory reads only its manifest, and the
+    stacked parameter files are memory mapped on first access, so that any
+    checkpoint can be read without loading the others.
+
+    Attributes:
+        path (str): Path of the run directory.
+        manifest (dict): Contents of manifest.json.
+        indices (list): Sorted time steps i_t of all checkpoints.
+        rows (dict): Maps each i_t to its row in the stacked arrays.
+        extras (set): Time steps whose checkpoints have other entries.
+        arrays (list or None): Memory-mapped stacked arrays of
+            [W_rec, W_in, b_rec, W_out, b_out, h, a], once loaded.
+        functions (dict or None): Activation, output and loss functions of
+            the network, once loaded."""
+
+    def __init__(self, path):
+        """Opens a run directory by reading its manifest.
+
+        Args:
+            path (str): Path of a directory written by save_run_directory."""
+
+        self.path = path
+        with open(os.path.join(path, 'manifest.json'), 'r') as f:
+            self.manifest = json.load(f)
+
+        self.indices = self.manifest['indices']
+        self.rows = {i_t: row for row, i_t in enumerate(self.indices)}
+        self.extras = set(self.manifest['extras'])
+        self.arrays = None
+        self.functions = None
+
+    def load_arrays(self):
+        """Memory maps the stacked parameter and state arrays and loads the
+        network functions."""
+
+        self.arrays = [np.load(os.path.join(self.path, file_name),
+                               mmap_mode='r')
+                       for file_name in array_files]
+        with open(os.path.join(self.path, 'functions.pkl'), 'rb') as f:
+            self.functions = pickle.load(f)
+
+    def get_rnn(self, i_t):
+        """Builds the RNN of the checkpoint at time step i_t."""
+
+        if self.arrays is None:
+            self.load_arrays()
+
+        row = self.rows[i_t]
+        W_rec, W_in, b_rec, W_out, b_out, h, a = [np.array(array[row])
+                                                  for array in self.arrays]
+        rnn = RNN(W_in, W_rec, W_out, b_rec, b_out,
+                  alpha=self.manifest['rnn']['alpha'],
+                  reset_sigma=self.manifest['rnn']['reset_sigma'],
+                  dtype=W_rec.dtype, **self.functions)
+        rnn.reset_network(h=h, a=a)
+
+        return rnn
+
+    def __getitem__(self, i_t):
+
+        if i_t not in self.rows:
+            raise KeyError(i_t)
+
+        checkpoint = {'rnn': self.get_rnn(i_t), 'i_t': i_t}
+        if i_t in self.extras:
+            with open(os.path.join(self.path, 'extras',
+                                   '{}.pkl'.format(i_t)), 'rb') as f:
+                checkpoint.update(pickle.load(f))
+
+        return checkpoint
+
+    def __iter__(self):
+
+        return iter(self.indices)
+
+    def __len__(self):
+
+        return len(self.indices)
+
+    def load_task(self):
+        """Returns the saved task, or None if no task was saved."""
+
+        if not self.manifest['has_task']:
+            return None
+
+        with open(os.path.join(self.path, 'task.pkl'), 'rb') as f:
+            return pickle.load(f)
+
+    def load_monitor(self, key, mmap_mode='r'):
+        """Returns the saved monitor under key, memory mapped by default."""
+
+        return np.load(os.path.join(self.path, 'monitors', key + '.npy'),
+                       mmap_mode=mmap_mode)
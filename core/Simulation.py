@@ -3,6 +3,9 @@ from copy import copy, deepcopy
 
 import numpy as np
 
+from core.Checkpoint_Store import Checkpoint_Store
+from core.Monitor_Buffer import Monitor_Buffer, parse_monitor_key
+from core.Profiler import Profiler
 from utils import *
 
 
@@ -18,6 +21,9 @@ class Simulation:
     different in train and test runs. Details given in __init__ and run
     docstrings."""
 
+    # Times the phases of a run if profiling (see run), otherwise disabled
+    profiler = Profiler(enabled=False)
+
     def __init__(self, rnn, allowed_kwargs_=set(), **kwargs):
         """Initialzes a simulation.Simulation object by specifying the
         attributes that will apply to both train and test instances.
@@ -37,11 +43,16 @@ class Simulation:
             i_job (int): An integer indexing the job that this simulation
                 corresponds to if submitting a batch job to cluster.
             save_dir (string): Path indicating where to save intermediate
-                results, if desired."""
+                results, if desired.
+            checkpoints (dict or core.Checkpoint_Store): Mapping from time
+                step to checkpoint in which checkpoints are saved. Provide a
+                Checkpoint_Store to save only network parameters and state
+                compactly. Default is an empty dict."""
 
         allowed_kwargs = {'time_steps_per_trial',
                           'reset_sigma', 'trial_mask',
-                          'i_job', 'save_dir'}.union(allowed_kwargs_)
+                          'i_job', 'save_dir',
+                          'checkpoints'}.union(allowed_kwargs_)
         for k in kwargs:
             if k not in allowed_kwargs:
                 raise TypeError('Unexpected keyword argument '
@@ -70,7 +81,10 @@ class Simulation:
             data (dict): A dict containing two keys, 'train' and 'test',
                 each of which points to a dict containing keys 'X' and 'Y',
                 providing numpy arrays of inputs and labels, respectively,
-                of shape (T, n_in) or (T, n_out).
+                of shape (T, n_in) or (T, n_out). In 'test' mode, arrays of
+                shape (T, B, n_in) and (T, B, n_out) may be provided instead
+                to run B independent streams together as a minibatch, in
+                which case a loss_mask, if provided, has shape (T) or (T, B).
             mode (string): A string that must be either 'train' or 'test'
                 which indicates which dict in data to use and whether to
                 update network parameters while running.
@@ -80,18 +94,34 @@ class Simulation:
                 or the learning algorithm, that attribute's value is stored
                 at each time step. If there is a '-' (hyphen) between the name
                 and either 'radius' or 'norm', then the spectral radius or
-                norm, respectively, of that object is stored instead.
+                norm, respectively, of that object is stored instead. A
+                recording policy may be appended after an '@' to decimate or
+                reduce the values as they arrive, e.g. 'rnn.a@every10' keeps
+                every 10th step, 'rnn.loss_@mean100' keeps means over windows
+                of 100 steps, and 'rnn.loss_@welford100' (or
+                'rnn.loss_@welford' for the whole run) keeps means and
+                variances. See core.Monitor_Buffer for the resulting shapes.
             learn_alg (learning_algorithms.Learning_Algorithm): The instance
-                of a learning algorithm used to calculate the gradients.
+                of a learning algorithm used to calculate the gradients. If it
+                is offline (e.g. Trial_BPTT), training proceeds one batch of
+                whole trials at a time (see trial_loop).
             optimizer (optimizers.Optimizer): The instance of an optimizer
                 used to update the network using gradients computed by
                 learn_alg.
             update_interval (int): Number of time steps between each parameter
                 update.
+            accumulate_grads (str): If 'sum' or 'mean', the unprocessed
+                gradients of all time steps since the last update are summed
+                or averaged, and any regularization and continual learning
+                method (see Learning_Algorithm.process_grads) and the
+                optimizer are applied once to the result at each update. If
+                None (default), only the gradient of the update time step is
+                used.
             a_initial (numpy array): An array of shape (rnn.n_hidden) that
                 specifies the initial state of the network when running. If
                 not specified, the default initialization practice is inherited
-                from the RNN.
+                from the RNN. For batched data, may also be of shape
+                (B, rnn.n_hidden).
             sigma (float): Specifies standard deviation of white noise to add
                 to the network pre-activations at each time step.
             comp_algs (list): A list of instances of Learning_Algorithm
@@ -115,7 +145,20 @@ class Simulation:
                 rnn, learn_alg, optimizer, and i_t so that training can be
                 reproduced.
             'N_Duncker_data (int): Number of past data points to use for
-                calculating Duncker projections during a task switch."""
+                calculating Duncker projections during a task switch.
+            monitor_memmap_dir (str): Directory in which to create memory-
+                mapped files backing large monitors, so that long traces spill
+                to disk. If None (default), monitors are held in memory.
+            monitor_memmap_min_bytes (int): Monitors whose storage for the
+                whole run is smaller than this are held in memory even if
+                monitor_memmap_dir is given. Default is 2 ** 27 (128 MiB).
+            fast_test (bool): Boolean that indicates whether test runs may use
+                the vectorized inference path of fast_test_run when all
+                monitors are supported by it. Default is True.
+            profiling (bool): Boolean that indicates whether to accumulate the
+                wall time and number of calls of each phase of the run (see
+                core.Profiler), available as self.profile and included in
+                progress reports. Default is False."""
 
         allowed_kwargs = {'learn_alg', 'optimizer', 'a_initial', 'sigma',
                           'update_interval', 'comp_algs', 'verbose', 'print',
@@ -123,7 +166,10 @@ class Simulation:
                           'report_interval', 'report_accuracy', 'report_loss',
                           'best_model_interval', 'checkpoint_interval',
                           'overwrite_checkpoints', 'i_start', 'i_end',
-                          'checkpoint_learn_alg', 'checkpoint_optimizer'}
+                          'checkpoint_learn_alg', 'checkpoint_optimizer',
+                          'fast_test', 'monitor_memmap_dir',
+                          'monitor_memmap_min_bytes', 'accumulate_grads',
+                          'profiling'}
         for k in kwargs:
             if k not in allowed_kwargs:
                 raise TypeError('Unexpected keyword argument '
@@ -145,6 +191,10 @@ class Simulation:
         if 'loss_mask' in data[mode].keys():
             self.loss_mask = data[mode]['loss_mask']
         self.total_time_steps = self.x_inputs.shape[0]
+        if self.x_inputs.ndim == 3:
+            self.batch_size = self.x_inputs.shape[1]
+        else:
+            self.batch_size = None
 
         # Set defaults
         self.verbose = True
@@ -161,6 +211,9 @@ class Simulation:
         self.sigma = 0
         self.checkpoint_learn_alg = False
         self.checkpoint_optimizer = False
+        self.fast_test = True
+        self.monitor_memmap_min_bytes = 2 ** 27
+        self.profiling = False
 
         # Overwrite defaults with any provided keyword args
         self.__dict__.update(kwargs)
@@ -173,10 +226,51 @@ class Simulation:
         if self.reset_sigma is not None:
             self.rnn.reset_sigma = self.reset_sigma
 
+        if self.batch_size is not None and self.mode == 'train':
+            raise ValueError('Batched data (of shape (T, B, n_in)) is only '
+                             'supported in test mode.')
+
         ### --- Pre-run housekeeping --- ###
 
         self.initialize_run()
 
+        if self.mode != 'train' and self.fast_test_supported():
+            with self.profiler('fast_test_run'):
+                self.fast_test_run()
+            self.i_t = self.i_end - 1
+        elif self.mode == 'train' and getattr(self.learn_alg, 'offline',
+                                              False):
+            self.trial_loop()
+        else:
+            self.time_loop(data)
+
+        # Checkpoint final model
+        with self.profiler('checkpoint_model'):
+            self.checkpoint_model()
+
+        # Delete data to save space
+        del (self.x_inputs)
+        del (self.y_labels)
+        if 'task_marker' in data[mode].keys():
+            del (self.task_marker)
+
+    @property
+    def profile(self):
+        """The total wall time (in seconds) and number of calls of each phase
+        of the last run with profiling, as a dict mapping phase names to
+        dicts with keys 'time' and 'calls', or None if it was not profiled.
+        Comparison algorithms are broken down as 'compare_algorithms/' + their
+        name."""
+
+        if not self.profiler.enabled:
+            return None
+
+        return self.profiler.get_totals()
+
+    def time_loop(self, data):
+        """Steps through the data one time step at a time, running the
+        network forwards, updating it in 'train' mode and monitoring."""
+
         for i_t in range(self.i_start, self.i_end):
 
             self.i_t = i_t
@@ -184,12 +278,14 @@ class Simulation:
             ### --- Reset model if there is a trial structure --- ###
 
             if self.trial_switch is not None:
-                self.trial_structure()
+                with self.profiler('trial_structure'):
+                    self.trial_structure()
 
             ### --- Run network forwards and get error --- ###
 
-            self.forward_pass(self.x_inputs[i_t],
-                              self.y_labels[i_t])
+            with self.profiler('forward_pass'):
+                self.forward_pass(self.x_inputs[i_t],
+                                  self.y_labels[i_t])
 
             ### --- Update parameters if in 'train' mode --- ###
 
@@ -203,14 +299,101 @@ class Simulation:
         # At end of run, convert monitor lists into numpy arrays
         self.monitors_to_arrays()
 
-        # Checkpoint final model
-        self.checkpoint_model()
+    def trial_loop(self):
+        """Trains the network one batch of whole trials at a time with an
+        offline learning algorithm (e.g. Trial_BPTT), which computes the
+        gradient of each batch from its inputs, labels and loss mask in one
+        call to learn_alg.get_trial_grads.
 
-        # Delete data to save space
-        del (self.x_inputs)
-        del (self.y_labels)
-        if 'task_marker' in data[mode].keys():
-            del (self.task_marker)
+        Consecutive trials of equal length are batched together, up to
+        learn_alg.trials_per_batch of them. Each trial starts from a random
+        state if it begins with a trial switch and reset_sigma is given, and
+        otherwise from the current network state. Monitors record one value
+        per batch, after the parameter update."""
+
+        if len(self.comp_algs) > 0:
+            raise ValueError('Comparison algorithms are not supported with '
+                             'offline learning algorithms.')
+
+        bounds = self.get_trial_bounds()
+        trials = list(zip(bounds[:-1], bounds[1:]))
+        i_trial = 0
+        while i_trial < len(trials):
+
+            # Batch consecutive trials of equal length
+            batch = [trials[i_trial]]
+            T = batch[0][1] - batch[0][0]
+            for i0, i1 in trials[i_trial + 1:]:
+                if (len(batch) == self.learn_alg.trials_per_batch or
+                        i1 - i0 != T):
+                    break
+                batch.append((i0, i1))
+            i_trial += len(batch)
+
+            self.train_trials(batch)
+            self.i_t = batch[-1][1] - 1
+
+            with self.profiler('get_radii_and_norms'):
+                self.get_radii_and_norms()
+            with self.profiler('update_monitors'):
+                self.update_monitors()
+
+        # At end of run, convert monitor lists into numpy arrays
+        self.monitors_to_arrays()
+
+    def get_trial_bounds(self):
+        """Returns the first time step of each trial between i_start and
+        i_end, followed by i_end, as given by trial_switch or else by
+        time_steps_per_trial."""
+
+        if self.trial_switch is not None:
+            starts = np.flatnonzero(self.trial_switch[self.i_start:self.i_end])
+        elif self.time_steps_per_trial is not None:
+            starts = np.arange(0, self.i_end - self.i_start,
+                               self.time_steps_per_trial)
+        else:
+            raise ValueError('Offline learning algorithms require a trial '
+                             'structure, via trial_switch in the data or '
+                             'time_steps_per_trial.')
+
+        return np.unique(np.concatenate([[self.i_start],
+                                         starts + self.i_start,
+                                         [self.i_end]]))
+
+    def train_trials(self, batch):
+        """Computes the gradient of a batch of trials of equal length, given
+        as a list of (start, end) time steps, and applies it to self.rnn."""
+
+        rnn = self.rnn
+
+        # Initial states and trial structure
+        a_initial = []
+        for i0, _ in batch:
+            if self.trial_switch is not None and self.trial_switch[i0] == 1:
+                self.i_trial += 1
+                try:
+                    rnn.trial_type = self.trial_type[i0]
+                except TypeError:
+                    pass
+                if self.reset_sigma is not None:
+                    rnn.reset_network(sigma=self.reset_sigma)
+            a_initial.append(rnn.a)
+
+        # Trials stacked along axis 1
+        i_steps = np.array([np.arange(i0, i1) for i0, i1 in batch]).T
+        if len(batch) == 1:
+            i_steps, a_initial = i_steps[:, 0], a_initial[0]
+        loss_mask = None
+        if self.loss_mask is not None:
+            loss_mask = self.loss_mask[i_steps]
+
+        with self.profiler('learn_alg.get_trial_grads'):
+            self.grads_list = self.learn_alg.get_trial_grads(
+                self.x_inputs[i_steps], self.y_labels[i_steps],
+                loss_mask=loss_mask, a_initial=np.array(a_initial))
+
+        with self.profiler('optimizer'):
+            self.update_params()
 
     def initialize_run(self):
         """Initializes a few variables before the time loop."""
@@ -219,23 +402,38 @@ class Simulation:
         self.best_val_loss = np.inf
 
         # Set up checkpoints dict if doesn't already exist from previous run
-        if not hasattr(self, 'checkpoints'):
+        if getattr(self, 'checkpoints', None) is None:
             self.checkpoints = {}
 
         # Initialize rec_grads_dicts
         if self.mode == 'train':
             self.algs = [self.learn_alg] + self.comp_algs
             self.rec_grads_dict = {alg.name: [] for alg in self.algs}
-            self.T_lag = 0
-            for alg in self.algs:
-                try:
-                    if alg.T_truncation > self.T_lag:
-                        self.T_lag = alg.T_truncation
-                except AttributeError:
-                    pass
+            self.T_lag = max(alg.comparison_lag for alg in self.algs)
+
+        # Buffer of gradients accumulated between updates
+        if self.mode == 'train' and self.accumulate_grads is not None:
+            if self.accumulate_grads not in ['sum', 'mean']:
+                raise ValueError('accumulate_grads must be None, \'sum\' or '
+                                 '\'mean\', not ' + str(self.accumulate_grads))
+            self.grads_accum = np.zeros_like(self.rnn.theta)
+            self.grads_accum_list = self.rnn.split_params(self.grads_accum)
+            self.n_accumulated = 0
+
+        # Flat buffer for gradients that are not views of a flat buffer
+        if self.mode == 'train':
+            self.grads_flat = np.zeros_like(self.rnn.theta)
+            self.grads_flat_list = self.rnn.split_params(self.grads_flat)
 
         # Initialize monitors
-        self.mons = {mon: [] for mon in self.monitors}
+        self.mons = {}
+        for mon in self.monitors:
+            _, policy, k = parse_monitor_key(mon)
+            self.mons[mon] = Monitor_Buffer(
+                self.i_end - self.i_start, policy=policy, k=k,
+                memmap_dir=self.monitor_memmap_dir,
+                memmap_min_bytes=self.monitor_memmap_min_bytes,
+                name=mon)
         # Make all relevant algorithms attributes of self
         if self.mode == 'train':
             for comp_alg in self.comp_algs:
@@ -244,15 +442,136 @@ class Simulation:
 
         # Set a random initial state of the network
         if self.a_initial is not None:
-            self.rnn.reset_network(a=self.a_initial)
+            self.rnn.reset_network(a=self.a_initial,
+                                   batch_size=self.batch_size)
+
+        self.match_state_to_batch()
 
         # To avoid errors, initialize "previous"
         # inputs/labels as the first inputs/labels
         self.rnn.x_prev = self.x_inputs[0]
         self.rnn.y_prev = self.y_labels[0]
 
-        # Track computation time
+        # Track computation time, per phase if profiling
         self.start_time = time.time()
+        if self.profiling:
+            self.profiler = Profiler()
+        else:
+            self.profiler = Simulation.profiler
+
+    def match_state_to_batch(self):
+        """Matches the network state to the batch structure of the data."""
+
+        if self.rnn.a.ndim > 1:
+            state_batch_size = self.rnn.a.shape[0]
+        else:
+            state_batch_size = None
+        if state_batch_size != self.batch_size:
+            if state_batch_size is None:  # Copy state across the batch
+                self.rnn.reset_network(h=self.rnn.h, a=self.rnn.a,
+                                       batch_size=self.batch_size)
+            else:  # Otherwise state cannot be carried over
+                self.rnn.reset_network(batch_size=self.batch_size)
+
+    def fast_test_supported(self):
+        """Checks whether the current test run can be carried out by
+        fast_test_run, i.e. all monitors are network variables it computes and
+        no per-step reporting or dimension-wise loss masking is requested."""
+
+        if not self.fast_test or self.print or self.i_end <= self.i_start:
+            return False
+        attrs = {parse_monitor_key(key)[0] for key in self.mons}
+        if not attrs.issubset(self.fast_test_monitors):
+            return False
+        if self.loss_mask is not None:
+            if np.ndim(self.loss_mask) > self.x_inputs.ndim - 1:
+                return False
+
+        return True
+
+    fast_test_monitors = {'rnn.x', 'rnn.y', 'rnn.h', 'rnn.a', 'rnn.z',
+                          'rnn.y_hat', 'rnn.loss_', 'rnn.error'}
+
+    def fast_test_run(self):
+        """Runs the network forwards over the whole test sequence without any
+        per-step bookkeeping.
+
+        The input projection W_in x + b_rec is computed for all time steps at
+        once, directly into the array that then accumulates the recurrent
+        inputs, and the recurrence writes its states straight into
+        preallocated arrays of shape (T, n_h). Outputs, losses and errors do
+        not feed back into the dynamics and are therefore computed in one
+        vectorized pass afterwards. Trial resets and noise draw random numbers
+        in the same order as the step-by-step time loop."""
+
+        rnn = self.rnn
+        i_start, i_end = self.i_start, self.i_end
+        X = self.x_inputs[i_start:i_end].astype(rnn.dtype, copy=False)
+        Y = self.y_labels[i_start:i_end]
+        state_shape = rnn.a.shape
+
+        # Hoisted input projection, later incremented to the pre-activations
+        H = X.dot(rnn.W_in.T) + rnn.b_rec
+        A = np.empty_like(H)
+        W_rec_T = rnn.W_rec.T
+
+        a, h = rnn.a, rnn.h
+        a_prev, h_prev = a, h
+        noise = 0
+        for i in range(i_end - i_start):
+
+            # Trial structure
+            if self.trial_switch is not None:
+                if self.trial_switch[i_start + i] == 1:
+                    self.i_trial += 1
+                    try:
+                        rnn.trial_type = self.trial_type[i_start + i]
+                    except TypeError:
+                        pass
+                    if self.reset_sigma is not None:
+                        h = np.random.normal(0, self.reset_sigma, state_shape)
+                        h = h.astype(rnn.dtype, copy=False)
+                        a = rnn.activation.f(h)
+
+            # Recurrent update
+            a_prev, h_prev = a, h
+            H[i] += a.dot(W_rec_T)
+            h = H[i]
+            A[i] = (1 - rnn.alpha) * a + rnn.alpha * rnn.activation.f(h)
+            if self.sigma > 0:
+                noise = self.sigma * np.random.normal(0, rnn.alpha,
+                                                      state_shape)
+                A[i] += noise
+            a = A[i]
+
+        # Outputs, losses and errors for all time steps at once
+        Z = A.dot(rnn.W_out.T) + rnn.b_out
+        Y_hat = rnn.output.f(Z)
+        losses, errors = rnn.loss.f_and_f_prime(Z, Y)
+        if self.loss_mask is not None:
+            mask = self.loss_mask[i_start:i_end]
+            mask = mask.reshape(mask.shape + (1,) * (losses.ndim - mask.ndim))
+            losses = losses * mask
+            errors = errors * np.expand_dims(mask, -1)
+
+        # Leave the network as the time loop would have
+        rnn.x, rnn.y = np.copy(X[-1]), np.copy(Y[-1])
+        rnn.h_prev, rnn.a_prev = np.copy(h_prev), np.copy(a_prev)
+        rnn.h, rnn.a = np.copy(H[-1]), np.copy(A[-1])
+        rnn.z_prev = Z[-2] if Z.shape[0] > 1 else np.copy(rnn.z)
+        rnn.z = Z[-1]
+        rnn.y_hat, rnn.loss_, rnn.error = Y_hat[-1], losses[-1], errors[-1]
+        rnn.noise = noise
+        rnn.x_prev, rnn.y_prev = np.copy(X[-1]), np.copy(Y[-1])
+
+        # Monitors
+        results = {'rnn.x': np.copy(X), 'rnn.y': np.copy(Y), 'rnn.h': H,
+                   'rnn.a': A,
+                   'rnn.z': Z, 'rnn.y_hat': Y_hat, 'rnn.loss_': losses,
+                   'rnn.error': errors}
+        for key in self.mons:
+            self.mons[key].extend(results[parse_monitor_key(key)[0]])
+        self.monitors_to_arrays()
 
     def trial_structure(self):
         """Resets learning algorithm and/or network state between trials."""
@@ -264,7 +583,8 @@ class Simulation:
             except TypeError:
                 pass
             if self.reset_sigma is not None:
-                self.rnn.reset_network(sigma=self.reset_sigma)
+                self.rnn.reset_network(sigma=self.reset_sigma,
+                                       batch_size=self.batch_size)
                 try:
                     self.learn_alg.reset_learning()
                 except AttributeError:
@@ -286,79 +606,149 @@ class Simulation:
 
         # Compare outputs with labels, get immediate loss and errors
         rnn.y_hat = rnn.output.f(rnn.z)
-        rnn.loss_ = rnn.loss.f(rnn.z, rnn.y)
-        rnn.error = rnn.loss.f_prime(rnn.z, rnn.y)
+        rnn.loss_, rnn.error = rnn.loss.f_and_f_prime(rnn.z, rnn.y)
 
         # Re-scale losses and errors if trial structure is provided
         if self.loss_mask is not None:
             # Is this clunky numpy code or the slickeset use of numpy broadcasting
             # rules maybe ever? You be the judge. Effortless translation into
             # dimension-wise loss if that's a thing you care about.
-            rnn.loss_ *= self.loss_mask[self.i_t]
-            rnn.error *= self.loss_mask[self.i_t]
+            if self.batch_size is None:
+                rnn.loss_ *= self.loss_mask[self.i_t]
+                rnn.error *= self.loss_mask[self.i_t]
+            else:  # Mask is either shared or per stream, never per dimension
+                rnn.loss_ *= self.loss_mask[self.i_t]
+                rnn.error *= np.expand_dims(self.loss_mask[self.i_t], -1)
 
     def train_step(self):
         """Uses self.learn_alg to calculate gradients and self.optimizer to
         apply them to self.rnn. Also calculates gradients from comparison
         algorithms."""
 
-        # Pointer for convenience
-        rnn = self.rnn
-
         ### --- Continual learning --- ###
 
         if self.learn_alg.CL_method is not None and self.i_t > 0:
-            self.learn_alg.CL_method.mini_update(self)
-            if self.task_marker[self.i_t] != self.task_marker[self.i_t - 1]:
-                self.learn_alg.CL_method.task_switch_update(self)
+            with self.profiler('CL_method'):
+                self.learn_alg.CL_method.mini_update(self)
+                if (self.task_marker[self.i_t] !=
+                        self.task_marker[self.i_t - 1]):
+                    self.learn_alg.CL_method.task_switch_update(self)
 
         ### --- Calculate gradients --- ###
 
         # Update learn_alg variables and get gradients
-        self.learn_alg.update_learning_vars()
-        self.grads_list = self.learn_alg()
+        with self.profiler('learn_alg.update_learning_vars'):
+            self.learn_alg.update_learning_vars()
+        with self.profiler('learn_alg'):
+            if self.accumulate_grads is None:
+                self.grads_list = self.learn_alg()
+            else:
+                self.grads_list = self.learn_alg.get_grads()
+                self.accumulate(self.grads_list)
 
         ### --- Calculate gradients for comparison algorithms --- ###
 
         if len(self.comp_algs) > 0:
-            self.compare_algorithms()
+            with self.profiler('compare_algorithms'):
+                self.compare_algorithms()
 
         ### --- Pass gradients to optimizer --- ###
 
         # Only update on schedule (default update_interval=1)
         if self.i_t % self.update_interval == 0:
-            # Get updated parameters
-            rnn.params = self.optimizer.get_updated_params(rnn.params,
-                                                           self.grads_list)
-            rnn.W_rec, rnn.W_in, rnn.b_rec, rnn.W_out, rnn.b_out = rnn.params
+            with self.profiler('optimizer'):
+                if self.accumulate_grads is not None:
+                    if self.accumulate_grads == 'mean':
+                        self.grads_accum /= self.n_accumulated
+                    self.n_accumulated = 0
+                    self.grads_list = self.learn_alg.process_grads(
+                        list(self.grads_accum_list))
+                self.update_params()
+
+    @staticmethod
+    def are_views(grads_list, views):
+        """Checks whether grads_list consists of exactly the arrays in
+        views."""
+
+        return (len(views) == len(grads_list) and
+                all(g is v for g, v in zip(grads_list, views)))
+
+    def accumulate(self, grads_list):
+        """Adds unprocessed gradients to the buffer grads_accum, overwriting
+        it at the first time step after an update. If the gradients are the
+        views into the flat buffer of the learning algorithm, this is one
+        vectorized operation."""
+
+        if self.are_views(grads_list, getattr(self.learn_alg, 'grads_list',
+                                              [])):
+            pairs = [(self.grads_accum, self.learn_alg.grads)]
+        else:
+            pairs = zip(self.grads_accum_list, grads_list)
+
+        for accum, grads in pairs:
+            if self.n_accumulated == 0:
+                accum[...] = grads
+            else:
+                accum += grads
+        self.n_accumulated += 1
+
+    def update_params(self):
+        """Updates the network parameters in place by one step of the
+        optimizer.
+
+        rnn.theta is always updated with one fused update from a flat
+        gradient buffer. This is that of the learning algorithm or
+        grads_accum if grads_list consists of its views, as it does unless
+        e.g. a continual learning method replaced them; otherwise grads_list
+        is first copied into grads_flat. The optimizer state thus keeps the
+        layout of rnn.theta whichever path a time step takes."""
+
+        rnn = self.rnn
+        if self.accumulate_grads is None:
+            grads = getattr(self.learn_alg, 'grads', None)
+            views = getattr(self.learn_alg, 'grads_list', [])
+        else:
+            grads, views = self.grads_accum, self.grads_accum_list
+        if not self.are_views(self.grads_list, views):
+            for buffer, grad in zip(self.grads_flat_list, self.grads_list):
+                buffer[...] = grad
+            grads = self.grads_flat
+        self.optimizer.step_(rnn.theta, grads, split=rnn.split_params)
+        rnn.clear_cache()
 
     def end_time_step(self, data):
         """Cleans up after each time step in the time loop."""
 
         # Compute spectral radii if desired
-        self.get_radii_and_norms()
+        with self.profiler('get_radii_and_norms'):
+            self.get_radii_and_norms()
 
         # Monitor relevant variables
-        self.update_monitors()
+        with self.profiler('update_monitors'):
+            self.update_monitors()
 
         # Evaluate model and save if performance is best
         if self.best_model_interval is not None and self.mode == 'train':
             if self.i_t % self.best_model_interval == 0:
-                self.save_best_model(data)
+                with self.profiler('save_best_model'):
+                    self.save_best_model(data)
 
         if self.checkpoint_interval is not None and self.mode == 'train':
             if type(self.checkpoint_interval) is int:
                 if self.i_t % self.checkpoint_interval == 0:
-                    self.checkpoint_model()
+                    with self.profiler('checkpoint_model'):
+                        self.checkpoint_model()
             if type(self.checkpoint_interval) is list:
                 if self.i_t in self.checkpoint_interval:
-                    self.checkpoint_model()
+                    with self.profiler('checkpoint_model'):
+                        self.checkpoint_model()
 
         # Make report if conditions are met
         if (self.i_t % self.report_interval == 0 and
                 self.i_t > 0 and
                 self.verbose):
-            self.report_progress(data)
+            with self.profiler('report_progress'):
+                self.report_progress(data)
 
         # Current inputs/labels become previous inputs/labels
         self.rnn.x_prev = self.rnn.x.copy()
@@ -399,39 +789,52 @@ class Simulation:
                 summary += loss_summary
                 self.test_loss = test_loss
 
+        if self.profiling:
+            summary += 'Profile: \n' + self.profiler.summary()
+
         if self.print:
             print(summary.format(progress, time_elapsed))
 
     def update_monitors(self):
-        """Loops through the monitor keys and appends current value of any
-        object's attribute found."""
-
-        for key in self.mons:
+        """Loops through the monitor keys and passes the current value of any
+        object's attribute found to the monitor's buffer, which applies the
+        key's recording policy. Spectral radii and norms are handled by
+        get_radii_and_norms."""
+
+        for key, buffer in self.mons.items():
+            attr = parse_monitor_key(key)[0]
+            if attr.split('-')[-1] in ['radius', 'norm']:
+                continue
+            if not buffer.wants_value():
+                buffer.skip()
+                continue
             try:
-                self.mons[key].append(rgetattr(self, key))
+                buffer.append(rgetattr(self, attr))
             except AttributeError:
-                pass
+                buffer.skip()
 
     def monitors_to_arrays(self):
-        """Recasts monitors (lists by default) as numpy arrays for ease of use
-        after running."""
+        """Replaces each monitor buffer by the numpy array (or np.memmap) of
+        its stored values for ease of use after running."""
 
         for key in self.mons:
-            try:
-                self.mons[key] = np.array(self.mons[key])
-            except ValueError:
-                pass
+            self.mons[key] = self.mons[key].array()
 
     def get_radii_and_norms(self):
         """Calculates the spectral radii and/or norms of any monitor keys
-        where this is specified."""
+        where this is specified, skipping steps the key's recording policy
+        would not keep."""
 
         for feature, func in zip(['radius', 'norm'],
                                  [get_spectral_radius, norm]):
-            for key in self.mons:
-                if feature in key:
-                    attr = key.split('-')[0]
-                    self.mons[key].append(func(rgetattr(self, attr)))
+            for key, buffer in self.mons.items():
+                attr = parse_monitor_key(key)[0]
+                if attr.split('-')[-1] == feature:
+                    if buffer.wants_value():
+                        attr = attr.split('-')[0]
+                        buffer.append(func(rgetattr(self, attr)))
+                    else:
+                        buffer.skip()
 
     def save_best_model(self, data):
         """Runs a test simulation, compares loss to current best model, and
@@ -452,8 +855,12 @@ class Simulation:
         """Creates copies of all relevant objects for reproducing training
         trajectory."""
 
-        checkpoint = {'rnn': deepcopy(self.rnn),
-                      'i_t': copy(self.i_t)}
+        # A Checkpoint_Store copies the parameters and state itself
+        if isinstance(self.checkpoints, Checkpoint_Store):
+            rnn = self.rnn
+        else:
+            rnn = deepcopy(self.rnn)
+        checkpoint = {'rnn': rnn, 'i_t': copy(self.i_t)}
 
         if self.checkpoint_learn_alg:
             checkpoint['learn_alg'] = deepcopy(self.learn_alg)
@@ -477,49 +884,62 @@ class Simulation:
 
     def compare_algorithms(self):
         """Computes alignment matrix for different learning algorithms run
-        in parallel."""
+        in parallel.
+
+        Gradients are compared for the time step T_lag steps ago, the largest
+        comparison_lag of the algorithms, so each algorithm's gradient is
+        taken from T_lag - comparison_lag steps ago. Where any of them is not
+        available, e.g. because it is not sampled at that time step (see
+        BPTT_Oracle), the alignment matrix is filled with NaN."""
 
         # Update learning variables for the algorithms *not* being used to train
         # the network
         for i_alg, alg in enumerate(self.algs):
             if i_alg > 0:  # Only the comparison algorithms
-                alg.update_learning_vars()
-                alg()
+                with self.profiler('compare_algorithms/' + alg.name):
+                    alg.update_learning_vars()
+                    alg()
             key = alg.name
-            # Store the rec_grad array for each algorithm in a list
-            self.rec_grads_dict[key].append(alg.rec_grads)
+            # Store the rec_grad array for each algorithm in a list, or None
+            # if it was not computed at this time step. Algorithms may reuse
+            # their gradient buffers, so lagged gradients are copied.
+            if getattr(alg, 'sampled', True):
+                if self.T_lag > 0:
+                    self.rec_grads_dict[key].append(np.copy(alg.rec_grads))
+                else:
+                    self.rec_grads_dict[key].append(alg.rec_grads)
+            else:
+                self.rec_grads_dict[key].append(None)
         # Get array of gradient alignments
         if 'alignment_matrix' in self.mons.keys():
             n_algs = len(self.algs)
-            self.alignment_matrix = np.zeros((n_algs, n_algs))
-            self.alignment_weights = np.zeros((n_algs, n_algs))
-            for i, key_i in enumerate(self.rec_grads_dict):
-                for j, key_j in enumerate(self.rec_grads_dict):
-
-                    # For comparison with Future_BPTT, must lag gradients by
-                    # the truncation horizon
-                    if 'F-BPTT' in key_i:
-                        i_index = -1
-                    else:
-                        i_index = 0
-                    if 'F-BPTT' in key_j:
-                        j_index = -1
-                    else:
-                        j_index = 0
+            self.alignment_matrix = np.full((n_algs, n_algs), np.nan)
+            self.alignment_weights = np.full((n_algs, n_algs), np.nan)
 
-                    # Store normalized dot product for each pair of algorithms
-                    # in the alignment matrix and norm product in alignment
-                    # strength matrix.
-                    g_i = self.rec_grads_dict[key_i][i_index]
-                    g_j = self.rec_grads_dict[key_j][j_index]
-                    alignment = normalized_dot_product(g_i, g_j)
-                    self.alignment_matrix[i, j] = alignment
-                    self.alignment_weights[i, j] = norm(g_i) * norm(g_j)
+            # Gradients of all algorithms for the same time step
+            grads = []
+            for alg in self.algs:
+                rec_grads_list = self.rec_grads_dict[alg.name]
+                i_index = -1 - (self.T_lag - alg.comparison_lag)
+                if len(rec_grads_list) >= -i_index:
+                    grads.append(rec_grads_list[i_index])
+                else:
+                    grads.append(None)
+
+            if all(g is not None for g in grads):
+                # Store normalized dot product for each pair of algorithms
+                # in the alignment matrix and norm product in alignment
+                # strength matrix.
+                for i, g_i in enumerate(grads):
+                    for j, g_j in enumerate(grads):
+                        alignment = normalized_dot_product(g_i, g_j)
+                        self.alignment_matrix[i, j] = alignment
+                        self.alignment_weights[i, j] = norm(g_i) * norm(g_j)
 
         # Keep each list (for each algorithm) of rec_grads only as long as the
-        # truncation horizon by deleting the oldest one.
+        # largest lag by deleting the oldest one.
         for key in self.rec_grads_dict:
-            if len(self.rec_grads_dict[key]) >= self.T_lag:
+            if len(self.rec_grads_dict[key]) > self.T_lag:
                 del (self.rec_grads_dict[key][0])
 
     def resume_sim_at_checkpoint(self, data, i_checkpoint, N=None,
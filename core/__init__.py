@@ -1,2 +1,8 @@
+from .Checkpoint_Store import Checkpoint_Store
+from .Monitor_Buffer import Monitor_Buffer
+from .Population import Population
+from .Population_Simulation import Population_Simulation
+from .Profiler import Profiler
 from .RNN import RNN
+from .Run_Directory import Run_Directory, save_run_directory
 from .Simulation import Simulation
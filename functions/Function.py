@@ -1,16 +1,45 @@
 class Function:
     """Defines a function and its derivative.
 
+    All functions act element-wise or along the last axis, so that they
+    accept single vectors as well as arrays of shape (B, n) or (T, n) for
+    batches or whole sequences.
+
     Attributes:
         f (function): An element-wise differentiable function that acts on a
-            1-d numpy array of arbitrary dimension. May include a second
-            argument for a label, e.g. for softmax-cross-entropy.
+            numpy array whose last axis has arbitrary dimension. May include a
+            second argument for a label, e.g. for softmax-cross-entropy.
         f_prime (function): The element-wise derivative of f with respect to
-            the first argument, must also act on 1-d numpy arrays of arbitrary
-            dimension."""
+            the first argument, with the same signature as f.
+        f_prime_from_f (function or None): The derivative expressed in terms
+            of the value of f alone, e.g. 1 - f^2 for tanh, so that it can
+            reuse an already computed forward pass. None if not available.
+        fused (function or None): Computes f and f_prime together in one
+            pass, sharing intermediate results. None if f and f_prime share
+            nothing beyond the value of f."""
+
+    # Defaults for functions pickled before these were attributes
+    f_prime_from_f = None
+    fused = None
 
-    def __init__(self, f, f_prime):
-        """Inits an instance of Function by specifying f and f_prime."""
+    def __init__(self, f, f_prime, f_prime_from_f=None, fused=None):
+        """Inits an instance of Function by specifying f and f_prime, and
+        optionally f_prime_from_f and fused."""
 
         self.f = f
         self.f_prime = f_prime
+        self.f_prime_from_f = f_prime_from_f
+        self.fused = fused
+
+    def f_and_f_prime(self, *args):
+        """Returns the values of f and f_prime at the given arguments, with as
+        much shared computation as possible."""
+
+        if self.fused is not None:
+            return self.fused(*args)
+
+        value = self.f(*args)
+        if self.f_prime_from_f is not None:
+            return value, self.f_prime_from_f(value)
+
+        return value, self.f_prime(*args)
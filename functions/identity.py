@@ -13,4 +13,5 @@ def identity_derivative(z):
     return np.ones_like(z)
 
 
-identity = Function(identity_, identity_derivative)
+identity = Function(identity_, identity_derivative,
+                    f_prime_from_f=identity_derivative)
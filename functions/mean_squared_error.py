@@ -6,12 +6,19 @@ from functions.Function import Function
 ### --- Define Mean-Squared Error --- ###
 
 def mean_squared_error_(z, y):
-    return 0.5 * np.square(z - y).mean()
+    return 0.5 * np.square(z - y).mean(axis=-1)
 
 
 def mean_squared_error_derivative(z, y):
     return z - y
 
 
+def mean_squared_error_fused(z, y):
+    error = z - y
+
+    return 0.5 * np.square(error).mean(axis=-1), error
+
+
 mean_squared_error = Function(mean_squared_error_,
-                              mean_squared_error_derivative)
+                              mean_squared_error_derivative,
+                              fused=mean_squared_error_fused)
@@ -16,4 +16,8 @@ def relu_derivative(h):
     return (h > 0) * (right_slope - left_slope) + left_slope
 
 
-relu = Function(relu_, relu_derivative)
+def relu_derivative_from_f(r):
+    return (r > 0) * (right_slope - left_slope) + left_slope
+
+
+relu = Function(relu_, relu_derivative, f_prime_from_f=relu_derivative_from_f)
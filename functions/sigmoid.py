@@ -10,7 +10,12 @@ def sigmoid_(z):
 
 
 def sigmoid_derivative(z):
-    return sigmoid_(z) * (1 - sigmoid_(z))
+    return sigmoid_derivative_from_f(sigmoid_(z))
 
 
-sigmoid = Function(sigmoid_, sigmoid_derivative)
+def sigmoid_derivative_from_f(s):
+    return s * (1 - s)
+
+
+sigmoid = Function(sigmoid_, sigmoid_derivative,
+                   f_prime_from_f=sigmoid_derivative_from_f)
@@ -1,21 +1,27 @@
 import numpy as np
 
 from functions.Function import Function
+from functions.sigmoid import sigmoid_
 
 
 ### --- Define sigmoid cross entropy --- ###
 
 def sigmoid_cross_entropy_(z, y):
-    p = sigmoid.f(z)
-
-    return -np.mean(y * np.log(p) + (1 - y) * np.log(1 - p))
+    return sigmoid_cross_entropy_fused(z, y)[0]
 
 
 def sigmoid_cross_entropy_derivative(z, y):
-    p = sigmoid.f(z)
+    # (-y / p + (1 - y) / (1 - p)) * p * (1 - p), simplified
+    return sigmoid_(z) - y
+
+
+def sigmoid_cross_entropy_fused(z, y):
+    p = sigmoid_(z)
+    loss = -np.mean(y * np.log(p) + (1 - y) * np.log(1 - p), axis=-1)
 
-    return (-y / p + (1 - y) / (1 - p)) * sigmoid.f_prime(z)
+    return loss, p - y
 
 
 sigmoid_cross_entropy = Function(sigmoid_cross_entropy_,
-                                 sigmoid_cross_entropy_derivative)
+                                 sigmoid_cross_entropy_derivative,
+                                 fused=sigmoid_cross_entropy_fused)
@@ -6,15 +6,19 @@ from functions.Function import Function
 ### --- Define softmax --- ###
 
 def softmax_(z):
-    z = z - np.amax(z)
+    z = z - np.amax(z, axis=-1, keepdims=True)
+    exp_z = np.exp(z)
 
-    return np.exp(z) / np.sum(np.exp(z))
+    return exp_z / np.sum(exp_z, axis=-1, keepdims=True)
 
 
 def softmax_derivative(z):
-    z = z - np.amax(z)
+    return softmax_derivative_from_f(softmax_(z))
 
-    return np.multiply.outer(softmax_(z), 1 - softmax_(z))
 
+def softmax_derivative_from_f(p):
+    return p[..., :, np.newaxis] * (1 - p)[..., np.newaxis, :]
 
-softmax = Function(softmax_, softmax_derivative)
+
+softmax = Function(softmax_, softmax_derivative,
+                   f_prime_from_f=softmax_derivative_from_f)
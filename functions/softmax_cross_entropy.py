@@ -7,15 +7,20 @@ from functions.softmax import softmax_
 ### --- Define softmax cross-entropy --- ###
 
 def softmax_cross_entropy_(z, y, epsilon=0.0001):
-    p = softmax_(z)
-    p = np.maximum(p, epsilon)  # Regularize in case p is small
-
-    return -y.dot(np.log(p))
+    return softmax_cross_entropy_fused(z, y, epsilon)[0]
 
 
 def softmax_cross_entropy_derivative(z, y):
     return softmax_(z) - y
 
 
+def softmax_cross_entropy_fused(z, y, epsilon=0.0001):
+    p = softmax_(z)
+    loss = -np.sum(y * np.log(np.maximum(p, epsilon)), axis=-1)
+
+    return loss, p - y
+
+
 softmax_cross_entropy = Function(softmax_cross_entropy_,
-                                 softmax_cross_entropy_derivative)
+                                 softmax_cross_entropy_derivative,
+                                 fused=softmax_cross_entropy_fused)
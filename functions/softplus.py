@@ -1,6 +1,7 @@
 import numpy as np
 
 from functions.Function import Function
+from functions.sigmoid import sigmoid_
 
 
 ### --- Define softplus --- ###
@@ -13,4 +14,9 @@ def softplus_derivative(z):
     return sigmoid_(z)
 
 
-softplus = Function(softplus_, softplus_derivative)
+def softplus_derivative_from_f(s):
+    return -np.expm1(-s)
+
+
+softplus = Function(softplus_, softplus_derivative,
+                    f_prime_from_f=softplus_derivative_from_f)
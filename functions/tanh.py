@@ -10,7 +10,11 @@ def tanh_(z):
 
 
 def tanh_derivative(z):
-    return 1 - np.tanh(z) ** 2
+    return tanh_derivative_from_f(np.tanh(z))
 
 
-tanh = Function(tanh_, tanh_derivative)
+def tanh_derivative_from_f(t):
+    return 1 - np.square(t)
+
+
+tanh = Function(tanh_, tanh_derivative, f_prime_from_f=tanh_derivative_from_f)
@@ -1,5 +1,7 @@
 import numpy as np
 
+from utils import get_default_dtype
+
 
 class Multi_Task:
     """A class for online training in a multi-task setup. The class is initiated
@@ -84,7 +86,10 @@ class Multi_Task:
 
         return total_data
 
-    def gen_data(self, N_train, N_test):
+    def gen_data(self, N_train, N_test, dtype=None):
+
+        if dtype is None:
+            dtype = get_default_dtype()
 
         data = {}
 
@@ -104,4 +109,8 @@ class Multi_Task:
             if i_task == len(self.tasks.keys()) - 1:
                 data['test'] = data[key]
 
+        for mode in data:
+            for key in ['X', 'Y']:
+                data[mode][key] = np.asarray(data[mode][key], dtype=dtype)
+
         return data
@@ -1,3 +1,8 @@
+import numpy as np
+
+from utils import get_default_dtype
+
+
 class Task:
     """Parent class for all tasks. A Task is a class whose instances generate
     datasets to be used for training RNNs.
@@ -18,23 +23,28 @@ class Task:
         self.n_in = n_in
         self.n_out = n_out
 
-    def gen_data(self, N_train, N_test):
+    def gen_data(self, N_train, N_test, dtype=None):
         """Generates a data dict with a given number of train and test examples.
 
         Args:
             N_train (int): number of training examples
             N_test (int): number of testing examples
+            dtype (numpy dtype): dtype of inputs and labels. Default is
+                utils.get_default_dtype().
         Returns:
             data (dict): Dictionary pointing to 2 sub-dictionaries 'train'
                 and 'test', each of which has keys 'X' and 'Y' for inputs
                 and labels, respectively."""
 
+        if dtype is None:
+            dtype = get_default_dtype()
+
         data = {'train': {}, 'test': {}}
 
         for mode, N in zip(['train', 'test'], [N_train, N_test]):
             X, Y, trial_type, trial_switch, loss_mask = self.gen_dataset(N)
-            data[mode]['X'] = X
-            data[mode]['Y'] = Y
+            data[mode]['X'] = np.asarray(X, dtype=dtype)
+            data[mode]['Y'] = np.asarray(Y, dtype=dtype)
             data[mode]['trial_type'] = trial_type
             data[mode]['trial_switch'] = trial_switch
             data[mode]['loss_mask'] = loss_mask
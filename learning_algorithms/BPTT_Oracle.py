@@ -0,0 +1,104 @@
+import numpy as np
+
+from learning_algorithms.Learning_Algorithm import Learning_Algorithm
+
+
+class BPTT_Oracle(Learning_Algorithm):
+    """Computes the exact gradient of the current loss with respect to the
+    recurrent parameters over the last T_truncation time steps, as a cheap
+    reference for comparison with approximate algorithms.
+
+    RTRL's gradient at time t is q_t M_t (see RTRL), which costs O(n_h^4) per
+    time step to maintain. The same quantity, restricted to the influence of
+    the parameters over the last T_truncation time steps, is obtained by
+    backpropagating q_t through buffered network variables,
+
+    dL_t/dW_{ij} = \\sum_{s} c^{(s)}_i \\alpha\\phi'(h^{(s)}_i) a_hat^{(s)}_j,
+    c^{(s - 1)} = c^{(s)} J^{(s)}, c^{(t)} = q_t,                    (1)
+
+    with matrix-free vector-Jacobian products (see RNN.vjp), at O(T_truncation
+    n_h^2) per time step. Each J^{(s)} is evaluated with the W_rec of time
+    step s, so the result stays exact while the network is training. The
+    window is cleared by reset_learning, so that for trials shorter than
+    T_truncation the result equals that of RTRL exactly.
+
+    Since the gradient is aligned with the current time step, no lag is
+    needed when comparing it with other online algorithms in
+    Simulation.compare_algorithms. Only \\phi'(h), a_hat and W_rec are stored
+    at every time step, and the backward pass may be carried out only every
+    sample_interval time steps; in between, sampled is False, rec_grads are 0,
+    and compare_algorithms skips the alignment.
+
+    Attributes:
+        T_truncation (int): Number of past time steps in the window.
+        sample_interval (int): Number of time steps between gradient
+            computations.
+        sampled (bool): Whether rec_grads of the current time step were
+            computed."""
+
+    def __init__(self, rnn, T_truncation, sample_interval=1, **kwargs):
+        """Inits a BPTT_Oracle instance.
+
+        Args:
+            T_truncation (int): Number of past time steps in the window.
+            sample_interval (int): Number of time steps between gradient
+                computations. Default is 1."""
+
+        self.name = 'BPTT-Oracle'
+        allowed_kwargs_ = set()
+        super().__init__(rnn, allowed_kwargs_, **kwargs)
+
+        self.T_truncation = T_truncation
+        self.sample_interval = sample_interval
+        self.phi_prime_history = np.zeros((T_truncation, self.n_h),
+                                          dtype=self.dtype)
+        self.a_hat_history = np.zeros((T_truncation, self.m),
+                                      dtype=self.dtype)
+        self.W_rec_history = np.zeros((T_truncation, self.n_h, self.n_h),
+                                      dtype=self.dtype)
+        self.cD = np.zeros((T_truncation, self.n_h), dtype=self.dtype)
+        self.i_step = -1
+        self.reset_learning()
+
+    def update_learning_vars(self):
+        """Stores \\phi'(h), a_hat and W_rec of the current time step,
+        overwriting those of the oldest one if the window is full."""
+
+        self.i_newest = (self.i_newest + 1) % self.T_truncation
+        self.phi_prime_history[self.i_newest] = self.rnn.get_phi_prime()
+        self.a_hat_history[self.i_newest] = self.rnn.get_a_hat()
+        self.W_rec_history[self.i_newest] = self.rnn.W_rec
+        self.n_history = min(self.n_history + 1, self.T_truncation)
+
+        self.i_step += 1
+        self.sampled = (self.i_step % self.sample_interval == 0)
+
+    def get_rec_grads(self):
+        """Backpropagates q through the window via Eq. (1) if the current time
+        step is sampled, otherwise returns 0s.
+
+        Returns:
+            An array of shape (n_h, m) representing the recurrent gradient."""
+
+        if not self.sampled:
+            return np.zeros((self.n_h, self.m), dtype=self.dtype)
+
+        # Newest to oldest
+        indices = self.i_newest - np.arange(self.n_history)
+        indices %= self.T_truncation
+        c = self.q
+        for i_BPTT, i in enumerate(indices):
+            phi_prime = self.phi_prime_history[i]
+            np.multiply(c, self.rnn.alpha * phi_prime, out=self.cD[i])
+            if i_BPTT < self.n_history - 1:
+                c = self.rnn.vjp(c, phi_prime=phi_prime,
+                                 W_rec=self.W_rec_history[i])
+
+        return self.cD[indices].T.dot(self.a_hat_history[indices])
+
+    def reset_learning(self):
+        """Empties the window."""
+
+        self.i_newest = -1
+        self.n_history = 0
+        self.sampled = False
@@ -0,0 +1,120 @@
+import numpy as np
+
+from learning_algorithms.RTRL import RTRL
+from utils import temporary_memmap
+
+
+class Chunked_RTRL(RTRL):
+    """Implements exact RTRL (see RTRL) with the influence tensor updated in
+    place, one block at a time, so that large networks can be trained within
+    bounded memory.
+
+    Since the Jacobian in Eq. (1) of RTRL contracts only the first axis of
+    dadw, each block dadw[:, i0:i1, :] of the parameter rows of W updates
+    independently of the others. Each block is copied into a scratch buffer
+    of n_h * block_size * m elements, multiplied by the factors of the Jacobian
+    into a second one, and written back, so that besides dadw itself only two
+    scratch buffers are ever allocated. Optionally, dadw is backed by an
+    np.memmap file, so that it may exceed the available memory.
+
+    Attributes:
+        block_size (int): Number of rows of W, i.e. slices dadw[:, i, :],
+            updated together.
+        memmap_dir (str or None): Directory of the temporary file backing
+            dadw, if it is memory mapped. The file is removed once mapped (see
+            utils.temporary_memmap)."""
+
+    def __init__(self, rnn, M_decay=1, block_size=None, memmap_dir=None,
+                 **kwargs):
+        """Inits a Chunked_RTRL instance.
+
+        Args:
+            block_size (int): Number of rows of W updated together. Default is
+                as many as fit 2 ** 20 elements in each scratch buffer.
+            memmap_dir (str): Directory in which to create a memory-mapped
+                file backing dadw. If None (default), dadw is held in memory.
+            Other arguments are as for RTRL."""
+
+        self.memmap_dir = memmap_dir
+        super().__init__(rnn, M_decay=M_decay, **kwargs)
+        self.name = 'Chunked-RTRL'
+
+        if block_size is None:
+            block_size = 2 ** 20 // (self.n_h * self.m)
+        self.block_size = int(min(max(block_size, 1), self.n_h))
+        size = self.n_h * self.block_size * self.m
+        self.scratch = np.empty(size, dtype=self.dtype)
+        self.scratch_out = np.empty(size, dtype=self.dtype)
+
+    def allocate_influence(self, shape):
+        """Returns a zero-initialized influence tensor of given shape, memory
+        mapped if memmap_dir is given."""
+
+        if self.memmap_dir is None:
+            return np.zeros(shape, dtype=self.dtype)
+
+        return temporary_memmap(shape, self.dtype, dir=self.memmap_dir,
+                                prefix='dadw_')
+
+    def blocks(self):
+        """Yields the (start, end) rows of W of each block."""
+
+        for i0 in range(0, self.n_h, self.block_size):
+            yield i0, min(i0 + self.block_size, self.n_h)
+
+    def update_learning_vars(self):
+        """Updates the influence tensor via Eq. (1) of RTRL, block by
+        block."""
+
+        self.a_hat = self.rnn.get_a_hat()
+        D, W_rec = self.rnn.get_jacobian_factors()
+        self.D = D
+        decay = self.M_decay
+        n_h, m = self.n_h, self.m
+
+        for i0, i1 in self.blocks():
+            b = i1 - i0
+            M = self.scratch[:n_h * b * m].reshape((n_h, b * m))
+            JM = self.scratch_out[:n_h * b * m].reshape((n_h, b * m))
+            M.reshape((n_h, b, m))[:] = self.dadw[:, i0:i1]
+
+            # Jacobian factors applied as in RNN.jvp
+            np.dot(W_rec, M, out=JM)
+            JM *= D[:, np.newaxis]
+            M *= (1 - self.rnn.alpha)
+            JM += M
+            if decay != 1:
+                JM *= decay
+
+            # Add M_immediate to the diagonal slices dadw[i, i, :]
+            JM = JM.reshape((n_h, b, m))
+            JM[np.arange(i0, i1), np.arange(b)] += np.multiply.outer(
+                D[i0:i1], self.a_hat)
+
+            self.dadw[:, i0:i1] = JM
+
+    def get_rec_grads(self):
+        """Calculates recurrent grads of shape (n_h, m) using Eq. (2) of RTRL,
+        block by block."""
+
+        rec_grads = np.empty((self.n_h, self.m), dtype=self.dtype)
+        for i0, i1 in self.blocks():
+            rec_grads[i0:i1] = np.tensordot(self.q, self.dadw[:, i0:i1],
+                                            axes=1)
+
+        return rec_grads
+
+    def reset_learning(self):
+        """Resets learning algorithm by setting influence tensor to 0."""
+
+        self.dadw[:] = 0
+
+    def __getstate__(self):
+        """Pickles a memory-mapped influence tensor as a regular array."""
+
+        state = self.__dict__.copy()
+        if isinstance(self.dadw, np.memmap):
+            state['dadw'] = np.array(self.dadw)
+            state['memmap_dir'] = None
+
+        return state
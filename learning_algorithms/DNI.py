@@ -86,6 +86,7 @@ class DNI(Learning_Algorithm):
         if self.A is None:
             self.A = np.random.normal(0, np.sqrt(1 / self.m_out),
                                       (self.n_h, self.m_out))
+        self.A = np.asarray(self.A, dtype=self.dtype)
         self.A_ = np.copy(self.A)
 
     def update_learning_vars(self):
@@ -93,15 +94,13 @@ class DNI(Learning_Algorithm):
 
         if self.use_approx_J:  # If using approximate Jacobian, update it.
             self.update_J_approx()
-        else:  # Otherwise get the exact Jacobian.
-            self.rnn.get_a_jacobian()
 
         # Compute synthetic gradient estimate of credit assignment at previous
         # time step. This is NOT used to drive learning in W but rather to drive
         # learning in A.
         self.a_tilde_prev = np.concatenate([self.rnn.a_prev,
                                             self.rnn.y_prev,
-                                            np.array([1])])
+                                            np.ones(1, dtype=self.dtype)])
         self.sg = self.synthetic_grad(self.a_tilde_prev)
 
         # Compute the target, error and loss for the synthetic gradient function
@@ -142,7 +141,7 @@ class DNI(Learning_Algorithm):
 
         self.a_tilde = np.concatenate([self.rnn.a,
                                        self.rnn.y,
-                                       np.array([1])])
+                                       np.ones(1, dtype=self.dtype)])
 
         # Calculate the synthetic gradient for the 'next' (really the current,
         # but next relative to the previous) time step.
@@ -150,8 +149,8 @@ class DNI(Learning_Algorithm):
         # Backpropagate by one time step and add to q_prev to get sg_target.
         if self.use_approx_J:  # Approximate Jacobian
             sg_target = self.q_prev + sg_next.dot(self.J_approx)
-        else:  # Exact Jacobian
-            sg_target = self.q_prev + sg_next.dot(self.rnn.a_J)
+        else:  # Exact Jacobian, applied without forming it
+            sg_target = self.q_prev + self.rnn.vjp(sg_next)
 
         return sg_target
 
@@ -204,11 +203,9 @@ class DNI(Learning_Algorithm):
         # Calculate synthetic gradient
         self.sg = self.synthetic_grad(self.a_tilde)
         # Combine the first 3 factors of the RHS of Eq. (2) into sg_scaled
-        D = self.rnn.activation.f_prime(self.rnn.h)
+        D = self.rnn.get_phi_prime()
         self.sg_scaled = self.sg * self.rnn.alpha * D
 
-        self.a_hat = np.concatenate([self.rnn.a_prev,
-                                     self.rnn.x,
-                                     np.array([1])])
+        self.a_hat = self.rnn.get_a_hat()
         # Final result of Eq. (2)
         return np.multiply.outer(self.sg_scaled, self.a_hat)
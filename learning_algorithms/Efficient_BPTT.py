@@ -1,7 +1,6 @@
 import numpy as np
 
 from learning_algorithms.Learning_Algorithm import Learning_Algorithm
-from utils import norm
 
 
 class Efficient_BPTT(Learning_Algorithm):
@@ -13,7 +12,16 @@ class Efficient_BPTT(Learning_Algorithm):
     gradient for each interval is computed using the future-facing relation
     from Section 2. Thus 'update_learning_vars' is called at every step to
     update the memory of relevant network variables, while get_rec_grads only
-    returns non-zero elements every T_truncation time steps."""
+    returns non-zero elements every T_truncation time steps.
+
+    The memory consists of preallocated arrays a_hat_history, h_history and
+    q_history, with one row per time step in order of time, the first
+    n_history of which are filled. The backward sweep propagates the credit
+    assignment c with matrix-free vector-Jacobian products, stores c * D for
+    every time step, and computes the gradient as one product of the stacks
+    of c * D and a_hat. All arrays may carry leading axes, e.g. the
+    population axis of a core.Population, in which case the rnn's vjp acts
+    on each member separately."""
 
     def __init__(self, rnn, T_truncation, trial_based_truncation=False,
                  **kwargs):
@@ -30,22 +38,39 @@ class Efficient_BPTT(Learning_Algorithm):
             self.T_truncation = 0
             self.compute_gradient = False
 
-        # Initialize lists for storing network data
-        self.a_hat_history = []
-        self.h_history = []
-        self.q_history = []
+        # Buffers for storing network data, allocated on first use
+        self.a_hat_history = None
+        self.h_history = None
+        self.q_history = None
+        self.n_history = 0
 
     def update_learning_vars(self):
         """Updates the memory of the algorithm with the relevant network
         variables for running E-BPTT."""
 
-        # Add latest values to list
-        self.a_hat_history.insert(0, np.concatenate([self.rnn.a_prev,
-                                                     self.rnn.x,
-                                                     np.array([1])]))
-        self.h_history.insert(0, self.rnn.h)
+        # Add latest values to memory
         self.propagate_feedback_to_hidden()
-        self.q_history.insert(0, self.q)
+        self.push_history(self.rnn.get_a_hat(), self.rnn.h, self.q)
+
+    def push_history(self, a_hat, h, q):
+        """Stores the values of a_hat, h and q of the latest time step in the
+        next rows of the buffers, doubling their size if they are full."""
+
+        if self.a_hat_history is None:
+            capacity = max(self.T_truncation, 1)
+            self.a_hat_history, self.h_history, self.q_history = [
+                np.zeros((capacity,) + np.shape(value), dtype=self.dtype)
+                for value in [a_hat, h, q]]
+        elif self.n_history == self.a_hat_history.shape[0]:
+            self.a_hat_history, self.h_history, self.q_history = [
+                np.concatenate([history, np.zeros_like(history)])
+                for history in [self.a_hat_history, self.h_history,
+                                self.q_history]]
+
+        self.a_hat_history[self.n_history] = a_hat
+        self.h_history[self.n_history] = h
+        self.q_history[self.n_history] = q
+        self.n_history += 1
 
     def get_rec_grads(self):
         """Using the accumulated history of q, h and a_hat values over the
@@ -60,37 +85,44 @@ class Efficient_BPTT(Learning_Algorithm):
         if self.trial_based_truncation:
             compute_condition = self.compute_gradient
         else:
-            compute_condition = (len(self.a_hat_history) >= self.T_truncation)
+            compute_condition = (self.n_history >= self.T_truncation)
+
+        if compute_condition and self.T_truncation > 0:
 
-        if compute_condition:
+            # The latest T_truncation time steps, most recent last
+            T = self.T_truncation
+            i_start = self.n_history - T
+            H = self.h_history[i_start:self.n_history]
+            A_hat = self.a_hat_history[i_start:self.n_history]
+            Q = self.q_history[i_start:self.n_history]
+            phi_prime = self.rnn.activation.f_prime(H)
+            cD = np.empty_like(H)
 
-            # Initialize recurrent grads at 0
-            rec_grads = np.zeros((self.n_h, self.m))
             # Start with most recent credit assignment value
-            c = self.q_history.pop(0)
+            c = Q[-1]
 
-            for i_BPTT in range(self.T_truncation):
+            for i_BPTT in range(T - 1, -1, -1):
 
                 # Truncate credit assignment norm
                 if self.c_clip_norm is not None:
-                    if norm(c) > self.c_clip_norm:
-                        c = c * (self.c_clip_norm / norm(c))
+                    c_norm = np.sqrt(np.square(c).sum(axis=-1, keepdims=True))
+                    c = c * (self.c_clip_norm /
+                             np.maximum(c_norm, self.c_clip_norm))
 
-                # Access present values of h and a_hat
-                h = self.h_history.pop(0)
-                a_hat = self.a_hat_history.pop(0)
+                # Credit assigned to the pre-activations
+                np.multiply(c, self.rnn.alpha * phi_prime[i_BPTT],
+                            out=cD[i_BPTT])
 
-                # Use to get gradients w.r.t. weights from credit assignment
-                D = self.rnn.alpha * self.rnn.activation.f_prime(h)
-                rec_grads += np.multiply.outer(c * D, a_hat)
-
-                if i_BPTT == self.T_truncation - 1:  # Skip if at end
+                if i_BPTT == 0:  # Skip if at end
                     continue
 
                 # Use future-facing relation to backpropagate by one time step.
-                q = self.q_history.pop(0)
-                J = self.rnn.get_a_jacobian(h=h, update=False)
-                c = q + c.dot(J)
+                c = Q[i_BPTT - 1] + self.rnn.vjp(c,
+                                                 phi_prime=phi_prime[i_BPTT])
+
+            # Gradients w.r.t. weights from all credit assignments at once
+            rec_grads = np.einsum('t...i,t...j->...ij', cD, A_hat)
+            self.n_history = i_start
 
             if self.trial_based_truncation:
                 self.compute_gradient = False
@@ -101,9 +133,12 @@ class Efficient_BPTT(Learning_Algorithm):
         else:
 
             if self.trial_based_truncation:
-                self.T_truncation += 1
+                if compute_condition:  # Empty interval
+                    self.compute_gradient = False
+                else:
+                    self.T_truncation += 1
 
-            return np.zeros((self.n_h, self.m))
+            return np.zeros(self.q.shape + (self.m,), dtype=self.dtype)
 
     def reset_learning(self):
 
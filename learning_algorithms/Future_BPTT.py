@@ -15,7 +15,22 @@ class Future_BPTT(Learning_Algorithm):
     Details of computation are in paper. When a credit assignment estimate is
     calculated, the gradient is ultimately calculated according to
 
-    dL/dW_{ij} = c_i \phi'(h_i) a_hat_j                             (1)."""
+    dL/dW_{ij} = c_i \\phi'(h_i) a_hat_j                             (1).
+
+    The credit assignment estimates c, along with \\phi'(h) and a_hat, of the
+    last T_truncation time steps are kept in circular buffers c_history,
+    phi_prime_history and a_hat_history of T_truncation rows. Each new q is
+    backpropagated through the window with matrix-free vector-Jacobian
+    products
+
+    qJ = (q * \\alpha\\phi'(h)) W_rec + (1 - \\alpha) q
+
+    using the stored \\phi'(h), so that no Jacobian is ever formed and each
+    step costs O(T_truncation n_h^2).
+
+    The gradient returned at each time step is that of the time step
+    T_truncation - 1 steps earlier, which Simulation.compare_algorithms
+    accounts for via comparison_lag."""
 
     def __init__(self, rnn, T_truncation, **kwargs):
         """Inits an instance of Future_BPTT by specifying the network to
@@ -26,65 +41,84 @@ class Future_BPTT(Learning_Algorithm):
         super().__init__(rnn, allowed_kwargs_, **kwargs)
 
         self.T_truncation = T_truncation
+        self.comparison_lag = T_truncation - 1
+        self.reset_learning()
 
-        self.c_history = []
-        self.a_hat_history = []
-        self.h_history = []
+    def history_indices(self):
+        """Returns the rows of the circular buffers that are filled, from
+        oldest to newest."""
+
+        return (self.i_oldest + np.arange(self.n_history)) % self.T_truncation
 
     def update_learning_vars(self):
-        """Updates the list of credit assignment vectors according to Section
-        4.1.2 in the paper.
-
-        First updates relevant history with latest network variables
-        a_hat, h and q. Then backpropagates the latest q to each previous time
-        step, adding the result to each previous credit assignment estimate."""
-
-        # Update history
-        self.a_hat_history.insert(0, np.concatenate([self.rnn.a_prev,
-                                                     self.rnn.x,
-                                                     np.array([1])]))
-        self.h_history.insert(0, self.rnn.h)
-        self.propagate_feedback_to_hidden()
-        q = np.copy(self.q)
-        # Add immediate credit assignment to front of list
-        self.c_history.insert(0, q)
+        """Updates the credit assignment vectors according to Section 4.1.2
+        in the paper.
 
-        # Loop over truncation horizon and backpropagate q, pausing along way to
+        First stores the latest network variables a_hat, \\phi'(h) and q,
+        overwriting the oldest ones if the buffers are full. Then
+        backpropagates the latest q to each previous time step, adding the
+        result to each previous credit assignment estimate."""
+
+        self.propagate_feedback_to_hidden()
+        a_hat = self.rnn.get_a_hat()
+        phi_prime = self.rnn.get_phi_prime()
+
+        if self.c_history is None:
+            self.c_history, self.phi_prime_history, self.a_hat_history = [
+                np.zeros((self.T_truncation,) + np.shape(value),
+                         dtype=self.dtype)
+                for value in [self.q, phi_prime, a_hat]]
+        if self.n_history == self.T_truncation:  # Drop oldest
+            self.i_oldest = (self.i_oldest + 1) % self.T_truncation
+            self.n_history -= 1
+
+        # Add immediate credit assignment as the newest entry
+        i_newest = (self.i_oldest + self.n_history) % self.T_truncation
+        self.c_history[i_newest] = self.q
+        self.phi_prime_history[i_newest] = phi_prime
+        self.a_hat_history[i_newest] = a_hat
+        self.n_history += 1
+
+        # Backpropagate q over the truncation horizon, pausing along way to
         # update credit assignment estimates
-        for i_BPTT in range(1, len(self.c_history)):
-            h = self.h_history[i_BPTT - 1]
-            J = self.rnn.get_a_jacobian(h=h, update=False)
-            q = q.dot(J)
-            self.c_history[i_BPTT] += q
+        q = self.q
+        indices = self.history_indices()
+        for i_BPTT in range(self.n_history - 1, 0, -1):
+            q = self.rnn.vjp(q, phi_prime=self.phi_prime_history[
+                indices[i_BPTT]])
+            self.c_history[indices[i_BPTT - 1]] += q
 
     def get_rec_grads(self):
-        """Removes the oldest credit assignment value from the c_history list
-        and uses it to produce recurrent gradients according to Eq. (1).
+        """Removes the oldest credit assignment value from the buffers and
+        uses it to produce recurrent gradients according to Eq. (1).
 
         Note: for the first several time steps of the simulation, before
-        self.c_history fills up to T_truncation size, 0s are returned for
+        the buffers fill up to T_truncation entries, 0s are returned for
         the recurrent gradients."""
 
-        if len(self.c_history) >= self.T_truncation:
+        if self.n_history >= self.T_truncation:
 
-            # Remove oldest c, h and a_hat from lists
-            c = self.c_history.pop(-1)
-            h = self.h_history.pop(-1)
-            a_hat = self.a_hat_history.pop(-1)
+            # Remove oldest c, \phi'(h) and a_hat from buffers
+            i = self.i_oldest
+            self.i_oldest = (self.i_oldest + 1) % self.T_truncation
+            self.n_history -= 1
 
             # Implement Eq. (1)
-            D = self.rnn.alpha * self.rnn.activation.f_prime(h)
-            rec_grads = np.multiply.outer(c * D, a_hat)
+            cD = self.c_history[i] * self.rnn.alpha * self.phi_prime_history[i]
+            rec_grads = cD[..., np.newaxis] * self.a_hat_history[i][
+                ..., np.newaxis, :]
 
         else:
 
-            rec_grads = np.zeros((self.n_h, self.m))
+            rec_grads = np.zeros(self.q.shape + (self.m,), dtype=self.dtype)
 
         return rec_grads
 
     def reset_learning(self):
         """Resets learning by deleting network variable history."""
 
-        self.c_history = []
-        self.a_hat_history = []
-        self.h_history = []
+        self.c_history = None
+        self.phi_prime_history = None
+        self.a_hat_history = None
+        self.i_oldest = 0
+        self.n_history = 0
@@ -25,7 +25,12 @@ class KF_RTRL(Stochastic_Algorithm):
 
     dL/dw = qM = A (qB)    (5)
 
-    Eq. (5) is implemented in the get_rec_grads method.
+    Eq. (5) is implemented in the get_rec_grads method. With n_samples, all
+    of the above holds for each of the stacked estimates separately.
+
+    JB is computed as a Jacobian-matrix product (see RNN.jvp) and
+    D = \\alpha\\phi'(h) is kept as a vector added onto the diagonal of B, so
+    that neither J nor diag(D) is ever formed.
     """
 
     def __init__(self, rnn, **kwargs):
@@ -41,18 +46,25 @@ class KF_RTRL(Stochastic_Algorithm):
             B (numpy array): Initial value for B.
             nu_dist (string): Takes on the value of 'gaussian', 'discrete', or
                 'uniform' to indicate what type of distribution nu should sample
-                 from. Default is 'discrete'."""
+                 from. Default is 'discrete'.
+            n_samples (int): If provided, keeps n_samples independent
+                estimates, with A of shape (n_samples, m) and B of shape
+                (n_samples, n_h, n_h), and averages their gradients."""
 
         self.name = 'KF-RTRL'
-        allowed_kwargs_ = {'P0', 'P1', 'A', 'B', 'nu_dist'}
+        allowed_kwargs_ = {'P0', 'P1', 'A', 'B', 'nu_dist', 'n_samples'}
         super().__init__(rnn, allowed_kwargs_, **kwargs)
-        self.n_nu = 2
+        self.n_nu = self.sample_shape(2)
+        self.diagonal = np.arange(self.n_h)
 
         # Initialize A and B arrays
         if self.A is None:
-            self.A = np.random.normal(0, 1, self.m)
+            self.A = np.random.normal(0, 1, self.sample_shape(self.m))
         if self.B is None:
-            self.B = np.random.normal(0, 1, (self.n_h, self.n_h))
+            self.B = np.random.normal(0, 1, self.sample_shape(self.n_h,
+                                                              self.n_h))
+        self.A = np.asarray(self.A, dtype=self.dtype)
+        self.B = np.asarray(self.B, dtype=self.dtype)
 
     def update_learning_vars(self, update=True):
         """Implements Eqs. (1), (2), (3), and (4) to update the Kron. product
@@ -64,13 +76,9 @@ class KF_RTRL(Stochastic_Algorithm):
                 get_influence_estimate."""
 
         # Get relevant values and derivatives from network
-        self.a_hat = np.concatenate([self.rnn.a_prev,
-                                     self.rnn.x,
-                                     np.array([1])])
-        self.D = self.rnn.alpha * self.rnn.activation.f_prime(self.rnn.h)
-        self.D = np.diag(self.D)
-        self.rnn.get_a_jacobian()
-        self.B_forwards = self.rnn.a_J.dot(self.B)
+        self.a_hat = self.rnn.get_a_hat()
+        self.D = self.rnn.alpha * self.rnn.get_phi_prime()
+        self.B_forwards = self.rnn.jvp(self.B)
 
         A, B = self.get_influence_estimate()
 
@@ -93,7 +101,8 @@ class KF_RTRL(Stochastic_Algorithm):
 
         # Calculate p0, p1 or override with fixed P0, P1 if given
         if self.P0 is None:
-            self.p0 = np.sqrt(norm(self.B_forwards) / norm(self.A))
+            self.p0 = np.sqrt(self.estimate_norm(self.B_forwards, 2) /
+                              self.estimate_norm(self.A, 1))
         else:
             self.p0 = np.copy(self.P0)
         if self.P1 is None:
@@ -102,9 +111,12 @@ class KF_RTRL(Stochastic_Algorithm):
             self.p1 = np.copy(self.P1)
 
         # Update Kronecker product approximation
-        A = self.nu[0] * self.p0 * self.A + self.nu[1] * self.p1 * self.a_hat
-        B = (self.nu[0] * (1 / self.p0) * self.B_forwards +
-             self.nu[1] * (1 / self.p1) * self.D)
+        nu0 = self.nu[..., 0, np.newaxis]
+        nu1 = self.nu[..., 1, np.newaxis]
+        p0 = np.asarray(self.p0)[..., np.newaxis]
+        A = nu0 * p0 * self.A + nu1 * self.p1 * self.a_hat
+        B = (nu0 / p0)[..., np.newaxis] * self.B_forwards
+        B[..., self.diagonal, self.diagonal] += (nu1 / self.p1) * self.D
 
         return A, B
 
@@ -117,14 +129,21 @@ class KF_RTRL(Stochastic_Algorithm):
         recurrent gradient.
 
         Returns:
-            An array of shape (n_h, m) representing the recurrent gradient."""
+            An array of shape (n_h, m) representing the recurrent gradient,
+                averaged over estimates if there are several."""
+
+        self.qB = np.matmul(self.q, self.B)  # Unit-specific learning signal
+        if self.n_samples is None:
+            return np.kron(self.A, self.qB).reshape((self.n_h, self.m),
+                                                    order='F')
 
-        self.qB = self.q.dot(self.B)  # Unit-specific learning signal
-        return np.kron(self.A, self.qB).reshape((self.n_h, self.m), order='F')
+        return self.qB.T.dot(self.A) / self.n_samples
 
     def reset_learning(self):
         """Resets learning by re-randomizing the outer product approximation to
         random gaussian samples."""
 
-        self.A = np.random.normal(0, 1, self.m)
-        self.B = np.random.normal(0, 1, (self.n_h, self.n_h))
+        self.A = np.random.normal(0, 1, self.sample_shape(self.m))
+        self.B = np.random.normal(0, 1, self.sample_shape(self.n_h, self.n_h))
+        self.A = self.A.astype(self.dtype)
+        self.B = self.B.astype(self.dtype)
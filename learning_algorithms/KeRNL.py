@@ -21,7 +21,12 @@ class KeRNL(Learning_Algorithm):
 
     while A and \alpha are updated by SGD on their ability to predict
     perturbative effects. See Algorithm 1: Pseudocode on page 5 of Roth et al.
-    2019 for details."""
+    2019 for details.
+
+    B is updated in place, with the immediate influence papw written into a
+    preallocated buffer, and the recurrent gradients are written directly into
+    the view grads_rec of the flat gradient buffer, so that no arrays of shape
+    (n_h, m) are allocated at each time step."""
 
     def __init__(self, rnn, optimizer, sigma_noise=0.00001, **kwargs):
         """Inits an instance of KeRNL by specifying the optimizer used to train
@@ -58,19 +63,23 @@ class KeRNL(Learning_Algorithm):
         self.i_t = 0
         self.sigma_noise = sigma_noise
         self.optimizer = optimizer
-        self.zeta = np.random.normal(0, self.sigma_noise, self.n_h)
+        self.zeta = np.random.normal(0, self.sigma_noise,
+                                     self.n_h).astype(self.dtype)
 
         # Initialize learning variables
         if self.A is None:
-            self.A = np.eye(self.n_h)
+            self.A = np.eye(self.n_h, dtype=self.dtype)
         if self.B is None:
-            self.B = np.zeros((self.n_h, self.m))
+            self.B = np.zeros((self.n_h, self.m), dtype=self.dtype)
+        else:
+            self.B = np.array(self.B, dtype=self.dtype)
+        self.papw = np.zeros_like(self.B)
         if self.alpha is None:
-            self.alpha = np.ones(self.n_h) * 0.8
+            self.alpha = np.ones(self.n_h, dtype=self.dtype) * 0.8
         if self.Omega is None:
-            self.Omega = np.zeros(self.n_h)
+            self.Omega = np.zeros(self.n_h, dtype=self.dtype)
         if self.Gamma is None:
-            self.Gamma = np.zeros(self.n_h)
+            self.Gamma = np.zeros(self.n_h, dtype=self.dtype)
 
         # Initialize noisy network as copy of original network
         self.noisy_rnn = deepcopy(self.rnn)
@@ -95,17 +104,18 @@ class KeRNL(Learning_Algorithm):
 
         # Update learning variables (see Pseudocode in Roth et al. 2019)
         self.kernel = np.maximum(0, 1 - self.alpha)
-        self.zeta = np.random.normal(0, self.sigma_noise, self.n_h)
+        self.zeta = np.random.normal(0, self.sigma_noise,
+                                     self.n_h).astype(self.dtype)
         self.Gamma = self.kernel * self.Gamma - self.Omega
         self.Omega = self.kernel * self.Omega + self.zeta
 
         # Update eligibility trace (Eq. 1)
-        self.D = self.rnn.activation.f_prime(self.rnn.h)
-        self.a_hat = np.concatenate([self.rnn.a_prev,
-                                     self.rnn.x,
-                                     np.array([1])])
-        self.papw = self.rnn.alpha * np.multiply.outer(self.D, self.a_hat)
-        self.B = (self.B.T * self.kernel).T + self.papw
+        self.D = self.rnn.get_phi_prime()
+        self.a_hat = self.rnn.get_a_hat()
+        np.multiply.outer(self.D, self.a_hat, out=self.papw)
+        self.papw *= self.rnn.alpha
+        self.B *= self.kernel[:, np.newaxis]
+        self.B += self.papw
 
         # Get error in predicting perturbations effect (see Pseudocode)
         self.error_prediction = self.A.dot(self.Omega)
@@ -127,7 +137,8 @@ class KeRNL(Learning_Algorithm):
         """Using updated A and B, returns recurrent gradients according to
         final line in Pseudocode table in Roth et al. 2019."""
 
-        return (self.B.T * self.q.dot(self.A)).T
+        return np.multiply(self.B, self.q.dot(self.A)[:, np.newaxis],
+                           out=self.grads_rec)
 
     def reset_learning(self):
         """Resets learning variables to 0 and resets the perturbed network
@@ -136,4 +147,4 @@ class KeRNL(Learning_Algorithm):
         self.noisy_rnn.a = np.copy(self.rnn.a)
         self.Omega = np.zeros_like(self.Omega)
         self.Gamma = np.zeros_like(self.Gamma)
-        self.B = np.zeros_like(self.B)
+        self.B *= 0
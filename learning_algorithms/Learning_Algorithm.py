@@ -1,6 +1,6 @@
 import numpy as np
 
-from utils import split_weight_matrix, norm
+from utils import norm
 
 
 class Learning_Algorithm:
@@ -11,6 +11,8 @@ class Learning_Algorithm:
         n_* (int): Extra pointer to rnn.n_* (in, h, out) for conveneince.
         m (int): Number of recurrent "input dimensions" n_h + n_in + 1 including
             task inputs and constant 1 for bias.
+        dtype (numpy dtype): Pointer to rnn.dtype, the dtype of all learning
+            variables.
         q (numpy array): Array of immediate error signals for the hidden units,
             i.e. the derivative of the current loss with respect to rnn.a, of
             shape (n_h).
@@ -24,7 +26,20 @@ class Learning_Algorithm:
             errors.
         q (numpy array): The immediate loss derivative of the network state
             dL/da, calculated by propagate_feedback_to_hidden.
-        q_prev (numpy array): The q value from the previous time step."""
+        q_prev (numpy array): The q value from the previous time step.
+        grads (numpy array): Flat buffer of the final gradients, with the
+            layout of rnn.theta, so that an optimizer may update theta with a
+            single vectorized operation.
+        grads_rec, grads_outer (numpy array): Views of the recurrent and outer
+            gradients into grads, of shapes (n_h, m) and (n_out, n_h + 1).
+        grads_list (list): Views of the gradients for W_rec, W_in, b_rec,
+            W_out, b_out into grads.
+        comparison_lag (int): Number of time steps by which the gradients
+            returned at each time step lag behind it, used to align gradients
+            of different algorithms in Simulation.compare_algorithms. Default
+            is 0."""
+
+    comparison_lag = 0
 
     def __init__(self, rnn, allowed_kwargs_=set(), **kwargs):
         """Initializes an instance of learning algorithm by specifying the
@@ -58,7 +73,13 @@ class Learning_Algorithm:
         self.n_h = self.rnn.n_h
         self.n_out = self.rnn.n_out
         self.m = self.n_h + self.n_in + 1
-        self.q = np.zeros(self.n_h)
+        self.dtype = self.rnn.dtype
+        self.q = np.zeros(self.n_h, dtype=self.dtype)
+
+        # Flat gradient buffer with the layout of rnn.theta
+        self.grads = np.zeros_like(self.rnn.theta)
+        self.grads_rec, self.grads_outer, self.grads_list = (
+            self.rnn.get_param_views(self.grads))
 
     def get_outer_grads(self):
         """Calculates the derivative of the loss with respect to the output
@@ -73,7 +94,7 @@ class Learning_Algorithm:
                 concatenation (along column axis) of the derivative of the loss
                 w.r.t. rnn.W_out and w.r.t. rnn.b_out."""
 
-        self.a_ = np.concatenate([self.rnn.a, np.array([1])])
+        self.a_ = np.concatenate([self.rnn.a, np.ones(1, dtype=self.dtype)])
         return np.multiply.outer(self.rnn.error, self.a_)
 
     def propagate_feedback_to_hidden(self):
@@ -96,6 +117,19 @@ class Learning_Algorithm:
         else:
             self.q = self.rnn.error.dot(self.W_FB)
 
+    def split_grads(self, rec_grads, outer_grads):
+        """Writes the recurrent grads of shape (n_h, m) and the outer grads of
+        shape (n_out, n_h + 1) into the flat buffer grads, unless they already
+        are its views grads_rec and grads_outer, and returns the list of views
+        of the grads for W_rec, W_in, b_rec, W_out, b_out."""
+
+        if rec_grads is not self.grads_rec:
+            self.grads_rec[...] = rec_grads
+        if outer_grads is not self.grads_outer:
+            self.grads_outer[...] = outer_grads
+
+        return list(self.grads_list)
+
     def L2_regularization(self, grads):
         """Adds L2 regularization to the gradient.
 
@@ -178,14 +212,30 @@ class Learning_Algorithm:
         Returns:
             List of gradients for W_rec, W_in, b_rec, W_out, b_out."""
 
+        return self.process_grads(self.get_grads())
+
+    def get_grads(self):
+        """Calculates the list of grads for this time step as in __call__, but
+        without any regularization or other processing (see process_grads),
+        e.g. to accumulate them over several time steps first.
+
+        Returns:
+            List of views of the gradients for W_rec, W_in, b_rec, W_out,
+                b_out into the flat buffer grads."""
+
         self.outer_grads = self.get_outer_grads()
         self.propagate_feedback_to_hidden()
         self.rec_grads = self.get_rec_grads()
-        rec_grads_list = split_weight_matrix(self.rec_grads,
-                                             [self.n_h, self.n_in, 1])
-        outer_grads_list = split_weight_matrix(self.outer_grads,
-                                               [self.n_h, 1])
-        grads_list = rec_grads_list + outer_grads_list
+
+        return self.split_grads(self.rec_grads, self.outer_grads)
+
+    def process_grads(self, grads_list):
+        """Applies any regularization, continual learning method, sparsity
+        constraint and gradient noise specified for the instance to a list
+        of gradients for W_rec, W_in, b_rec, W_out, b_out.
+
+        Returns:
+            The processed list of gradients."""
 
         if self.L1_reg is not None:
             grads_list = self.L1_regularization(grads_list)
@@ -35,9 +35,11 @@ class Miconi_REINFORCE(Learning_Algorithm):
             self.h_avg_decay = 0.03
         if self.reset_h_avg is None:
             self.reset_h_avg = True
-        self.h_avg = np.zeros(self.n_h)
+        self.h_avg = np.zeros(self.n_h, dtype=self.dtype)
         self.tau_e_trace = 0.05
-        self.e_trace = 0
+        self.e_trace = np.zeros((self.n_h, self.m), dtype=self.dtype)
+        self.e_immediate = np.zeros_like(self.e_trace)
+        self.scratch = np.zeros_like(self.e_trace)
         self.loss_avg = [0] * n_trial_types
         self.loss_prev = 0
         self.loss = 0
@@ -50,20 +52,20 @@ class Miconi_REINFORCE(Learning_Algorithm):
 
         ### random perturbations from here?
 
-        self.a_hat = np.concatenate([self.rnn.a_prev,
-                                     self.rnn.x,
-                                     np.array([1])])
+        self.a_hat = self.rnn.get_a_hat()
 
         self.h_avg = (1 - self.h_avg_decay) * self.h_avg + self.h_avg_decay * self.rnn.h
 
         # postsynaptic variables/parameters
         self.D = self.rnn.h - self.h_avg
 
-        # matrix of pre/post activations
-        self.e_immediate = np.outer(self.D, self.a_hat)
+        # matrix of pre/post activations, traces updated in place
+        np.multiply.outer(self.D, self.a_hat, out=self.e_immediate)
         # self.e_trace = ((1 - self.tau_e_trace) * self.e_trace\
         #                + self.tau_e_trace * self.e_immediate**3)
-        self.e_trace = self.e_trace + self.e_immediate ** 3
+        # (D a_hat) ** 3 as outer product of the cubed vectors
+        np.multiply.outer(self.D ** 3, self.a_hat ** 3, out=self.scratch)
+        self.e_trace += self.scratch
         self.loss_prev = self.loss
         self.loss = self.rnn.loss_
         i_tt = self.rnn.trial_type
@@ -75,12 +77,14 @@ class Miconi_REINFORCE(Learning_Algorithm):
         self.pert = self.pert * np.random.normal(0, self.sigma, self.n_h)
 
         self.rnn.h += self.pert
+        self.rnn.clear_cache()  # h was modified in place
 
     def get_rec_grads(self):
         """Combine the eligibility trace and the reward to get an estimate
         of the gradient"""
         i_tt = self.rnn.trial_type
-        return (self.loss - self.loss_avg[i_tt]) * self.e_trace
+        return np.multiply(self.e_trace, self.loss - self.loss_avg[i_tt],
+                           out=self.grads_rec)
 
     def reset_learning(self):
         """Reset the eligibility traces to 0."""
@@ -19,4 +19,4 @@ class Only_Output_Weights(Learning_Algorithm):
     def get_rec_grads(self):
         """Returns all 0s for the recurrent gradients."""
 
-        return np.zeros((self.n_h, self.m))
+        return np.zeros((self.n_h, self.m), dtype=self.dtype)
@@ -0,0 +1,25 @@
+from learning_algorithms.Efficient_BPTT import Efficient_BPTT
+from learning_algorithms.Population_Learning_Algorithm import \
+    Population_Learning_Algorithm
+
+
+class Population_Efficient_BPTT(Population_Learning_Algorithm,
+                                Efficient_BPTT):
+    """Implements E-BPTT (see Efficient_BPTT) for every member of a
+    core.Population, backpropagating the credit assignment c of shape
+    (K, n_h) through each member's own Jacobian. A c_clip_norm, if given,
+    applies to the norm of each member's c.
+
+    Efficient_BPTT handles the population axis of its memory and backward
+    sweep as is, so only the error signals of the members need to be
+    adapted (see Population_Learning_Algorithm)."""
+
+    def __init__(self, rnn, T_truncation, trial_based_truncation=False,
+                 **kwargs):
+        """Inits a Population_Efficient_BPTT instance. Arguments are as for
+        Efficient_BPTT."""
+
+        super().__init__(rnn, T_truncation,
+                         trial_based_truncation=trial_based_truncation,
+                         **kwargs)
+        self.name = 'Population_E-BPTT'
@@ -0,0 +1,47 @@
+import numpy as np
+
+from learning_algorithms.Learning_Algorithm import Learning_Algorithm
+
+
+class Population_Learning_Algorithm(Learning_Algorithm):
+    """Parent class for learning algorithms that train every member of a
+    core.Population independently.
+
+    Population algorithms combine this class with a single-network algorithm,
+    e.g. Population_RFLO(Population_Learning_Algorithm, RFLO), and override
+    the methods whose learning variables gain a leading population axis of
+    size K. The error signals q have shape (K, n_h), the recurrent grads have
+    shape (K, n_h, m) and the outer grads have shape (K, n_out, n_h + 1), so
+    that the final grads have the stacked shapes of rnn.params.
+
+    Attributes:
+        n_members (int): Number of networks K in the population."""
+
+    def __init__(self, rnn, *args, **kwargs):
+        """Inits the single-network algorithm and gives q a population axis.
+        Arguments are passed on unchanged."""
+
+        super().__init__(rnn, *args, **kwargs)
+        self.n_members = rnn.n_members
+        self.q = np.zeros((self.n_members, self.n_h), dtype=self.dtype)
+
+    def get_outer_grads(self):
+        """Calculates the derivative of each member's loss with respect to its
+        output parameters, as an array of shape (K, n_out, n_h + 1)."""
+
+        self.a_ = np.concatenate([self.rnn.a,
+                                  np.ones((self.n_members, 1),
+                                          dtype=self.dtype)], axis=1)
+        return self.rnn.error[:, :, np.newaxis] * self.a_[:, np.newaxis, :]
+
+    def propagate_feedback_to_hidden(self):
+        """Updates q to the current value of dL/da of each member, using its
+        own W_out or the shared feedback weights W_FB."""
+
+        self.q_prev = np.copy(self.q)
+
+        if self.W_FB is None:
+            self.q = self.rnn.matvec(self.rnn.W_out.transpose(0, 2, 1),
+                                     self.rnn.error)
+        else:
+            self.q = self.rnn.error.dot(self.W_FB)
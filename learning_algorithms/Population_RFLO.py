@@ -0,0 +1,25 @@
+import numpy as np
+
+from learning_algorithms.Population_Learning_Algorithm import \
+    Population_Learning_Algorithm
+from learning_algorithms.RFLO import RFLO
+
+
+class Population_RFLO(Population_Learning_Algorithm, RFLO):
+    """Implements RFLO (see RFLO) for every member of a core.Population, with
+    an eligibility trace B of shape (K, n_h, m).
+
+    RFLO's in-place updates handle the population axis of B as is, so only
+    the error signals of the members need to be adapted (see
+    Population_Learning_Algorithm)."""
+
+    def __init__(self, rnn, alpha, **kwargs):
+        """Inits a Population_RFLO instance. Arguments are as for RFLO, where
+        a provided B has shape (K, n_h, m)."""
+
+        super().__init__(rnn, alpha, **kwargs)
+        self.name = 'Population_RFLO'
+        if 'B' not in kwargs:
+            self.B = np.zeros((self.n_members, self.n_h, self.m),
+                              dtype=self.dtype)
+            self.allocate_buffers()
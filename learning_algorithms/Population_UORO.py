@@ -0,0 +1,110 @@
+import numpy as np
+
+from learning_algorithms.Population_Learning_Algorithm import \
+    Population_Learning_Algorithm
+from learning_algorithms.UORO import UORO
+
+
+class Population_UORO(Population_Learning_Algorithm, UORO):
+    """Implements UORO (see UORO) for every member of a core.Population.
+
+    Each member keeps its own outer product approximation, A of shape
+    (K, n_h) and B of shape (K, n_h, m), its own samples nu and its own
+    scaling factors p0 and p1 of shape (K)."""
+
+    def __init__(self, rnn, **kwargs):
+        """Inits a Population_UORO instance. Keyword args are as for UORO,
+        where a provided A has shape (K, n_h), B has shape (K, n_h, m) and
+        P0 and P1 are floats or arrays of shape (K)."""
+
+        super().__init__(rnn, **kwargs)
+        self.name = 'Population_UORO'
+        self.n_nu = (self.n_members, self.n_h)
+
+        if 'A' not in kwargs or 'B' not in kwargs:
+            self.reset_learning()
+        for key in ['A', 'B']:
+            if key in kwargs:
+                setattr(self, key, np.asarray(kwargs[key], dtype=self.dtype))
+
+    def update_learning_vars(self, update=True):
+        """Updates the outer product approximation of each member's influence
+        matrix by A and B, as UORO.update_learning_vars."""
+
+        self.a_hat = self.rnn.get_a_hat()
+        D = self.rnn.alpha * self.rnn.get_phi_prime()
+        self.papw = D[:, :, np.newaxis] * self.a_hat[:, np.newaxis, :]
+
+        A, B = self.get_influence_estimate()
+
+        if update:
+            self.A, self.B = A, B
+
+    def get_influence_estimate(self):
+        """Generates one random outer-product estimate of each member's
+        influence matrix.
+
+        Returns:
+            Updated A (numpy array of shape (K, n_h)) and B (numpy array of
+                shape (K, n_h, m))."""
+
+        # Sample random vectors
+        self.nu = self.sample_nu()
+
+        # Get random projection of M_immediate onto \nu
+        M_projection = self.papw * self.nu[:, :, np.newaxis]
+
+        # Norms of each member
+        B_norm = np.sqrt(np.square(self.B).sum(axis=(1, 2)))
+        M_norm = np.sqrt(np.square(M_projection).sum(axis=(1, 2)))
+
+        if self.epsilon is not None:  # Forward differentiation method
+            eps = self.epsilon
+            self.a_perturbed = self.rnn.a_prev + eps * self.A
+            self.a_perturbed_next = self.rnn.next_state(self.rnn.x,
+                                                        self.a_perturbed,
+                                                        update=False)
+            self.A_forwards = (self.a_perturbed_next - self.rnn.a) / eps
+            A_norm = np.sqrt(np.square(self.A_forwards).sum(axis=1))
+            self.p0 = np.sqrt(B_norm / (A_norm + eps)) + eps
+            self.p1 = np.sqrt(M_norm / (self.n_h ** 0.5 + eps)) + eps
+        else:  # Backpropagation method
+            self.A_forwards = self.rnn.jvp(self.A)
+            A_norm = np.sqrt(np.square(self.A_forwards).sum(axis=1))
+            self.p0 = np.sqrt(B_norm / A_norm)
+            self.p1 = np.sqrt(M_norm / self.n_h ** 0.5)
+
+        # Override with fixed P0 and P1 if given
+        if self.P0 is not None:
+            self.p0 = np.broadcast_to(self.P0, (self.n_members,)).copy()
+        if self.P1 is not None:
+            self.p1 = np.broadcast_to(self.P1, (self.n_members,)).copy()
+
+        # Update outer product approximation
+        p0, p1 = self.p0[:, np.newaxis], self.p1[:, np.newaxis]
+        A = p0 * self.A_forwards + p1 * self.nu
+        B = ((1 / p0[:, :, np.newaxis]) * self.B +
+             (1 / p1[:, :, np.newaxis]) * M_projection)
+
+        return A.astype(self.dtype, copy=False), B.astype(self.dtype,
+                                                          copy=False)
+
+    def get_rec_grads(self):
+        """Calculates each member's recurrent grads from its global learning
+        signal Q = q A.
+
+        Returns:
+            An array of shape (K, n_h, m) representing the recurrent
+                gradients."""
+
+        self.Q = (self.q * self.A).sum(axis=1)
+        return self.Q[:, np.newaxis, np.newaxis] * self.B
+
+    def reset_learning(self):
+        """Resets learning by re-randomizing the outer product approximation of
+        every member to random gaussian samples."""
+
+        self.A = np.random.normal(0, 1, (self.n_members,
+                                         self.n_h)).astype(self.dtype)
+        self.B = np.random.normal(0, 1, (self.n_members, self.n_h,
+                                         self.m)).astype(self.dtype)
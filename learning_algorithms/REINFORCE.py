@@ -29,7 +29,9 @@ class REINFORCE(Learning_Algorithm):
             self.decay = 1
         if self.loss_decay is None:
             self.loss_decay = 0.01
-        self.e_trace = 0
+        self.e_trace = np.zeros((self.n_h, self.m), dtype=self.dtype)
+        self.e_immediate = np.zeros_like(self.e_trace)
+        self.scratch = np.zeros_like(self.e_trace)
         self.loss_avg = 0
         self.loss_prev = 0
         self.loss = 0
@@ -39,17 +41,17 @@ class REINFORCE(Learning_Algorithm):
         """Updates the eligibility traces used for learning"""
         # presynaptic variables/parameters
 
-        self.a_hat = np.concatenate([self.rnn.a_prev,
-                                     self.rnn.x,
-                                     np.array([1])])
+        self.a_hat = self.rnn.get_a_hat()
         # postsynaptic variables/parameters
-        self.D = self.rnn.alpha * self.rnn.activation.f_prime(self.rnn.h)
+        self.D = self.rnn.alpha * self.rnn.get_phi_prime()
         self.D_noise = self.D * self.rnn.noise
 
-        # matrix of pre/post activations
-        self.e_immediate = np.outer(self.D_noise, self.a_hat) / self.sigma ** 2
-        self.e_trace = ((1 - self.decay) * self.e_trace +
-                        self.decay * self.e_immediate)
+        # matrix of pre/post activations, traces updated in place
+        np.multiply.outer(self.D_noise, self.a_hat, out=self.e_immediate)
+        self.e_immediate /= self.sigma ** 2
+        self.e_trace *= (1 - self.decay)
+        np.multiply(self.e_immediate, self.decay, out=self.scratch)
+        self.e_trace += self.scratch
         self.loss_prev = self.loss
         self.loss = self.rnn.loss_
         self.loss_avg = ((1 - self.loss_decay) * self.loss_avg +
@@ -58,7 +60,8 @@ class REINFORCE(Learning_Algorithm):
     def get_rec_grads(self):
         """Combine the eligibility trace and the reward to get an estimate
         of the gradient"""
-        return (self.loss - self.loss_avg) * self.e_trace
+        return np.multiply(self.e_trace, self.loss - self.loss_avg,
+                           out=self.grads_rec)
 
     def reset_learning(self):
         """Reset the eligibility traces to 0."""
@@ -18,7 +18,13 @@ class RFLO(Learning_Algorithm):
 
     q_i B_{ij}      (2)
 
-    which is implemented in get_rec_grads."""
+    which is implemented in get_rec_grads.
+
+    B is updated in place, with M_immediate written into a preallocated
+    buffer, and the gradients of Eq. (2) are written directly into the view
+    grads_rec of the flat gradient buffer, so that no arrays are allocated or
+    copied at each time step. The returned gradients are thus overwritten at
+    the next call of get_rec_grads."""
 
     def __init__(self, rnn, alpha, **kwargs):
         """Inits an RFLO instance by specifying the inverse time constant for
@@ -38,26 +44,36 @@ class RFLO(Learning_Algorithm):
 
         self.alpha = alpha
         if self.B is None:
-            self.B = np.zeros((self.n_h, self.m))
+            self.B = np.zeros((self.n_h, self.m), dtype=self.dtype)
+        else:
+            self.B = np.array(self.B, dtype=self.dtype)
+        self.allocate_buffers()
+
+    def allocate_buffers(self):
+        """Allocates the buffer for M_immediate with the shape of B."""
+
+        self.M_immediate = np.zeros_like(self.B)
 
     def update_learning_vars(self):
         """Updates B by one time step of temporal filtration via the invesre
         time constant alpha (see Eq. 1)."""
 
         # Get relevant values and derivatives from network
-        self.a_hat = np.concatenate([self.rnn.a_prev,
-                                     self.rnn.x,
-                                     np.array([1])])
-        self.D = self.rnn.activation.f_prime(self.rnn.h)
-        self.M_immediate = self.alpha * np.multiply.outer(self.D, self.a_hat)
+        self.a_hat = self.rnn.get_a_hat()
+        self.D = self.rnn.get_phi_prime()
+        np.multiply(self.D[..., np.newaxis], self.a_hat[..., np.newaxis, :],
+                    out=self.M_immediate)
+        self.M_immediate *= self.alpha
 
         # Update eligibility traces
-        self.B = (1 - self.alpha) * self.B + self.M_immediate
+        self.B *= (1 - self.alpha)
+        self.B += self.M_immediate
 
     def get_rec_grads(self):
         """Implements Eq. (2) from above."""
 
-        return (self.q * self.B.T).T
+        return np.multiply(self.q[..., np.newaxis], self.B,
+                           out=self.grads_rec)
 
     def reset_learning(self):
         """Reset eligibility trace to 0."""
@@ -7,26 +7,30 @@ class RTRL(Learning_Algorithm):
     """Implements the Real-Time Recurrent Learning (RTRL) algorithm from
     Williams and Zipser 1989.
 
-    RTRL maintains a long-term "influence matrix" dadw that represents the
-    derivative of the hidden state with respect to a flattened vector of
-    recurrent update parameters. We concatenate [W_rec, W_in, b_rec] along
-    the column axis and order the flattened vector of parameters by stacking
-    the columns end-to-end. In other words, w_k = W_{ij} when i = k%n_h and
-    j = k//n_h. The influence matrix updates according to the equation
+    RTRL maintains a long-term "influence tensor" dadw that represents the
+    derivative of the hidden state with respect to the recurrent update
+    parameters. We concatenate [W_rec, W_in, b_rec] along the column axis into
+    a matrix W of shape (n_h, m), so that dadw has shape (n_h, n_h, m), with
+    dadw[k, i, j] = da_k/dW_{ij}. The influence tensor updates according to
+    the equation
 
     M' = JM + M_immediate                            (1)
 
-    where J is the network Jacobian and M_immediate is the immediate influence
-    of a parameter w on the hidden state a. (See paper for more detailed
-    notation.) M_immediate is notated as papw in the code for "partial a partial
-    w." For a vanilla network, this can be simply (if inefficiently) computed as
-    the Kronecker product of a_hat = [a_prev, x, 1] (a concatenation of the prev
-    hidden state, the input, and a constant 1 (for bias)) with the activation
-    derivatives organized in a diagonal matrix. The implementation of Eq. (1)
-    is in the update_learning_vars method.
+    where J is the network Jacobian, contracted with the first axis of M, and
+    M_immediate is the immediate influence of a parameter w on the hidden
+    state a. (See paper for more detailed notation.) For a vanilla network,
+
+    M_immediate[k, i, j] = \\delta_{ki} \\alpha\\phi'(h_i) a_hat_j,
+
+    where a_hat = [a_prev, x, 1] is a concatenation of the prev hidden state,
+    the input, and a constant 1 (for bias). Rather than materializing this
+    mostly-zero tensor, it is added to the diagonal slices dadw[i, i, :] in
+    place, and JM is computed as one matrix product of J's factors with the
+    (n_h, n_h * m) view of M. The implementation of Eq. (1) is in the
+    update_learning_vars method.
 
     Finally, the algorithm returns recurrent gradients by projecting the
-    feedback vector q onto the influence matrix M:
+    feedback vector q onto the influence tensor M:
 
     dL/dw = dL/da da/dw = qM                         (2)
 
@@ -39,31 +43,40 @@ class RTRL(Learning_Algorithm):
         allowed_kwargs_ = set()  # No special kwargs for RTRL
         super().__init__(rnn, allowed_kwargs_, **kwargs)
 
-        # Initialize influence matrix
-        self.dadw = np.zeros((self.n_h, self.rnn.n_h_params))
+        # Initialize influence tensor
+        self.dadw = self.allocate_influence((self.n_h, self.n_h, self.m))
         self.M_decay = M_decay
+        self.diagonal = np.arange(self.n_h)
+
+    def allocate_influence(self, shape):
+        """Returns a zero-initialized influence tensor of given shape."""
+
+        return np.zeros(shape, dtype=self.dtype)
 
     def update_learning_vars(self):
-        """Updates the influence matrix via Eq. (1)."""
+        """Updates the influence tensor via Eq. (1)."""
 
         # Get relevant values and derivatives from network.
-        self.a_hat = np.concatenate([self.rnn.a_prev,
-                                     self.rnn.x,
-                                     np.array([1])])
-        D = self.rnn.alpha * np.diag(self.rnn.activation.f_prime(self.rnn.h))
-        self.papw = np.kron(self.a_hat, D)  # Calculate M_immediate
-        self.rnn.get_a_jacobian()  # Get updated network Jacobian
+        self.a_hat = self.rnn.get_a_hat()
+        self.D = self.rnn.alpha * self.rnn.get_phi_prime()
+
+        # Propagate influence tensor by the Jacobian, as a product with the
+        # contiguous (n_h, n_h * m) view of dadw.
+        dadw = self.rnn.jvp(self.dadw.reshape((self.n_h, -1)))
+        if self.M_decay != 1:
+            dadw *= self.M_decay
+        self.dadw = dadw.reshape(self.dadw.shape)
 
-        # Update influence matrix via Eq. (1).
-        self.dadw = self.M_decay * self.rnn.a_J.dot(self.dadw) + self.papw
+        # Add M_immediate to the diagonal slices dadw[i, i, :].
+        self.dadw[self.diagonal, self.diagonal] += np.multiply.outer(
+            self.D, self.a_hat)
 
     def get_rec_grads(self):
-        """Calculates recurrent grads using Eq. (2), reshapes into original
-        matrix form."""
+        """Calculates recurrent grads of shape (n_h, m) using Eq. (2)."""
 
-        return self.q.dot(self.dadw).reshape((self.n_h, self.m), order='F')
+        return np.einsum('k,kij->ij', self.q, self.dadw)
 
     def reset_learning(self):
-        """Resets learning algorithm by setting influence matrix to 0."""
+        """Resets learning algorithm by setting influence tensor to 0."""
 
         self.dadw *= 0
@@ -0,0 +1,124 @@
+import numpy as np
+
+from learning_algorithms.Learning_Algorithm import Learning_Algorithm
+
+
+class SnAp(Learning_Algorithm):
+    """Implements the Sparse n-step Approximation (SnAp) of RTRL from Menick
+    et al. 2020, for n = 1 or 2.
+
+    SnAp tracks only the entries dadw[k, i, j] = da_k/dW_{ij} of the RTRL
+    influence tensor (see RTRL) for which unit k is influenced by the
+    parameters W_{ij} of row i within n time steps, and drops all others. In
+    one step, W_{ij} influences only a_i, so SnAp-1 keeps the entries with
+    k = i. In two steps, W_{ij} influences every unit k with W_rec[k, i] != 0,
+    so SnAp-2 keeps the entries with k = i or W_rec[k, i] != 0. The pattern
+    is taken from W_rec at init, so for sparse W_rec (e.g. with
+    maintain_sparsity) the number of tracked entries scales with the number of
+    nonzeros, and for dense W_rec SnAp-2 is exact RTRL.
+
+    The tracked entries (k, i) are stored in compressed form as index arrays
+    k_idx and i_idx, sorted by i then k, and their values for all m columns j
+    as an array of shape (nnz, m). The influence update
+
+    M' = JM + M_immediate        (1)
+
+    restricted to the pattern becomes a sum over pairs of entries (k, i) and
+    (l, i) with J[k, l] != 0, which is computed as a segment sum
+    (np.add.reduceat) of the pair products, and the gradient
+
+    dL/dW_{ij} = \\sum_k q_k M[k, i, j]       (2)
+
+    is a segment sum over the entries of each row i. Per-step cost is thus
+    O(n_pairs * m) rather than O(n_h^2 * n_h * m)."""
+
+    def __init__(self, rnn, n=1, **kwargs):
+        """Inits a SnAp instance by computing the sparsity pattern of the
+        influence tensor from the current W_rec.
+
+        Args:
+            n (int): Number of steps of influence tracked, 1 or 2."""
+
+        if n not in [1, 2]:
+            raise ValueError('SnAp supports n = 1 or n = 2, not ' + str(n))
+
+        self.name = 'SnAp-{}'.format(n)
+        allowed_kwargs_ = set()
+        super().__init__(rnn, allowed_kwargs_, **kwargs)
+
+        self.n = n
+        self.init_pattern()
+
+    def init_pattern(self):
+        """Computes the tracked entries of the influence tensor and the pairs
+        of entries coupled by the Jacobian from the sparsity of W_rec."""
+
+        W_nonzero = (self.rnn.W_rec != 0) | np.eye(self.n_h, dtype=bool)
+        if self.n == 1:
+            pattern = np.eye(self.n_h, dtype=bool)
+        else:
+            pattern = W_nonzero
+
+        # Tracked entries (k, i), sorted by i then k
+        self.i_idx, self.k_idx = np.nonzero(pattern.T)
+        self.nnz = len(self.k_idx)
+        self.diag_entries = np.flatnonzero(self.k_idx == self.i_idx)
+        self.row_starts = np.searchsorted(self.i_idx, np.arange(self.n_h))
+
+        # Pairs of an output entry (k, i) and an input entry (l, i) with
+        # J[k, l] structurally nonzero, sorted by output entry
+        row_ends = np.append(self.row_starts[1:], self.nnz)
+        pair_out, pair_in = [], []
+        for i in range(self.n_h):
+            entries = np.arange(self.row_starts[i], row_ends[i])
+            ks = self.k_idx[entries]
+            coupled = W_nonzero[np.ix_(ks, ks)]
+            out, inp = np.nonzero(coupled)
+            pair_out.append(entries[out])
+            pair_in.append(entries[inp])
+        self.pair_out = np.concatenate(pair_out)
+        self.pair_in = np.concatenate(pair_in)
+        self.pair_k = self.k_idx[self.pair_out]
+        self.pair_l = self.k_idx[self.pair_in]
+        self.pair_diag = (self.pair_k == self.pair_l)
+        self.pair_starts = np.searchsorted(self.pair_out, np.arange(self.nnz))
+
+        self.values = np.zeros((self.nnz, self.m), dtype=self.dtype)
+
+    def update_learning_vars(self):
+        """Updates the tracked entries of the influence tensor via Eq. (1)."""
+
+        self.a_hat = self.rnn.get_a_hat()
+        D, W_rec = self.rnn.get_jacobian_factors()
+        self.D = D
+
+        # Entries of J for each pair
+        J_pairs = D[self.pair_k] * W_rec[self.pair_k, self.pair_l]
+        J_pairs[self.pair_diag] += (1 - self.rnn.alpha)
+
+        # Segment sums over the pairs of each output entry
+        products = J_pairs[:, np.newaxis] * self.values[self.pair_in]
+        self.values = np.add.reduceat(products, self.pair_starts, axis=0)
+
+        # Immediate influence on the diagonal entries (i, i)
+        self.values[self.diag_entries] += np.multiply.outer(D, self.a_hat)
+
+    def get_rec_grads(self):
+        """Calculates recurrent grads of shape (n_h, m) via Eq. (2)."""
+
+        products = self.q[self.k_idx, np.newaxis] * self.values
+        return np.add.reduceat(products, self.row_starts, axis=0)
+
+    def get_influence(self):
+        """Returns the tracked influence as a dense array of shape
+        (n_h, n_h, m), with zeros at untracked entries, for inspection."""
+
+        dadw = np.zeros((self.n_h, self.n_h, self.m), dtype=self.dtype)
+        dadw[self.k_idx, self.i_idx] = self.values
+
+        return dadw
+
+    def reset_learning(self):
+        """Resets the tracked influence to 0."""
+
+        self.values *= 0
@@ -4,6 +4,13 @@ from learning_algorithms.Learning_Algorithm import Learning_Algorithm
 
 
 class Stochastic_Algorithm(Learning_Algorithm):
+    """Parent class for algorithms that keep a random low-rank estimate of
+    the influence matrix.
+
+    If n_samples is given, n_samples independent estimates are kept as
+    arrays stacked along a leading axis and updated together, and their
+    gradients are averaged, reducing the variance of the gradient at close to
+    the cost of a single estimate."""
 
     def sample_nu(self):
         """Sample nu from specified distribution."""
@@ -15,4 +22,19 @@ class Stochastic_Algorithm(Learning_Algorithm):
         elif self.nu_dist == 'uniform':
             nu = np.random.uniform(-1, 1, self.n_nu)
 
-        return nu
+        return nu.astype(self.dtype)
+
+    def sample_shape(self, *shape):
+        """Returns the shape of an estimate array, with a leading axis of size
+        n_samples if several estimates are kept."""
+
+        if getattr(self, 'n_samples', None) is None:
+            return shape
+
+        return (self.n_samples,) + shape
+
+    def estimate_norm(self, x, n_axes):
+        """Returns the L2 norm of each estimate in x, i.e. over its last
+        n_axes axes, as an array of shape (n_samples) or a scalar."""
+
+        return np.sqrt(np.square(x).sum(axis=tuple(range(-n_axes, 0))))
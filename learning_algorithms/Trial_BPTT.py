@@ -0,0 +1,156 @@
+import numpy as np
+
+from learning_algorithms.Learning_Algorithm import Learning_Algorithm
+
+
+class Trial_BPTT(Learning_Algorithm):
+    """Implements exact, offline BPTT over whole trials of a trial-structured
+    task.
+
+    Rather than being updated one time step at a time, the algorithm takes
+    the inputs X, labels Y and loss mask of an entire trial (or of several
+    trials of equal length, stacked along a batch axis) and computes the
+    gradient of the total trial loss in one call to get_trial_grads. The
+    forward pass writes the network states straight into preallocated arrays
+    of shape (T, n_h) (or (T, B, n_h)), with the input projection computed
+    for all time steps at once, and the backward pass propagates the credit
+    assignment
+
+    c_{t-1} = q_{t-1} + c_t J_t                                     (1)
+
+    with matrix-free vector-Jacobian products (see RNN.vjp), so that no
+    Jacobian is ever formed. The gradients are then accumulated in a single
+    contraction over time, as in Efficient_BPTT.
+
+    Gradients of a batch of trials are averaged over the trials, so that the
+    returned gradient has the scale of that of a single trial. The result is
+    identical to that of Efficient_BPTT with trial_based_truncation=True,
+    summed over the trial.
+
+    Trials are driven by Simulation.run, which calls get_trial_grads instead
+    of stepping through time if the learning algorithm is offline.
+
+    Attributes:
+        trials_per_batch (int): Number of trials of equal length the
+            Simulation stacks together for each gradient. Default is 1.
+        trial_loss (float): Masked loss summed over time steps and averaged
+            over trials, from the last call to get_trial_grads."""
+
+    offline = True
+
+    def __init__(self, rnn, trials_per_batch=1, **kwargs):
+        """Inits a Trial_BPTT instance.
+
+        Args:
+            trials_per_batch (int): Number of trials per gradient."""
+
+        self.name = 'Trial-BPTT'
+        allowed_kwargs_ = set()
+        super().__init__(rnn, allowed_kwargs_, **kwargs)
+
+        self.trials_per_batch = trials_per_batch
+
+    def forward_pass(self, X, a_initial):
+        """Runs the network over a trial without updating its state.
+
+        Args:
+            X (numpy array): Inputs of shape (T, n_in) or (T, B, n_in).
+            a_initial (numpy array): State before the first time step, of
+                shape (n_h) or (B, n_h).
+
+        Returns:
+            H (numpy array): Pre-activations of shape (T, n_h) or (T, B, n_h).
+            A (numpy array): States of the same shape.
+            Phi (numpy array): Activations \\phi(H) of the same shape."""
+
+        rnn = self.rnn
+
+        # Hoisted input projection, later incremented to the pre-activations
+        H = X.dot(rnn.W_in.T) + rnn.b_rec
+        A = np.empty_like(H)
+        Phi = np.empty_like(H)
+        W_rec_T = rnn.W_rec.T
+
+        a = a_initial
+        for i in range(X.shape[0]):
+            H[i] += a.dot(W_rec_T)
+            Phi[i] = rnn.activation.f(H[i])
+            A[i] = (1 - rnn.alpha) * a + rnn.alpha * Phi[i]
+            a = A[i]
+
+        return H, A, Phi
+
+    def get_trial_grads(self, X, Y, loss_mask=None, a_initial=None):
+        """Computes the gradient of the loss of one trial, or the average
+        over a batch of trials, with respect to all network parameters.
+
+        Args:
+            X (numpy array): Inputs of shape (T, n_in), or (T, B, n_in) for B
+                trials of T time steps each.
+            Y (numpy array): Labels of shape (T, n_out) or (T, B, n_out).
+            loss_mask (numpy array): Optional scaling of the loss at each time
+                step, of shape (T) or (T, B).
+            a_initial (numpy array): State before the first time step, of
+                shape (n_h) or (B, n_h). Default is the current rnn.a.
+
+        Returns:
+            List of gradients for W_rec, W_in, b_rec, W_out, b_out."""
+
+        rnn = self.rnn
+        X = np.asarray(X, dtype=self.dtype)
+        T = X.shape[0]
+        n_trials = X.shape[1] if X.ndim == 3 else 1
+        if a_initial is None:
+            a_initial = rnn.a
+        a_initial = np.broadcast_to(a_initial, X.shape[1:-1] + (self.n_h,))
+
+        ### --- Forward pass --- ###
+
+        H, A, Phi = self.forward_pass(X, a_initial)
+        Z = A.dot(rnn.W_out.T) + rnn.b_out
+        losses, errors = rnn.loss.f_and_f_prime(Z, Y)
+        if loss_mask is not None:
+            mask = np.asarray(loss_mask)
+            losses = losses * mask
+            errors = errors * np.expand_dims(mask, -1)
+        self.trial_loss = np.sum(losses) / n_trials
+
+        ### --- Backward pass --- ###
+
+        if self.W_FB is None:
+            Q = errors.dot(rnn.W_out)
+        else:
+            Q = errors.dot(self.W_FB)
+        if rnn.activation.f_prime_from_f is None:
+            phi_prime = rnn.activation.f_prime(H)
+        else:
+            phi_prime = rnn.activation.f_prime_from_f(Phi)
+        cD = np.empty_like(H)
+        c = np.zeros_like(a_initial)
+        for i in range(T - 1, -1, -1):
+            c = c + Q[i]
+            np.multiply(c, rnn.alpha * phi_prime[i], out=cD[i])
+            if i > 0:
+                c = rnn.vjp(c, phi_prime=phi_prime[i])
+
+        ### --- Contract over time (and trials) --- ###
+
+        A_prev = np.concatenate([a_initial[np.newaxis], A[:-1]])
+        ones = np.ones(A.shape[:-1] + (1,), dtype=self.dtype)
+        A_hat = np.concatenate([A_prev, X, ones], axis=-1)
+        A_ = np.concatenate([A, ones], axis=-1)
+        self.rec_grads = cD.reshape((-1, self.n_h)).T.dot(
+            A_hat.reshape((-1, self.m))) / n_trials
+        self.outer_grads = errors.reshape((-1, self.n_out)).T.dot(
+            A_.reshape((-1, self.n_h + 1))) / n_trials
+
+        # Leave the network in the final state of the (last) trial
+        i_last = (-1, -1) if X.ndim == 3 else -1
+        rnn.x, rnn.y = np.copy(X[i_last]), np.copy(Y[i_last])
+        rnn.h, rnn.a = np.copy(H[i_last]), np.copy(A[i_last])
+        rnn.z, rnn.loss_, rnn.error = Z[i_last], losses[i_last], errors[i_last]
+        rnn.clear_cache()
+
+        grads_list = self.split_grads(self.rec_grads, self.outer_grads)
+
+        return self.process_grads(grads_list)
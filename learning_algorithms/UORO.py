@@ -1,7 +1,6 @@
 import numpy as np
 
 from learning_algorithms.Stochastic_Algorithm import Stochastic_Algorithm
-from utils import norm
 
 
 class UORO(Stochastic_Algorithm):
@@ -30,7 +29,8 @@ class UORO(Stochastic_Algorithm):
 
     dL/dw = qM = (q A) B    (5)
 
-    Eq. (5) is implemented in the get_rec_grads method."""
+    Eq. (5) is implemented in the get_rec_grads method. With n_samples, all
+    of the above holds for each of the stacked estimates separately."""
 
     def __init__(self, rnn, **kwargs):
         """Inits an UORO instance by setting the initial values of A and B to be
@@ -48,18 +48,25 @@ class UORO(Stochastic_Algorithm):
             B (numpy array): Initial value for B.
             nu_dist (string): Takes on the value of 'gaussian', 'discrete', or
                 'uniform' to indicate what type of distribution nu should sample
-                 from. Default is 'discrete'."""
+                 from. Default is 'discrete'.
+            n_samples (int): If provided, keeps n_samples independent
+                estimates, with A of shape (n_samples, n_h) and B of shape
+                (n_samples, n_h, m), and averages their gradients."""
 
         self.name = 'UORO'  # Default algorithm name
-        allowed_kwargs_ = {'epsilon', 'P0', 'P1', 'A', 'B', 'nu_dist'}
+        allowed_kwargs_ = {'epsilon', 'P0', 'P1', 'A', 'B', 'nu_dist',
+                           'n_samples'}
         super().__init__(rnn, allowed_kwargs_, **kwargs)
-        self.n_nu = self.n_h
+        self.n_nu = self.sample_shape(self.n_h)
 
         # Initialize A and B arrays
         if self.A is None:
-            self.A = np.random.normal(0, 1, self.n_h)
+            self.A = np.random.normal(0, 1, self.sample_shape(self.n_h))
         if self.B is None:
-            self.B = np.random.normal(0, 1, (self.n_h, self.m))
+            self.B = np.random.normal(0, 1, self.sample_shape(self.n_h,
+                                                              self.m))
+        self.A = np.asarray(self.A, dtype=self.dtype)
+        self.B = np.asarray(self.B, dtype=self.dtype)
 
     def update_learning_vars(self, update=True):
         """Implements Eqs. (1), (2), (3), and (4) to update the outer product
@@ -71,13 +78,10 @@ class UORO(Stochastic_Algorithm):
                 get_influence_estimate."""
 
         # Get relevant values and derivatives from network
-        self.a_hat = np.concatenate([self.rnn.a_prev,
-                                     self.rnn.x,
-                                     np.array([1])])
-        D = self.rnn.alpha * self.rnn.activation.f_prime(self.rnn.h)
+        self.a_hat = self.rnn.get_a_hat()
+        D = self.rnn.alpha * self.rnn.get_phi_prime()
         # Compact form of M_immediate
         self.papw = np.multiply.outer(D, self.a_hat)
-        self.rnn.get_a_jacobian()  # Get updated network Jacobian
 
         A, B = self.get_influence_estimate()
 
@@ -99,7 +103,7 @@ class UORO(Stochastic_Algorithm):
         self.nu = self.sample_nu()
 
         # Get random projection of M_immediate onto \nu
-        M_projection = (self.papw.T * self.nu).T
+        M_projection = self.papw * self.nu[..., np.newaxis]
 
         if self.epsilon is not None:  # Forward differentiation method
             eps = self.epsilon
@@ -112,20 +116,20 @@ class UORO(Stochastic_Algorithm):
             # Get forward-propagated A
             self.A_forwards = (self.a_perturbed_next - self.rnn.a) / eps
             # Calculate scaling factors
-            B_norm = norm(self.B)
-            A_norm = norm(self.A_forwards)
-            M_norm = norm(M_projection)
+            B_norm = self.estimate_norm(self.B, 2)
+            A_norm = self.estimate_norm(self.A_forwards, 1)
+            M_norm = self.estimate_norm(M_projection, 2)
             self.p0 = np.sqrt(B_norm / (A_norm + eps)) + eps
-            self.p1 = np.sqrt(M_norm / (np.sqrt(self.n_h) + eps)) + eps
+            self.p1 = np.sqrt(M_norm / (self.n_h ** 0.5 + eps)) + eps
         else:  # Backpropagation method
-            # Get forward-propagated A
-            self.A_forwards = self.rnn.a_J.dot(self.A)
+            # Get forward-propagated A (one product for all estimates)
+            self.A_forwards = self.rnn.jvp(self.A.T).T
             # Calculate scaling factors
-            B_norm = norm(self.B)
-            A_norm = norm(self.A_forwards)
-            M_norm = norm(M_projection)
+            B_norm = self.estimate_norm(self.B, 2)
+            A_norm = self.estimate_norm(self.A_forwards, 1)
+            M_norm = self.estimate_norm(M_projection, 2)
             self.p0 = np.sqrt(B_norm / A_norm)
-            self.p1 = np.sqrt(M_norm / np.sqrt(self.n_h))
+            self.p1 = np.sqrt(M_norm / self.n_h ** 0.5)
 
         # Override with fixed P0 and P1 if given
         if self.P0 is not None:
@@ -134,8 +138,11 @@ class UORO(Stochastic_Algorithm):
             self.p1 = np.copy(self.P1)
 
         # Update outer product approximation
-        A = self.p0 * self.A_forwards + self.p1 * self.nu
-        B = (1 / self.p0) * self.B + (1 / self.p1) * M_projection
+        p0 = np.asarray(self.p0)[..., np.newaxis]
+        p1 = np.asarray(self.p1)[..., np.newaxis]
+        A = p0 * self.A_forwards + p1 * self.nu
+        B = ((1 / p0[..., np.newaxis]) * self.B +
+             (1 / p1[..., np.newaxis]) * M_projection)
 
         return A, B
 
@@ -148,14 +155,20 @@ class UORO(Stochastic_Algorithm):
         is reshaped into original matrix form.
 
         Returns:
-            An array of shape (n_h, m) representing the recurrent gradient."""
+            An array of shape (n_h, m) representing the recurrent gradient,
+                averaged over estimates if there are several."""
+
+        self.Q = self.A.dot(self.q)  # "Global learning signal"
+        if self.n_samples is None:
+            return (self.Q * self.B)
 
-        self.Q = self.q.dot(self.A)  # "Global learning signal"
-        return (self.Q * self.B)
+        return np.tensordot(self.Q, self.B, axes=1) / self.n_samples
 
     def reset_learning(self):
         """Resets learning by re-randomizing the outer product approximation to
         random gaussian samples."""
 
-        self.A = np.random.normal(0, 1, self.n_h)
-        self.B = np.random.normal(0, 1, (self.n_h, self.m))
+        self.A = np.random.normal(0, 1, self.sample_shape(self.n_h))
+        self.B = np.random.normal(0, 1, self.sample_shape(self.n_h, self.m))
+        self.A = self.A.astype(self.dtype)
+        self.B = self.B.astype(self.dtype)
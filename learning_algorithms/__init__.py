@@ -1,3 +1,5 @@
+from .BPTT_Oracle import BPTT_Oracle
+from .Chunked_RTRL import Chunked_RTRL
 from .DNI import DNI
 from .Efficient_BPTT import Efficient_BPTT
 from .Future_BPTT import Future_BPTT
@@ -7,10 +9,16 @@ from .Learning_Algorithm import Learning_Algorithm
 from .List_of_Gradients import List_of_Gradients
 from .Miconi_REINFORCE import Miconi_REINFORCE
 from .Only_Output_Weights import Only_Output_Weights
+from .Population_Efficient_BPTT import Population_Efficient_BPTT
+from .Population_Learning_Algorithm import Population_Learning_Algorithm
+from .Population_RFLO import Population_RFLO
+from .Population_UORO import Population_UORO
 from .REINFORCE import REINFORCE
 from .RFLO import RFLO
 from .RTRL import RTRL
 from .Random_Noise_Gradients import Random_Noise_Gradients
 from .Reverse_KF_RTRL import Reverse_KF_RTRL
+from .SnAp import SnAp
 from .Stochastic_Algorithm import Stochastic_Algorithm
+from .Trial_BPTT import Trial_BPTT
 from .UORO import UORO
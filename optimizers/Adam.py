@@ -30,21 +30,22 @@ class Adam(Optimizer):
         self.epsilon = epsilon
         self.initial_decay = decay
 
-    def get_updated_params(self, params, grads):
-        """ params and grads are list of numpy arrays
-        """
-        original_shapes = [x.shape for x in params]
-        params = [x.flatten() for x in params]
-        grads = [x.flatten() for x in grads]
+    def allocate_buffers(self, params, split=None):
+        """Allocates the velocity and the first and second moment estimates
+        ms and vs of each parameter."""
 
-        if hasattr(self, 'clipnorm') and self.clipnorm > 0:
-            norm = np.sqrt(sum([np.sum(np.square(g)) for g in grads]))
-            grads = [self.clip_norm(g, norm) for g in grads]
+        super().allocate_buffers(params, split)
+        self.ms = [np.zeros_like(p) for p in params]
+        self.vs = [np.zeros_like(p) for p in params]
 
-        '''
-        if hasattr(self, 'clipvalue') and self.clipvalue > 0:
-            grads = [K.clip(g, -self.clipvalue, self.clipvalue) for g in grads]
-        '''
+    def update_(self, params, grads, scale=1):
+        """Updates the moment estimates and params in place, with grads scaled
+        by any gradient clipping or normalization.
+
+        Args:
+            params (list): List of trainable parameters as numpy arrays
+            grads (list): List of corresponding gradients as numpy arrays.
+            scale (float): Factor by which to scale the gradients."""
 
         lr = self.lr
         if self.initial_decay > 0:
@@ -54,24 +55,20 @@ class Adam(Optimizer):
         lr_t = lr * (np.sqrt(1. - np.power(self.beta_2, t)) /
                      (1. - np.power(self.beta_1, t)))
 
-        if not hasattr(self, 'ms'):
-            self.ms = [np.zeros(p.shape) for p in params]
-            self.vs = [np.zeros(p.shape) for p in params]
-
-        ret = [None] * len(params)
-        self.vel = [None] * len(params)
-        for i, p, g, m, v in zip(range(len(params)), params, grads, self.ms, self.vs):
-            m_t = (self.beta_1 * m) + (1. - self.beta_1) * g
-            v_t = (self.beta_2 * v) + (1. - self.beta_2) * np.square(g)
-            self.vel[i] = - lr_t * m_t / (np.sqrt(v_t) + self.epsilon)
-            p_t = p + self.vel[i]
-            self.ms[i] = m_t
-            self.vs[i] = v_t
-            ret[i] = p_t
+        # The velocity doubles as scratch space until it is computed
+        for p, g, m, v, vel in zip(params, grads, self.ms, self.vs,
+                                   self.velocity):
+            m *= self.beta_1
+            np.multiply(g, (1. - self.beta_1) * scale, out=vel)
+            m += vel
+            v *= self.beta_2
+            np.square(g, out=vel)
+            vel *= (1. - self.beta_2) * scale ** 2
+            v += vel
+            np.sqrt(v, out=vel)
+            vel += self.epsilon
+            np.divide(m, vel, out=vel)
+            vel *= -lr_t
+            p += vel
 
         self.iterations += 1
-
-        for i in range(len(ret)):
-            ret[i] = ret[i].reshape(original_shapes[i])
-
-        return ret
@@ -2,7 +2,23 @@ import numpy as np
 
 
 class Optimizer:
-    """Parent class for gradient-based optimizers."""
+    """Parent class for gradient-based optimizers.
+
+    Child classes implement update_, which updates parameters and any
+    optimizer state in place. Parameters may be given either as a list of
+    arrays or as one flat array of all parameters, such as rnn.theta, with a
+    flat gradient of the same layout, such as learn_alg.grads, in which case
+    the whole update is a handful of vectorized operations.
+
+    Attributes:
+        vel (list): The change in value of each parameter at the last update.
+            For a flat array of parameters, these are views into the flat
+            change, split per parameter if a split function is given to
+            step_."""
+
+    # Persistent state, allocated by allocate_buffers on the first update
+    velocity = None
+    vel = None
 
     def __init__(self, allowed_kwargs_, **kwargs):
 
@@ -21,6 +37,41 @@ class Optimizer:
 
         self.__dict__.update(kwargs)
 
+    def cast_grads(self, params, grads):
+        """Casts each gradient to the dtype of its parameter, so that
+        updates are computed in, and keep, the dtype of the network.
+
+        Args:
+            params (list): List of trainable parameters as numpy arrays
+            grads (list): List of corresponding gradients as numpy arrays.
+        Returns:
+            List of gradients in the dtypes of params."""
+
+        return [np.asarray(g, dtype=p.dtype) for p, g in zip(params, grads)]
+
+    def get_grad_norm(self, grads):
+        """Returns the global norm of a list of gradients, with one dot
+        product per gradient."""
+
+        return np.sqrt(sum([np.dot(grad.ravel(), grad.ravel())
+                            for grad in grads]))
+
+    def get_grad_scale(self, grads):
+        """Returns the factor by which gradient clipping (if clip_norm is
+        given) and normalization (if normalize) scale the gradients, from a
+        single computation of the global norm."""
+
+        if self.clip_norm is None and not self.normalize:
+            return 1
+
+        grad_norm = self.get_grad_norm(grads)
+        if self.normalize:
+            return 1 / grad_norm
+        if grad_norm > self.clip_norm:
+            return self.clip_norm / grad_norm
+
+        return 1
+
     def clip_gradient(self, grads):
         """Clips each gradient by the global gradient norm if it exceeds
         self.clip_norm.
@@ -30,12 +81,9 @@ class Optimizer:
         Returns:
             clipped_grads (list): List of clipped gradients."""
 
-        grad_norm = np.sqrt(sum([np.square(grad).sum() for grad in grads]))
+        grad_norm = self.get_grad_norm(grads)
         if grad_norm > self.clip_norm:
-            clipped_grads = []
-            for grad in grads:
-                clipped_grads.append(grad * (self.clip_norm / grad_norm))
-            return clipped_grads
+            return [grad * (self.clip_norm / grad_norm) for grad in grads]
         else:
             return grads
 
@@ -43,11 +91,67 @@ class Optimizer:
         """Takes in a list of gradients and forces the overall norm to be
         unity."""
 
-        grad_norm = np.sqrt(sum([np.square(grad).sum() for grad in grads]))
-        normalized_grads = []
-        for grad in grads:
-            normalized_grads.append(grad / grad_norm)
-        return normalized_grads
+        grad_norm = self.get_grad_norm(grads)
+        return [grad / grad_norm for grad in grads]
+
+    def allocate_buffers(self, params, split=None):
+        """Allocates the velocity, i.e. the change in value, of each
+        parameter, and exposes it per parameter as vel. Child classes extend
+        this with any further optimizer state."""
+
+        self.velocity = [np.zeros_like(p) for p in params]
+        if split is not None:
+            self.vel = split(self.velocity[0])
+        else:
+            self.vel = list(self.velocity)
+
+    def step_(self, params, grads, split=None):
+        """Updates the parameters in place by one step of the optimizer.
+
+        The optimizer state is allocated at the first step. A ValueError is
+        raised if the number, shapes or dtypes of the parameters later differ
+        from those, rather than silently discarding the state.
+
+        Args:
+            params (list or numpy array): List of trainable parameters as
+                numpy arrays, or one flat array of all of them (e.g.
+                rnn.theta).
+            grads (list or numpy array): Corresponding gradients, or one flat
+                array with the layout of the flat parameters (e.g.
+                learn_alg.grads).
+            split (function): For flat parameters, optional function mapping
+                a flat array to the list of views of each parameter into it
+                (e.g. rnn.split_params), used to expose vel per parameter."""
+
+        if isinstance(params, np.ndarray):
+            params, grads = [params], [grads]
+        grads = self.cast_grads(params, grads)
+
+        if self.velocity is None:
+            self.allocate_buffers(params, split)
+        elif (len(self.velocity) != len(params) or
+                any(v.shape != p.shape or v.dtype != p.dtype
+                    for v, p in zip(self.velocity, params))):
+            raise ValueError('Parameter layout changed after the optimizer '
+                             'state was allocated for it; use a new '
+                             'optimizer instead.')
+
+        self.update_(params, grads, self.get_grad_scale(grads))
+
+    def get_updated_params(self, params, grads):
+        """Returns a list of updated parameter values (NOT the change in
+        value), leaving the given parameters unchanged.
+
+        Args:
+            params (list): List of trainable parameters as numpy arrays
+            grads (list): List of corresponding gradients as numpy arrays.
+        Returns:
+            updated_params (list): List of newly updated parameters."""
+
+        updated_params = [np.array(param) for param in params]
+        self.step_(updated_params, grads)
+
+        return updated_params
 
     def lr_decay(self):
         """Multiplicatively decays the learning rate by a factor of
@@ -14,33 +14,29 @@ class SGD_Momentum(Optimizer):
         self.lr_ = np.copy(lr)
         self.lr = lr
         self.mu = mu
-        self.vel = None
 
-    def get_updated_params(self, params, grads):
-        """Returns a list of updated parameter values (NOT the change in value).
+    def allocate_buffers(self, params, split=None):
+        """Allocates the velocity and a scratch buffer for each parameter."""
+
+        super().allocate_buffers(params, split)
+        self.scratch = [np.zeros_like(p) for p in params]
+
+    def update_(self, params, grads, scale=1):
+        """Updates the velocity to mu * vel - lr * grads, with grads scaled by
+        any gradient clipping or normalization, and adds it to params, all in
+        place.
 
         Args:
             params (list): List of trainable parameters as numpy arrays
             grads (list): List of corresponding gradients as numpy arrays.
-        Returns:
-            updated_params (list): List of newly updated parameters."""
+            scale (float): Factor by which to scale the gradients."""
 
         if self.lr_decay_rate is not None:
             self.lr = self.lr_decay()
 
-        if self.clip_norm is not None:
-            grads = self.clip_gradient(grads)
-
-        if self.normalize:
-            grads = self.normalize_gradient(grads)
-
-        if self.vel is None:
-            self.vel = [np.zeros_like(g) for g in params]
-
-        self.vel = [self.mu * v - self.lr * g for v, g in zip(self.vel, grads)]
-
-        updated_params = []
-        for param, v in zip(params, self.vel):
-            updated_params.append(param + v)
-
-        return updated_params
+        for param, grad, v, scratch in zip(params, grads, self.velocity,
+                                           self.scratch):
+            v *= self.mu
+            np.multiply(grad, self.lr * scale, out=scratch)
+            v -= scratch
+            param += v
@@ -17,27 +17,18 @@ class Stochastic_Gradient_Descent(Optimizer):
         self.lr_ = np.copy(lr)
         self.lr = lr
 
-    def get_updated_params(self, params, grads):
-        """Returns a list of updated parameter values (NOT the change in value).
+    def update_(self, params, grads, scale=1):
+        """Updates params in place by -lr * grads, scaled by any gradient
+        clipping or normalization.
 
         Args:
             params (list): List of trainable parameters as numpy arrays
             grads (list): List of corresponding gradients as numpy arrays.
-        Returns:
-            updated_params (list): List of newly updated parameters."""
+            scale (float): Factor by which to scale the gradients."""
 
         if self.lr_decay_rate is not None:
             self.lr = self.lr_decay()
 
-        if self.clip_norm is not None:
-            grads = self.clip_gradient(grads)
-
-        if self.normalize:
-            grads = self.normalize_gradient(grads)
-
-        updated_params = []
-        self.vel = [-self.lr * g for g in grads]
-        for param, v in zip(params, self.vel):
-            updated_params.append(param + v)
-
-        return updated_params
+        for param, grad, v in zip(params, grads, self.velocity):
+            np.multiply(grad, -self.lr * scale, out=v)
+            param += v
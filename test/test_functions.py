@@ -0,0 +1,59 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath('..'))
+import unittest
+import numpy as np
+from numpy.testing import assert_allclose
+from functions import *
+
+
+class Test_Functions(unittest.TestCase):
+    """Tests the functions module."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Initializes a batch of inputs and labels."""
+
+        np.random.seed(0)
+        cls.z = np.random.normal(0, 1, (5, 3))
+        cls.y = np.random.uniform(0, 1, (5, 3))
+        cls.y /= cls.y.sum(axis=-1, keepdims=True)
+
+    def test_activations(self):
+        """Verifies that f_and_f_prime matches f and f_prime, for a batch as
+        well as for each of its vectors."""
+
+        for function in [identity, relu, sigmoid, softmax, softplus, tanh]:
+            value, derivative = function.f_and_f_prime(self.z)
+            assert_allclose(value, function.f(self.z))
+            assert_allclose(derivative, function.f_prime(self.z))
+            for i in range(self.z.shape[0]):
+                assert_allclose(value[i], function.f(self.z[i]))
+                assert_allclose(derivative[i], function.f_prime(self.z[i]))
+
+    def test_losses(self):
+        """Verifies that fused losses match f and f_prime, and f_prime matches
+        a finite-difference derivative of the summed loss."""
+
+        for function in [mean_squared_error, sigmoid_cross_entropy,
+                         softmax_cross_entropy]:
+            loss, error = function.f_and_f_prime(self.z, self.y)
+            self.assertEqual(loss.shape, (5,))
+            assert_allclose(loss, function.f(self.z, self.y))
+            assert_allclose(error, function.f_prime(self.z, self.y))
+
+        # Finite differences, up to the averaging over output dimensions
+        z, y, eps = self.z[0], np.array([0.2, 0.3, 0.5]), 1e-6
+        for function, scale in [(mean_squared_error, 3),
+                                (sigmoid_cross_entropy, 3),
+                                (softmax_cross_entropy, 1)]:
+            numerical = [(function.f(z + eps * e, y) -
+                          function.f(z - eps * e, y)) / (2 * eps)
+                         for e in np.eye(3)]
+            assert_allclose(scale * np.array(numerical),
+                            function.f_prime(z, y), rtol=1e-5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,6 @@
 import os
 import sys
+import tempfile
 
 sys.path.append(os.path.abspath('..'))
 from numpy.testing import assert_allclose
@@ -12,6 +13,23 @@ from gen_data import *
 from optimizers import *
 
 
+def make_random_rnn(n_h, n_in, seed=None, W_rec=None):
+    """Returns a tanh RNN with alpha=0.5, standard normal input, recurrent
+    (unless W_rec is given) and output weights, zero biases and two softmax
+    outputs, seeding numpy's random state first if seed is given."""
+
+    if seed is not None:
+        np.random.seed(seed)
+    W_in = np.random.normal(0, 1, (n_h, n_in))
+    if W_rec is None:
+        W_rec = np.random.normal(0, 1, (n_h, n_h))
+    W_out = np.random.normal(0, 1, (2, n_h))
+
+    return RNN(W_in, W_rec, W_out, np.zeros(n_h), np.zeros(2),
+               activation=tanh, alpha=0.5, output=softmax,
+               loss=softmax_cross_entropy)
+
+
 class Test_Learning_Algorithm(unittest.TestCase):
 
     @classmethod
@@ -106,20 +124,126 @@ class Test_RTRL(unittest.TestCase):
         self.learn_alg = RTRL(self.rnn)
         self.learn_alg.dadw += 1
         self.learn_alg.update_learning_vars()
-        papw = np.concatenate([np.eye(2), np.eye(2),
-                               np.eye(2) * 2, np.eye(2) * 2, np.eye(2)], axis=1)
-        correct_dadw = np.ones((2, 10)) + papw
+        papw = np.multiply.outer(np.eye(2), np.array([1, 1, 2, 2, 1]))
+        correct_dadw = np.ones((2, 2, 5)) + papw
         assert_allclose(self.learn_alg.dadw, correct_dadw)
 
     def test_get_rec_grads(self):
         self.learn_alg = RTRL(self.rnn)
         self.learn_alg.q = np.ones(2)
-        self.learn_alg.dadw = np.concatenate([np.eye(2) * i for i in range(5)],
-                                             axis=1)
+        self.learn_alg.dadw = np.multiply.outer(np.eye(2), np.arange(5))
         rec_grads = self.learn_alg.get_rec_grads()
         correct_rec_grads = np.array([list(range(5)) for _ in [0, 1]])
         assert_allclose(rec_grads, correct_rec_grads)
 
+    def test_dense_equivalence(self):
+        """Verifies that the influence tensor matches the dense update
+        M' = JM + kron(a_hat, D) over several steps of a random network."""
+
+        n_h, n_in = 4, 2
+        rnn = make_random_rnn(n_h, n_in, seed=0)
+        learn_alg = RTRL(rnn, M_decay=0.9)
+        dadw = np.zeros((n_h, n_h * learn_alg.m))
+        for _ in range(5):
+            rnn.next_state(np.random.normal(0, 1, n_in))
+            learn_alg.update_learning_vars()
+            rnn.get_a_jacobian()
+            D = rnn.alpha * np.diag(rnn.activation.f_prime(rnn.h))
+            dadw = 0.9 * rnn.a_J.dot(dadw) + np.kron(rnn.get_a_hat(), D)
+        learn_alg.q = np.random.normal(0, 1, n_h)
+        assert_allclose(learn_alg.get_rec_grads(),
+                        learn_alg.q.dot(dadw).reshape((n_h, -1), order='F'))
+
+    def test_chunked_rtrl(self):
+        """Verifies that block-wise, memory-mapped updates of the influence
+        tensor match RTRL."""
+
+        n_h, n_in = 5, 2
+        rnn = make_random_rnn(n_h, n_in, seed=1)
+        rtrl = RTRL(rnn, M_decay=0.9)
+        memmap_dir = tempfile.mkdtemp()
+        chunked = Chunked_RTRL(rnn, M_decay=0.9, block_size=2,
+                               memmap_dir=memmap_dir)
+        self.assertIsInstance(chunked.dadw, np.memmap)
+        self.assertEqual(os.listdir(memmap_dir), [])
+        for _ in range(5):
+            rnn.next_state(np.random.normal(0, 1, n_in))
+            rtrl.update_learning_vars()
+            chunked.update_learning_vars()
+        assert_allclose(chunked.dadw, rtrl.dadw)
+        rtrl.q = chunked.q = np.random.normal(0, 1, n_h)
+        assert_allclose(chunked.get_rec_grads(), rtrl.get_rec_grads())
+        chunked.reset_learning()
+        self.assertEqual(np.abs(chunked.dadw).max(), 0)
+
+
+class Test_Multi_Sample(unittest.TestCase):
+
+    def test_matches_single_samples(self):
+        """Verifies that n_samples stacked estimates of UORO, KF-RTRL and
+        R-KF-RTRL evolve as separate single estimates and that their
+        gradients are averaged."""
+
+        n_h, n_in, k = 4, 2, 3
+        m = n_h + n_in + 1
+        rnn = make_random_rnn(n_h, n_in, seed=3)
+        for alg, A_size, B_shape, nu_size in [(UORO, n_h, (n_h, m), n_h),
+                                              (KF_RTRL, m, (n_h, n_h), 2),
+                                              (Reverse_KF_RTRL, n_h, (n_h, m),
+                                               n_h)]:
+            A = np.random.normal(0, 1, (k, A_size))
+            B = np.random.normal(0, 1, (k,) + B_shape)
+            multi = alg(rnn, A=A, B=B, n_samples=k)
+            singles = [alg(rnn, A=A[i], B=B[i]) for i in range(k)]
+            for _ in range(3):
+                rnn.next_state(np.random.normal(0, 1, n_in))
+                nu = np.random.choice([-1, 1], (k, nu_size)).astype(float)
+                multi.sample_nu = MagicMock(return_value=nu)
+                multi.update_learning_vars()
+                for i, single in enumerate(singles):
+                    single.sample_nu = MagicMock(return_value=nu[i])
+                    single.update_learning_vars()
+                    assert_allclose(multi.A[i], single.A)
+                    assert_allclose(multi.B[i], single.B)
+            q = np.random.normal(0, 1, n_h)
+            multi.q = q
+            rec_grads = []
+            for single in singles:
+                single.q = q
+                rec_grads.append(single.get_rec_grads())
+            assert_allclose(multi.get_rec_grads(),
+                            np.mean(rec_grads, axis=0))
+
+
+class Test_SnAp(unittest.TestCase):
+
+    def test_masked_rtrl_equivalence(self):
+        """Verifies that SnAp-1 and SnAp-2 match RTRL with the influence
+        tensor masked to their patterns after every step, and that SnAp-2 is
+        exact RTRL for a dense network."""
+
+        np.random.seed(2)
+        n_h, n_in = 6, 2
+        W_rec = np.random.normal(0, 1, (n_h, n_h))
+        for sparsity in [0.7, 0]:
+            W_rec_sparse = W_rec * (np.random.uniform(size=W_rec.shape) >
+                                    sparsity)
+            rnn = make_random_rnn(n_h, n_in, W_rec=W_rec_sparse)
+            masks = {1: np.eye(n_h, dtype=bool),
+                     2: (W_rec_sparse != 0) | np.eye(n_h, dtype=bool)}
+            for n in [1, 2]:
+                snap = SnAp(rnn, n=n)
+                rtrl = RTRL(rnn)
+                for _ in range(5):
+                    rnn.next_state(np.random.normal(0, 1, n_in))
+                    snap.update_learning_vars()
+                    rtrl.update_learning_vars()
+                    rtrl.dadw *= masks[n][:, :, np.newaxis]
+                assert_allclose(snap.get_influence(), rtrl.dadw)
+                snap.q = rtrl.q = np.random.normal(0, 1, n_h)
+                assert_allclose(snap.get_rec_grads(), rtrl.get_rec_grads())
+                self.assertEqual(snap.nnz, masks[n].sum())
+
 
 class Test_UORO(unittest.TestCase):
 
@@ -150,11 +274,9 @@ class Test_UORO(unittest.TestCase):
         self.learn_alg.get_influence_estimate.return_value = [A, B]
         self.learn_alg.update_learning_vars()
 
-        correct_a_J = np.eye(2)
         correct_papw = np.array([[1, 1, 2, 2, 1],
                                  [1, 1, 2, 2, 1]])
 
-        assert_allclose(self.rnn.a_J, correct_a_J)
         assert_allclose(self.learn_alg.papw, correct_papw)
 
     def test_get_influence_estimate(self):
@@ -164,7 +286,6 @@ class Test_UORO(unittest.TestCase):
         self.learn_alg.a_hat = np.array([1, 1, 2, 2, 1])
         self.learn_alg.papw = np.array([[1, 1, 2, 2, 1],
                                         [1, 1, 2, 2, 1]])
-        self.rnn.a_J = np.eye(2)
         self.learn_alg.sample_nu = MagicMock()
         self.learn_alg.sample_nu.return_value = np.array([1, -1])
         A, B = self.learn_alg.get_influence_estimate()
@@ -219,7 +340,7 @@ class Test_KF_RTRL(unittest.TestCase):
         self.learn_alg.update_learning_vars()
 
         correct_B_forwards = np.ones((2, 2))
-        correct_D = np.eye(2)
+        correct_D = np.ones(2)
 
         assert_allclose(self.learn_alg.B_forwards, correct_B_forwards)
         assert_allclose(self.learn_alg.D, correct_D)
@@ -228,8 +349,7 @@ class Test_KF_RTRL(unittest.TestCase):
         A, B = np.ones(5), np.ones((2, 2))
         self.learn_alg = KF_RTRL(self.rnn, A=A, B=B)
         self.learn_alg.a_hat = np.array([1, 1, 2, 2, 1])
-        self.rnn.a_J = np.eye(2)
-        self.learn_alg.D = np.eye(2)
+        self.learn_alg.D = np.ones(2)
         self.learn_alg.B_forwards = np.ones((2, 2))
         self.learn_alg.sample_nu = MagicMock()
         self.learn_alg.sample_nu.return_value = np.array([1, -1])
@@ -251,6 +371,22 @@ class Test_KF_RTRL(unittest.TestCase):
 
         assert_allclose(rec_grads, correct_rec_grads)
 
+    def test_dense_jacobian(self):
+        """Verifies the matrix-free update of B against the dense Jacobian
+        and diag(D)."""
+
+        n_h, n_in = 4, 2
+        rnn = make_random_rnn(n_h, n_in, seed=10)
+        rnn.next_state(np.random.normal(0, 1, n_in))
+        B = np.random.normal(0, 1, (n_h, n_h))
+        learn_alg = KF_RTRL(rnn, B=B, P0=1.5, P1=0.5)
+        learn_alg.sample_nu = MagicMock(return_value=np.array([1, -1]))
+        learn_alg.update_learning_vars()
+
+        J = rnn.get_a_jacobian(update=False)
+        D = rnn.alpha * np.diag(rnn.activation.f_prime(rnn.h))
+        assert_allclose(learn_alg.B, J.dot(B) / 1.5 - D / 0.5)
+
 
 class Test_Reverse_KF_RTRL(unittest.TestCase):
 
@@ -292,7 +428,6 @@ class Test_Reverse_KF_RTRL(unittest.TestCase):
         A, B = np.ones(2), np.ones((2, 5))
         self.learn_alg = Reverse_KF_RTRL(self.rnn, A=A, B=B)
         self.learn_alg.a_hat = np.array([1, 1, 2, 2, 1])
-        self.rnn.a_J = np.eye(2)
         self.learn_alg.papw = np.array([[1, 1, 2, 2, 1],
                                         [1, 1, 2, 2, 1]])
         self.learn_alg.B_forwards = np.ones((2, 5))
@@ -361,6 +496,56 @@ class Test_RFLO(unittest.TestCase):
 
         assert_allclose(rec_grads, correct_rec_grads)
 
+    def test_in_place(self):
+        """Verifies that B and the gradient buffer are updated in place and
+        that a provided B is not modified."""
+
+        B = np.ones((2, 5))
+        self.learn_alg = RFLO(self.rnn, alpha=0.5, B=B)
+        B_trace = self.learn_alg.B
+        self.learn_alg.update_learning_vars()
+        self.learn_alg.q = np.array([1, 2])
+        rec_grads = self.learn_alg.get_rec_grads()
+
+        self.assertIs(self.learn_alg.B, B_trace)
+        self.assertIs(rec_grads, self.learn_alg.grads_rec)
+        assert_allclose(B, np.ones((2, 5)))
+
+
+class Test_REINFORCE(unittest.TestCase):
+
+    def test_traces(self):
+        """Verifies the in-place eligibility traces of REINFORCE and
+        Miconi_REINFORCE against their defining formulas."""
+
+        n_h, n_in = 3, 2
+        rnn = make_random_rnn(n_h, n_in, seed=11)
+        rnn.trial_type = 0
+        reinforce = REINFORCE(rnn, sigma=0.1, decay=0.5)
+        miconi = Miconi_REINFORCE(rnn, sigma=0)
+        e_trace, e_trace_miconi, h_avg = 0, 0, 0
+        loss_avg, loss_avg_miconi = 0, 0
+        for _ in range(3):
+            rnn.next_state(np.random.normal(0, 1, n_in), sigma=0.1)
+            rnn.loss_ = np.random.uniform(0, 1)
+            a_hat = rnn.get_a_hat()
+            D = rnn.alpha * rnn.activation.f_prime(rnn.h)
+            e_trace = (0.5 * e_trace + 0.5 *
+                       np.outer(D * rnn.noise, a_hat) / 0.1 ** 2)
+            loss_avg = 0.99 * loss_avg + 0.01 * reinforce.loss
+            h_avg = 0.97 * h_avg + 0.03 * rnn.h
+            e_trace_miconi = (e_trace_miconi +
+                              np.outer(rnn.h - h_avg, a_hat) ** 3)
+            loss_avg_miconi = 0.99 * loss_avg_miconi + 0.01 * miconi.loss
+            for learn_alg in [reinforce, miconi]:
+                learn_alg.update_learning_vars()
+            assert_allclose(reinforce.e_trace, e_trace)
+            assert_allclose(reinforce.get_rec_grads(),
+                            (rnn.loss_ - loss_avg) * e_trace)
+            assert_allclose(miconi.e_trace, e_trace_miconi)
+            assert_allclose(miconi.get_rec_grads(),
+                            (rnn.loss_ - loss_avg_miconi) * e_trace_miconi)
+
 
 class Test_DNI(unittest.TestCase):
 
@@ -472,39 +657,28 @@ class Test_Efficient_BPTT(unittest.TestCase):
 
         correct_a_hat_history = [np.array([1, 1, 2, 2, 1]),
                                  np.array([1, 1, 2, 2, 1])]
-        correct_h_history = [np.array([0.5, 0.5]),
-                             np.array([1, 1])]
+        correct_h_history = [np.array([1, 1]),
+                             np.array([0.5, 0.5])]
         correct_q_history = [np.array([0.5, 0.5]),
                              np.array([0.5, 0.5])]
 
-        assert_allclose(self.learn_alg.a_hat_history[0],
-                        correct_a_hat_history[0])
-        assert_allclose(self.learn_alg.h_history[0],
-                        correct_h_history[0])
-        assert_allclose(self.learn_alg.q_history[0],
-                        correct_q_history[0])
-        assert_allclose(self.learn_alg.a_hat_history[1],
-                        correct_a_hat_history[1])
-        assert_allclose(self.learn_alg.h_history[1],
-                        correct_h_history[1])
-        assert_allclose(self.learn_alg.q_history[1],
-                        correct_q_history[1])
+        self.assertEqual(self.learn_alg.n_history, 2)
+        assert_allclose(self.learn_alg.a_hat_history, correct_a_hat_history)
+        assert_allclose(self.learn_alg.h_history, correct_h_history)
+        assert_allclose(self.learn_alg.q_history, correct_q_history)
 
     def test_get_rec_grads(self):
         self.learn_alg = Efficient_BPTT(self.rnn, T_truncation=2)
-        self.learn_alg.a_hat_history = [np.array([1, 1, 2, 2, 1])]
-        self.learn_alg.h_history = [np.array([1, 1])]
-        self.learn_alg.q_history = [np.array([1, 1])]
+        self.learn_alg.push_history(np.array([1, 1, 2, 2, 1]),
+                                    np.array([1, 1]), np.array([-0.5, -0.5]))
         rec_grads = self.learn_alg.get_rec_grads()
 
         correct_rec_grads = np.zeros((2, 5))
 
         assert_allclose(rec_grads, correct_rec_grads)
 
-        self.learn_alg.a_hat_history = [np.array([1, 1, 2, 2, 1])] * 2
-        self.learn_alg.h_history = [np.array([1, 1])] * 2
-        self.learn_alg.q_history = [np.array([1, 1]),
-                                    np.array([-0.5, -0.5])]
+        self.learn_alg.push_history(np.array([1, 1, 2, 2, 1]),
+                                    np.array([1, 1]), np.array([1, 1]))
 
         rec_grads = self.learn_alg.get_rec_grads()
 
@@ -512,6 +686,44 @@ class Test_Efficient_BPTT(unittest.TestCase):
                                       [1.5, 1.5, 3, 3, 1.5]])
 
         assert_allclose(rec_grads, correct_rec_grads)
+        self.assertEqual(self.learn_alg.n_history, 0)
+
+    def test_bptt_equivalence(self):
+        """Verifies that each truncation interval yields the exact gradient
+        of its losses, computed with dense Jacobians, also when the memory
+        grows in trial-based truncation."""
+
+        n_h, n_in, T = 4, 2, 6
+        rnn = make_random_rnn(n_h, n_in, seed=4)
+        for trial_based in [False, True]:
+            learn_alg = Efficient_BPTT(rnn, T_truncation=T,
+                                       trial_based_truncation=trial_based)
+            qs, Js, papws = [], [], []
+            for i_t in range(T + 1):
+                if trial_based and i_t == T:
+                    learn_alg.reset_learning()
+                rnn.next_state(np.random.normal(0, 1, n_in))
+                rnn.error = np.random.normal(0, 1, 2)
+                learn_alg.update_learning_vars()
+                rec_grads = learn_alg.get_rec_grads()
+                qs.append(learn_alg.q)
+                Js.append(rnn.get_a_jacobian(update=False))
+                papws.append(np.multiply.outer(
+                    rnn.alpha * rnn.activation.f_prime(rnn.h),
+                    rnn.get_a_hat()))
+                if i_t == T - 1 and not trial_based:
+                    break
+
+            # Backpropagate through the interval with dense Jacobians
+            if trial_based:  # Interval ends at the newest step
+                qs, Js, papws = qs[1:], Js[1:], papws[1:]
+            correct_rec_grads = np.zeros((n_h, n_h + n_in + 1))
+            c = qs[-1]
+            for t in range(T - 1, -1, -1):
+                correct_rec_grads += (c * papws[t].T).T
+                if t > 0:
+                    c = qs[t - 1] + c.dot(Js[t])
+            assert_allclose(rec_grads, correct_rec_grads)
 
 
 class Test_Future_BPTT(unittest.TestCase):
@@ -540,48 +752,58 @@ class Test_Future_BPTT(unittest.TestCase):
         cls.rnn.y = np.ones(2) * 2
 
     def test_update_learning_vars(self):
-        self.learn_alg = Future_BPTT(self.rnn, T_truncation=2)
+        rnn = RNN(self.W_in, np.eye(2) * (-4), self.W_out,
+                  self.b_rec, self.b_out,
+                  activation=identity,
+                  alpha=1,
+                  output=softmax,
+                  loss=softmax_cross_entropy)
+        rnn.h = np.ones(2)
+        rnn.a_prev = np.ones(2)
+        rnn.x = np.ones(2) * 2
+        rnn.error = np.ones(2) * 0.5
+
+        self.learn_alg = Future_BPTT(rnn, T_truncation=2)
         self.learn_alg.update_learning_vars()
-        self.rnn.h = np.array([0.5, 0.5])
-        self.rnn.get_a_jacobian = MagicMock()
-        self.rnn.get_a_jacobian.return_value = np.eye(2) * (-4)
+        rnn.h = np.array([0.5, 0.5])
         self.learn_alg.update_learning_vars()
 
+        # Oldest to newest
         correct_a_hat_history = [np.array([1, 1, 2, 2, 1]),
                                  np.array([1, 1, 2, 2, 1])]
-        correct_h_history = [np.array([0.5, 0.5]),
-                             np.array([1, 1])]
-        correct_c_history = [np.array([0.5, 0.5]),
-                             np.array([-1.5, -1.5])]
-
-        assert_allclose(self.learn_alg.a_hat_history[0],
-                        correct_a_hat_history[0])
-        assert_allclose(self.learn_alg.h_history[0],
-                        correct_h_history[0])
-        assert_allclose(self.learn_alg.c_history[0],
-                        correct_c_history[0])
-        assert_allclose(self.learn_alg.a_hat_history[1],
-                        correct_a_hat_history[1])
-        assert_allclose(self.learn_alg.h_history[1],
-                        correct_h_history[1])
-        assert_allclose(self.learn_alg.c_history[1],
-                        correct_c_history[1])
+        correct_c_history = [np.array([-1.5, -1.5]),
+                             np.array([0.5, 0.5])]
+
+        indices = self.learn_alg.history_indices()
+        assert_allclose(self.learn_alg.a_hat_history[indices],
+                        correct_a_hat_history)
+        assert_allclose(self.learn_alg.phi_prime_history[indices],
+                        np.ones((2, 2)))
+        assert_allclose(self.learn_alg.c_history[indices],
+                        correct_c_history)
+
+        # A third step overwrites the oldest entry
+        self.learn_alg.update_learning_vars()
+        indices = self.learn_alg.history_indices()
+        assert_allclose(indices, [1, 0])
+        assert_allclose(self.learn_alg.c_history[indices],
+                        [np.array([-1.5, -1.5]), np.array([0.5, 0.5])])
 
     def test_get_rec_grads(self):
         self.learn_alg = Future_BPTT(self.rnn, T_truncation=2)
-        self.learn_alg.a_hat_history = [np.array([1, 1, 2, 2, 1])]
-        self.learn_alg.h_history = [np.array([1, 1])]
-        self.learn_alg.c_history = [np.array([1, 1])]
+        self.learn_alg.a_hat_history = np.array([[1, 1, 2, 2, 1]] * 2)
+        self.learn_alg.phi_prime_history = np.ones((2, 2))
+        self.learn_alg.c_history = np.array([[1, 1], [0, 0]])
+        self.learn_alg.n_history = 1
         rec_grads = self.learn_alg.get_rec_grads()
 
         correct_rec_grads = np.zeros((2, 5))
 
         assert_allclose(rec_grads, correct_rec_grads)
 
-        self.learn_alg.a_hat_history = [np.array([1, 1, 2, 2, 1])] * 2
-        self.learn_alg.h_history = [np.array([1, 1])] * 2
-        self.learn_alg.c_history = [np.array([1, 1]),
-                                    np.array([-0.5, -0.5])]
+        self.learn_alg.c_history = np.array([[1, 1], [-0.5, -0.5]])
+        self.learn_alg.i_oldest = 1
+        self.learn_alg.n_history = 2
 
         rec_grads = self.learn_alg.get_rec_grads()
 
@@ -589,6 +811,175 @@ class Test_Future_BPTT(unittest.TestCase):
                                       [-0.5, -0.5, -1, -1, -0.5]])
 
         assert_allclose(rec_grads, correct_rec_grads)
+        self.assertEqual(self.learn_alg.i_oldest, 0)
+        self.assertEqual(self.learn_alg.n_history, 1)
+
+    def test_jacobian_equivalence(self):
+        """Checks the credit assignment estimates against backpropagation
+        through explicitly formed Jacobians."""
+
+        np.random.seed(2)
+        rnn = RNN(np.random.normal(0, 1, (4, 2)),
+                  np.random.normal(0, 0.5, (4, 4)),
+                  np.random.normal(0, 1, (2, 4)),
+                  np.zeros(4), np.zeros(2),
+                  activation=tanh,
+                  alpha=0.6,
+                  output=softmax,
+                  loss=softmax_cross_entropy)
+        rnn.reset_network(h=np.random.normal(0, 1, 4))
+        learn_alg = Future_BPTT(rnn, T_truncation=3)
+
+        qs, Js = [], []
+        for _ in range(5):
+            rnn.next_state(np.random.normal(0, 1, 2))
+            rnn.error = np.random.normal(0, 1, 2)
+            learn_alg.update_learning_vars()
+            qs.append(np.copy(learn_alg.q))
+            Js.append(rnn.get_a_jacobian(update=False))
+
+        # c at time t is the sum of q at t' >= t times J(t') ... J(t + 1),
+        # for the last 3 time steps t
+        correct_c = []
+        for t in range(2, 5):
+            c = np.zeros(4)
+            for t_ in range(t, 5):
+                q = qs[t_]
+                for s in range(t_, t, -1):
+                    q = q.dot(Js[s])
+                c += q
+            correct_c.append(c)
+
+        indices = learn_alg.history_indices()
+        assert_allclose(learn_alg.c_history[indices], correct_c)
+
+
+class Test_Trial_BPTT(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        np.random.seed(5)
+        cls.n_in, cls.n_h, cls.n_out, cls.T = 2, 3, 2, 5
+        cls.rnn = RNN(np.random.normal(0, 1, (cls.n_h, cls.n_in)),
+                      np.random.normal(0, 1, (cls.n_h, cls.n_h)),
+                      np.random.normal(0, 1, (cls.n_out, cls.n_h)),
+                      np.random.normal(0, 0.1, cls.n_h),
+                      np.random.normal(0, 0.1, cls.n_out),
+                      activation=tanh, alpha=0.6, output=softmax,
+                      loss=softmax_cross_entropy)
+        cls.X = np.random.normal(0, 1, (cls.T, 2, cls.n_in))
+        cls.Y = np.eye(cls.n_out)[np.random.randint(cls.n_out, size=(cls.T,
+                                                                     2))]
+        cls.loss_mask = np.random.uniform(0, 1, (cls.T, 2))
+        cls.a_initial = np.random.normal(0, 1, (2, cls.n_h))
+
+    def trial_loss(self, X, Y, loss_mask, a_initial):
+        """Computes the masked loss of a trial by stepping the network."""
+
+        self.rnn.reset_network(a=a_initial)
+        loss = 0
+        for x, y, mask in zip(X, Y, loss_mask):
+            self.rnn.next_state(x)
+            self.rnn.z_out()
+            loss += mask * self.rnn.loss.f(self.rnn.z, y)
+        return loss
+
+    def test_finite_differences(self):
+        """Checks the gradient of a trial against finite differences of the
+        trial loss."""
+
+        X, Y = self.X[:, 0], self.Y[:, 0]
+        loss_mask, a_initial = self.loss_mask[:, 0], self.a_initial[0]
+        learn_alg = Trial_BPTT(self.rnn)
+        grads = learn_alg.get_trial_grads(X, Y, loss_mask=loss_mask,
+                                          a_initial=a_initial)
+        self.assertAlmostEqual(learn_alg.trial_loss,
+                               self.trial_loss(X, Y, loss_mask, a_initial))
+
+        eps = 1e-6
+        for param, grad in zip(self.rnn.params, grads):
+            for idx in np.ndindex(param.shape):
+                param[idx] += eps
+                loss_plus = self.trial_loss(X, Y, loss_mask, a_initial)
+                param[idx] -= 2 * eps
+                loss_minus = self.trial_loss(X, Y, loss_mask, a_initial)
+                param[idx] += eps
+                self.assertAlmostEqual(grad[idx],
+                                       (loss_plus - loss_minus) / (2 * eps),
+                                       places=6)
+
+    def test_batched_trials(self):
+        """Checks that the gradient of a batch of trials is the average of
+        those of the individual trials."""
+
+        learn_alg = Trial_BPTT(self.rnn)
+        grads = learn_alg.get_trial_grads(self.X, self.Y,
+                                          loss_mask=self.loss_mask,
+                                          a_initial=self.a_initial)
+        # Copied, since the gradient buffer is reused by the next call
+        grads = [np.copy(grad) for grad in grads]
+        a_final = np.copy(self.rnn.a)
+        batch_loss = learn_alg.trial_loss
+
+        correct_grads = [np.zeros_like(p) for p in self.rnn.params]
+        correct_loss = 0
+        for i in range(2):
+            grads_i = learn_alg.get_trial_grads(self.X[:, i], self.Y[:, i],
+                                                loss_mask=self.loss_mask[:, i],
+                                                a_initial=self.a_initial[i])
+            for correct_grad, grad_i in zip(correct_grads, grads_i):
+                correct_grad += grad_i / 2
+            correct_loss += learn_alg.trial_loss / 2
+
+        for grad, correct_grad in zip(grads, correct_grads):
+            assert_allclose(grad, correct_grad)
+        self.assertAlmostEqual(batch_loss, correct_loss)
+        assert_allclose(a_final, self.rnn.a)
+
+
+class Test_BPTT_Oracle(unittest.TestCase):
+
+    def test_rtrl_equivalence(self):
+        """Verifies that the oracle matches RTRL while the window covers the
+        whole history, also while W_rec is trained, and is only computed on
+        sampled time steps."""
+
+        n_h, n_in = 4, 2
+        rnn = make_random_rnn(n_h, n_in, seed=8)
+        rtrl = RTRL(rnn)
+        oracle = BPTT_Oracle(rnn, T_truncation=6, sample_interval=2)
+        for i_t in range(8):
+            if i_t == 4:
+                rtrl.reset_learning()
+                oracle.reset_learning()
+            rnn.next_state(np.random.normal(0, 1, n_in))
+            rnn.error = np.random.normal(0, 1, 2)
+            for learn_alg in [rtrl, oracle]:
+                learn_alg.update_learning_vars()
+                learn_alg()
+            self.assertEqual(oracle.sampled, i_t % 2 == 0)
+            if oracle.sampled:
+                assert_allclose(oracle.rec_grads, rtrl.rec_grads)
+            else:
+                assert_allclose(oracle.rec_grads, 0)
+            rnn.W_rec = rnn.W_rec - 0.5 * rtrl.rec_grads[:, :n_h]
+
+    def test_truncation(self):
+        """Verifies that only the last T_truncation time steps contribute."""
+
+        n_h, n_in = 3, 2
+        rnn = make_random_rnn(n_h, n_in, seed=9)
+        oracle = BPTT_Oracle(rnn, T_truncation=3)
+        rtrl = RTRL(rnn)
+        for i_t in range(5):
+            if i_t == 2:
+                rtrl.reset_learning()
+            rnn.next_state(np.random.normal(0, 1, n_in))
+            rnn.error = np.random.normal(0, 1, 2)
+            for learn_alg in [rtrl, oracle]:
+                learn_alg.update_learning_vars()
+                learn_alg()
+        assert_allclose(oracle.rec_grads, rtrl.rec_grads)
 
 
 class Test_Exact_Learning_Algorithms(unittest.TestCase):
@@ -725,15 +1116,15 @@ class Test_KeRNL(unittest.TestCase):
     def test_get_rec_grads(self):
         A = np.array([[1, 2],
                       [1, 2]])
-        B = np.array([[1, 2],
-                      [0, 2]])
+        B = np.array([[1, 2, 0, 0, 0],
+                      [0, 2, 0, 0, 0]])
         optimizer = Stochastic_Gradient_Descent(lr=1)
         self.learn_alg = KeRNL(self.rnn, optimizer, sigma_noise=1, A=A, B=B)
         self.learn_alg.q = np.array([0.5, 0.5])
         rec_grads = self.learn_alg.get_rec_grads()
 
-        correct_rec_grads = np.array([[1, 2],
-                                      [0, 4]])
+        correct_rec_grads = np.array([[1, 2, 0, 0, 0],
+                                      [0, 4, 0, 0, 0]])
 
         assert_allclose(rec_grads, correct_rec_grads)
 
@@ -3,8 +3,9 @@ import sys
 
 sys.path.append(os.path.abspath('..'))
 import unittest
+from copy import deepcopy
 import numpy as np
-from core import RNN
+from core import RNN, Population
 from numpy.testing import assert_allclose
 from functions import *
 
@@ -72,6 +73,28 @@ class Test_Network(unittest.TestCase):
         # Compare with update from next_state
         self.assertTrue(np.isclose(self.rnn.a, a).all())
 
+    def test_next_state_batched(self):
+        """Verifies that a batch of states advances exactly as each stream
+        would on its own."""
+
+        np.random.seed(0)
+        h = np.random.normal(0, 1, (3, self.rnn.n_h))
+        x = np.random.normal(0, 1, (3, self.rnn.n_in))
+        self.rnn.reset_network(h=h)
+        self.rnn.next_state(x)
+        self.rnn.z_out()
+        a_batch, z_batch = np.copy(self.rnn.a), np.copy(self.rnn.z)
+
+        for i in range(3):
+            self.rnn.reset_network(h=h[i])
+            self.rnn.next_state(x[i])
+            self.rnn.z_out()
+            assert_allclose(self.rnn.a, a_batch[i])
+            assert_allclose(self.rnn.z, z_batch[i])
+
+        self.rnn.reset_network(h=h[0], batch_size=3)
+        self.assertEqual(self.rnn.a.shape, (3, self.rnn.n_h))
+
     def test_z_out(self):
         """Verifies that z_out produces correct output in a special case."""
 
@@ -91,6 +114,126 @@ class Test_Network(unittest.TestCase):
         J = np.diag([0.6 * self.rnn.activation.f_prime(1) + 0.4] * self.rnn.n_h)
         self.assertTrue(np.isclose(J, self.rnn.a_J).all())
 
+    def test_jvp_vjp(self):
+        """Verifies that matrix-free Jacobian products and writing the
+        Jacobian into a buffer agree with the dense Jacobian."""
+
+        np.random.seed(0)
+        h = np.random.normal(0, 1, self.rnn.n_h)
+        W_rec = np.random.normal(0, 1, (self.rnn.n_h, self.rnn.n_h))
+        D = np.diag(self.rnn.activation.f_prime(h))
+        J = 0.6 * D.dot(W_rec) + 0.4 * np.eye(self.rnn.n_h)
+
+        out = np.zeros_like(J)
+        J_out = self.rnn.get_a_jacobian(update=False, out=out, h=h,
+                                        W_rec=W_rec)
+        self.assertIs(J_out, out)
+        assert_allclose(out, J)
+
+        for shape in [(self.rnn.n_h,), (self.rnn.n_h, 3)]:
+            v = np.random.normal(0, 1, shape)
+            assert_allclose(self.rnn.jvp(v, h=h, W_rec=W_rec), J.dot(v))
+            assert_allclose(self.rnn.vjp(v.T, h=h, W_rec=W_rec), v.T.dot(J))
+        assert_allclose(self.rnn.vjp(v.T, phi_prime=np.diag(D),
+                                     W_rec=W_rec), v.T.dot(J))
+
+        # Stack of matrices, e.g. several estimates of an influence matrix
+        v = np.random.normal(0, 1, (2, self.rnn.n_h, 3))
+        assert_allclose(self.rnn.jvp(v, h=h, W_rec=W_rec), np.matmul(J, v))
+
+    def test_cache(self):
+        """Verifies that cached derivative quantities are shared within a time
+        step and recomputed after the state changes."""
+
+        self.rnn.reset_network(h=np.ones(self.rnn.n_h))
+        self.rnn.next_state(np.ones(self.rnn.n_in))
+        a_hat = self.rnn.get_a_hat()
+        phi_prime = self.rnn.get_phi_prime()
+        self.rnn.get_a_jacobian()
+        a_J = self.rnn.a_J
+        self.assertIs(self.rnn.get_a_hat(), a_hat)
+        self.assertIs(self.rnn.get_phi_prime(), phi_prime)
+        self.rnn.get_a_jacobian()
+        self.assertIs(self.rnn.a_J, a_J)
+        assert_allclose(a_hat, np.concatenate([self.rnn.a_prev,
+                                               self.rnn.x, [1]]))
+        assert_allclose(phi_prime, self.rnn.activation.f_prime(self.rnn.h))
+
+        # Manual reassignment of h
+        self.rnn.h = np.zeros(self.rnn.n_h)
+        assert_allclose(self.rnn.get_phi_prime(), np.ones(self.rnn.n_h))
+        self.rnn.get_a_jacobian()
+        assert_allclose(self.rnn.a_J, np.eye(self.rnn.n_h))
+
+        # New time step, leaving the previous Jacobian untouched
+        a_J = self.rnn.a_J
+        self.rnn.next_state(np.zeros(self.rnn.n_in))
+        assert_allclose(self.rnn.get_a_hat(),
+                        np.concatenate([self.rnn.a_prev,
+                                        np.zeros(self.rnn.n_in), [1]]))
+        self.rnn.get_a_jacobian()
+        self.assertIsNot(self.rnn.a_J, a_J)
+        assert_allclose(a_J, np.eye(self.rnn.n_h))
+
+    def test_theta(self):
+        """Verifies that the parameters are views into theta, which survive
+        assignment and copying."""
+
+        W_rec = np.copy(self.rnn.W_rec)
+        self.assertEqual(self.rnn.theta.size, self.rnn.n_params)
+        for param in self.rnn.params:
+            self.assertTrue(np.shares_memory(param, self.rnn.theta))
+        assert_allclose(self.rnn.rec_params[:, :self.rnn.n_h], W_rec)
+
+        # Assignment copies into theta
+        view = self.rnn.W_rec
+        self.rnn.W_rec = 2 * W_rec
+        self.assertIs(self.rnn.W_rec, view)
+        assert_allclose(self.rnn.theta[:self.rnn.n_h], 2 * W_rec[0])
+        self.rnn.params = [p / 2 if i == 0 else p
+                           for i, p in enumerate(self.rnn.params)]
+        assert_allclose(self.rnn.W_rec, W_rec)
+
+        rnn = deepcopy(self.rnn)
+        rnn.theta *= 0
+        self.assertTrue(np.shares_memory(rnn.W_out, rnn.theta))
+        assert_allclose(rnn.W_out, 0)
+        assert_allclose(self.rnn.W_rec, W_rec)
+
+    def test_population(self):
+        """Verifies that a population advances and differentiates each member
+        exactly as the member would on its own."""
+
+        np.random.seed(0)
+        n_h, n_in = self.rnn.n_h, self.rnn.n_in
+        rnns = [RNN(np.random.normal(0, 1, (n_h, n_in)),
+                    np.random.normal(0, 1, (n_h, n_h)),
+                    self.rnn.W_out, self.rnn.b_rec, self.rnn.b_out,
+                    activation=tanh, alpha=0.6, output=softmax,
+                    loss=softmax_cross_entropy) for _ in range(3)]
+        population = Population(rnns)
+        self.assertEqual(population.W_rec.shape, (3, n_h, n_h))
+        self.assertEqual(population.theta.size, 3 * population.n_params)
+        self.assertTrue(np.shares_memory(population.W_out, population.theta))
+        x = np.random.normal(0, 1, n_in)
+        population.next_state(x)
+        population.z_out()
+        population.get_a_jacobian()
+        v = np.random.normal(0, 1, (3, n_h))
+        Jv, vJ = population.jvp(v), population.vjp(v)
+
+        for k, rnn in enumerate(rnns):
+            rnn.next_state(x)
+            rnn.z_out()
+            rnn.get_a_jacobian()
+            assert_allclose(population.a[k], rnn.a)
+            assert_allclose(population.z[k], rnn.z)
+            assert_allclose(population.get_a_hat()[k], rnn.get_a_hat())
+            assert_allclose(population.a_J[k], rnn.a_J)
+            assert_allclose(Jv[k], rnn.a_J.dot(v[k]))
+            assert_allclose(vJ[k], v[k].dot(rnn.a_J))
+            assert_allclose(population.get_member(k).W_in, rnn.W_in)
+
     def test_get_network_speed(self):
         self.rnn.reset_network(a=np.ones(self.rnn.n_h))
         correct_answer = 0.18 * np.square(np.tanh(2) - 1) * 8
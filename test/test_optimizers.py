@@ -55,5 +55,50 @@ class Test_SGD(unittest.TestCase):
         self.assertEqual(correct_lr, optimizer.lr)
 
 
+class Test_Step(unittest.TestCase):
+
+    def test_flat_step(self):
+        """Verifies that an in-place step on one flat array of parameters
+        matches the step on a list of parameters, for each optimizer."""
+
+        np.random.seed(0)
+        shapes = [(3, 2), (4,)]
+        theta = np.random.normal(0, 1, 10)
+        grads = [np.random.normal(0, 1, 10) for _ in range(3)]
+
+        def split(flat):
+            return [flat[:6].reshape(shapes[0]), flat[6:]]
+
+        for optimizer_class in [Stochastic_Gradient_Descent, SGD_Momentum,
+                                Adam]:
+            flat_optimizer = optimizer_class(lr=0.1, clip_norm=1)
+            list_optimizer = optimizer_class(lr=0.1, clip_norm=1)
+            flat_theta = np.copy(theta)
+            params = split(np.copy(theta))
+            for grad in grads:
+                flat_optimizer.step_(flat_theta, grad, split=split)
+                params = list_optimizer.get_updated_params(params,
+                                                           split(grad))
+
+            for param, flat_param in zip(params, split(flat_theta)):
+                self.assertTrue(np.allclose(param, flat_param))
+            for v, flat_v in zip(list_optimizer.vel, flat_optimizer.vel):
+                self.assertEqual(v.shape, flat_v.shape)
+                self.assertTrue(np.allclose(v, flat_v))
+
+    def test_adam(self):
+        """Verifies one Adam step against the update rule."""
+
+        optimizer = Adam(lr=0.1)
+        param = np.ones(2)
+        grad = np.array([1., -2.])
+        optimizer.step_([param], [grad])
+        m, v = 0.1 * grad, 0.001 * grad ** 2
+        lr_t = 0.1 * np.sqrt(1 - 0.999) / (1 - 0.9)
+        correct_param = 1 - lr_t * m / (np.sqrt(v) + 1e-8)
+
+        self.assertTrue(np.allclose(param, correct_param))
+
+
 if __name__ == '__main__':
     unittest.main()
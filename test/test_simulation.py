@@ -0,0 +1,531 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath('..'))
+import pickle
+import tempfile
+import unittest
+import numpy as np
+from numpy.testing import assert_allclose
+from core import RNN, Simulation, Monitor_Buffer, Checkpoint_Store
+from core import Run_Directory, save_run_directory
+from core import Population, Population_Simulation
+from core.Monitor_Buffer import parse_monitor_key
+from functions import *
+from gen_data import *
+from learning_algorithms import Only_Output_Weights, RTRL, UORO, RFLO
+from learning_algorithms import Efficient_BPTT, Population_RFLO
+from learning_algorithms import Population_UORO, Population_Efficient_BPTT
+from learning_algorithms import Trial_BPTT, BPTT_Oracle, Future_BPTT
+from optimizers import Stochastic_Gradient_Descent, Adam
+from utils import set_default_dtype, get_default_dtype
+
+
+class Test_Simulation(unittest.TestCase):
+    """Tests methods from the Simulation.py module."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Initializes a small random network and some Add Task data."""
+
+        np.random.seed(0)
+        cls.task = Add_Task(4, 6, deterministic=True, tau_task=1)
+        cls.data = cls.task.gen_data(100, 50)
+
+        n_in, n_h, n_out = cls.task.n_in, 8, cls.task.n_out
+        cls.W_in = np.random.normal(0, np.sqrt(1 / n_in), (n_h, n_in))
+        cls.W_rec = np.linalg.qr(np.random.normal(0, 1, (n_h, n_h)))[0]
+        cls.W_out = np.random.normal(0, np.sqrt(1 / n_h), (n_out, n_h))
+        cls.b_rec = np.zeros(n_h)
+        cls.b_out = np.zeros(n_out)
+
+    def get_rnn(self, W_rec=None):
+
+        if W_rec is None:
+            W_rec = self.W_rec
+        return RNN(self.W_in, W_rec, self.W_out, self.b_rec, self.b_out,
+                   activation=tanh,
+                   alpha=0.5,
+                   output=softmax,
+                   loss=softmax_cross_entropy)
+
+    def test_batched_test_run(self):
+        """Verifies that a batched test run matches running each stream
+        separately."""
+
+        n_batch = 3
+        X = np.stack([np.roll(self.data['test']['X'], i, axis=0)
+                      for i in range(n_batch)], axis=1)
+        Y = np.stack([np.roll(self.data['test']['Y'], i, axis=0)
+                      for i in range(n_batch)], axis=1)
+        a_initial = np.random.normal(0, 1, (n_batch, 8))
+        monitors = ['rnn.a', 'rnn.loss_']
+
+        sim = Simulation(self.get_rnn())
+        data = {'test': {'X': X, 'Y': Y, 'trial_switch': None,
+                         'loss_mask': None}}
+        sim.run(data, mode='test', monitors=monitors,
+                a_initial=a_initial, verbose=False)
+        self.assertEqual(sim.mons['rnn.a'].shape, (50, n_batch, 8))
+        self.assertEqual(sim.mons['rnn.loss_'].shape, (50, n_batch))
+
+        for i in range(n_batch):
+            sim_i = Simulation(self.get_rnn())
+            data_i = {'test': {'X': X[:, i], 'Y': Y[:, i],
+                               'trial_switch': None, 'loss_mask': None}}
+            sim_i.run(data_i, mode='test',
+                      monitors=monitors, a_initial=a_initial[i],
+                      verbose=False)
+            assert_allclose(sim.mons['rnn.a'][:, i], sim_i.mons['rnn.a'])
+            assert_allclose(sim.mons['rnn.loss_'][:, i],
+                            sim_i.mons['rnn.loss_'])
+
+    def test_fast_test_run(self):
+        """Verifies that the vectorized test path reproduces the time loop,
+        including trial resets, noise and loss masking."""
+
+        T = 50
+        trial_switch = np.zeros(T)
+        trial_switch[9::10] = 1
+        data = {'test': {'X': self.data['test']['X'],
+                         'Y': self.data['test']['Y'],
+                         'trial_switch': trial_switch, 'trial_type': None,
+                         'loss_mask': np.linspace(0, 1, T)}}
+        monitors = ['rnn.h', 'rnn.a', 'rnn.y_hat', 'rnn.loss_', 'rnn.error']
+
+        sims = []
+        for fast_test in [True, False]:
+            np.random.seed(1)
+            sim = Simulation(self.get_rnn(), reset_sigma=0.5)
+            sim.run(data, mode='test', monitors=monitors, sigma=0.1,
+                    fast_test=fast_test, verbose=False)
+            sims.append(sim)
+
+        for key in monitors:
+            assert_allclose(sims[0].mons[key], sims[1].mons[key])
+        assert_allclose(sims[0].rnn.a, sims[1].rnn.a)
+        assert_allclose(sims[0].rnn.a_prev, sims[1].rnn.a_prev)
+        self.assertEqual(sims[0].i_trial, sims[1].i_trial)
+
+    def test_memmap_monitors(self):
+        """Verifies that memory-mapped monitors hold the same values as
+        in-memory ones during training."""
+
+        mons = []
+        memmap_dir_ = tempfile.mkdtemp()
+        for memmap_dir in [None, memmap_dir_]:
+            np.random.seed(2)
+            rnn = self.get_rnn()
+            sim = Simulation(rnn)
+            sim.run(self.data, learn_alg=Only_Output_Weights(rnn),
+                    optimizer=Stochastic_Gradient_Descent(lr=0.01),
+                    monitors=['rnn.a', 'rnn.loss_'], verbose=False,
+                    monitor_memmap_dir=memmap_dir, monitor_memmap_min_bytes=0)
+            mons.append(sim.mons)
+
+        self.assertIsInstance(mons[1]['rnn.a'], np.memmap)
+        self.assertEqual(mons[1]['rnn.a'].shape, (100, 8))
+        for key in ['rnn.a', 'rnn.loss_']:
+            assert_allclose(mons[0][key], mons[1][key])
+        self.assertEqual(os.listdir(memmap_dir_), [])
+
+    def test_monitor_policies(self):
+        """Verifies that decimated and reduced monitors match the
+        corresponding reductions of full monitors, both during training and
+        in fast test runs."""
+
+        monitors = ['rnn.a', 'rnn.loss_', 'rnn.W_out-norm', 'rnn.a@every7',
+                    'rnn.loss_@mean10', 'rnn.loss_@welford30',
+                    'rnn.a@welford', 'rnn.W_out-norm@every3']
+        for mode in ['train', 'test']:
+            np.random.seed(3)
+            rnn = self.get_rnn()
+            sim = Simulation(rnn)
+            if mode == 'train':
+                sim.run(self.data, learn_alg=Only_Output_Weights(rnn),
+                        optimizer=Stochastic_Gradient_Descent(lr=0.01),
+                        monitors=monitors, verbose=False)
+            else:
+                sim.run(self.data, mode='test', verbose=False,
+                        monitors=monitors[:2] + monitors[3:-1])
+                self.assertNotIn('rnn.W_out-norm', sim.mons)
+            mons = sim.mons
+            n = len(mons['rnn.loss_'])
+
+            assert_allclose(mons['rnn.a@every7'], mons['rnn.a'][::7])
+            loss_windows = mons['rnn.loss_'][:n // 10 * 10].reshape(-1, 10)
+            assert_allclose(mons['rnn.loss_@mean10'], loss_windows.mean(1))
+            loss_windows = mons['rnn.loss_'][:n // 30 * 30].reshape(-1, 30)
+            assert_allclose(mons['rnn.loss_@welford30'],
+                            np.stack([loss_windows.mean(1),
+                                      loss_windows.var(1)], axis=1))
+            assert_allclose(mons['rnn.a@welford'],
+                            np.stack([mons['rnn.a'].mean(0),
+                                      mons['rnn.a'].var(0)]))
+            if mode == 'train':
+                assert_allclose(mons['rnn.W_out-norm@every3'],
+                                mons['rnn.W_out-norm'][::3])
+
+    def test_checkpoint_store(self):
+        """Verifies that checkpoints saved in a Checkpoint_Store rebuild the
+        same networks as deep-copied checkpoints."""
+
+        stores = [{}, Checkpoint_Store(),
+                  Checkpoint_Store(dtype=np.float32),
+                  Checkpoint_Store(delta=True, keyframe_interval=3,
+                                   capacity=2)]
+        for checkpoints in stores:
+            np.random.seed(4)
+            rnn = self.get_rnn()
+            sim = Simulation(rnn, checkpoints=checkpoints)
+            sim.run(self.data, learn_alg=Only_Output_Weights(rnn),
+                    optimizer=Stochastic_Gradient_Descent(lr=0.1),
+                    checkpoint_interval=10, verbose=False)
+            self.assertIs(sim.checkpoints, checkpoints)
+
+        reference = stores[0]
+        self.assertGreater(pickle.dumps(reference).__len__(),
+                           pickle.dumps(stores[1]).__len__())
+        for store, rtol in zip(stores[1:], [1e-7, 1e-6, 1e-7]):
+            store = pickle.loads(pickle.dumps(store))
+            self.assertEqual(sorted(store.keys()), sorted(reference.keys()))
+            for i_t in reference:
+                rnn_ref = reference[i_t]['rnn']
+                rnn = store[i_t]['rnn']
+                self.assertEqual(store[i_t]['i_t'], i_t)
+                for param_ref, param in zip(rnn_ref.params, rnn.params):
+                    assert_allclose(param, param_ref, rtol=rtol, atol=1e-7)
+                assert_allclose(rnn.a, rnn_ref.a)
+                self.assertEqual(rnn.alpha, rnn_ref.alpha)
+
+    def test_float32(self):
+        """Verifies that a default dtype of float32 propagates through the
+        data, network, learning algorithms and optimizers during training."""
+
+        set_default_dtype(np.float32)
+        try:
+            data = self.task.gen_data(50, 10)
+            for learn_alg, optimizer in [(RTRL, Adam),
+                                         (UORO, Stochastic_Gradient_Descent)]:
+                rnn = self.get_rnn()
+                learn_alg = learn_alg(rnn)
+                optimizer = optimizer(lr=0.001)
+                sim = Simulation(rnn, checkpoints=Checkpoint_Store())
+                sim.run(data, learn_alg=learn_alg, optimizer=optimizer,
+                        sigma=0.1, checkpoint_interval=10,
+                        monitors=['rnn.a'], verbose=False)
+
+                self.assertEqual(data['train']['X'].dtype, np.float32)
+                for param in rnn.params + [rnn.a, rnn.h]:
+                    self.assertEqual(param.dtype, np.float32)
+                self.assertEqual(sim.mons['rnn.a'].dtype, np.float32)
+                self.assertEqual(sim.checkpoints[10]['rnn'].W_rec.dtype,
+                                 np.float32)
+            self.assertEqual(learn_alg.B.dtype, np.float32)
+        finally:
+            set_default_dtype(np.float64)
+        self.assertEqual(get_default_dtype(), np.float64)
+
+    def test_run_directory(self):
+        """Verifies that a run saved as a directory reopens with the same
+        checkpoints, task and monitors."""
+
+        np.random.seed(5)
+        rnn = self.get_rnn()
+        sim = Simulation(rnn, checkpoints=Checkpoint_Store(delta=True))
+        sim.run(self.data, learn_alg=Only_Output_Weights(rnn),
+                optimizer=Stochastic_Gradient_Descent(lr=0.1),
+                checkpoint_interval=25, checkpoint_optimizer=True,
+                monitors=['rnn.loss_'], verbose=False)
+        path = os.path.join(tempfile.mkdtemp(), 'saved_run')
+        save_run_directory(path, sim, task=self.task)
+
+        run = Run_Directory(path)
+        self.assertEqual(list(run.keys()), sorted(sim.checkpoints.keys()))
+        self.assertIsNone(run.arrays)
+        for i_t in run:
+            checkpoint = run[i_t]
+            for param_ref, param in zip(sim.checkpoints[i_t]['rnn'].params,
+                                        checkpoint['rnn'].params):
+                assert_allclose(param, param_ref)
+            self.assertIn('optimizer', checkpoint)
+        self.assertIsInstance(run.arrays[0], np.memmap)
+        self.assertEqual(run.load_task().n_in, self.task.n_in)
+        assert_allclose(run.load_monitor('rnn.loss_'), sim.mons['rnn.loss_'])
+        with self.assertRaises(KeyError):
+            run[1]
+
+    def test_population(self):
+        """Verifies that training a population matches training each of its
+        members on its own, for each population learning algorithm."""
+
+        np.random.seed(6)
+        K, n_h = 3, 8
+        m = n_h + self.task.n_in + 1
+        W_recs = [self.W_rec + np.random.normal(0, 0.1, (n_h, n_h))
+                  for _ in range(K)]
+        A = np.random.normal(0, 1, (K, n_h))
+        B = np.random.normal(0, 1, (K, n_h, m))
+        nu = np.random.choice([-1, 1], (K, n_h)).astype(float)
+
+        def uoro(rnn, k=None):
+            if k is None:
+                learn_alg = Population_UORO(rnn, A=A, B=B)
+                learn_alg.sample_nu = lambda: nu
+            else:
+                learn_alg = UORO(rnn, A=A[k], B=B[k])
+                learn_alg.sample_nu = lambda: nu[k]
+            return learn_alg
+
+        algs = [(lambda rnn, k=None: RFLO(rnn, alpha=0.5),
+                 lambda rnn: Population_RFLO(rnn, alpha=0.5)),
+                (uoro, uoro),
+                (lambda rnn, k=None: Efficient_BPTT(rnn, 5, c_clip_norm=1),
+                 lambda rnn: Population_Efficient_BPTT(rnn, 5,
+                                                       c_clip_norm=1))]
+        for learn_alg, population_learn_alg in algs:
+            rnns = [self.get_rnn(W_rec) for W_rec in W_recs]
+            population = Population(rnns)
+            sim = Population_Simulation(population)
+            sim.run(self.data, learn_alg=population_learn_alg(population),
+                    optimizer=Adam(lr=0.01), monitors=['rnn.loss_'],
+                    verbose=False)
+            self.assertEqual(sim.mons['rnn.loss_'].shape, (100, K))
+
+            for k, rnn in enumerate(rnns):
+                sim_k = Simulation(rnn)
+                sim_k.run(self.data, learn_alg=learn_alg(rnn, k),
+                          optimizer=Adam(lr=0.01), monitors=['rnn.loss_'],
+                          verbose=False)
+                assert_allclose(sim.mons['rnn.loss_'][:, k],
+                                sim_k.mons['rnn.loss_'])
+                member = population.get_member(k)
+                for param, param_k in zip(member.params, rnn.params):
+                    assert_allclose(param, param_k)
+                assert_allclose(member.a, rnn.a)
+
+        test_sim = Population_Simulation(population)
+        test_sim.run(self.data, mode='test', monitors=['rnn.a'],
+                     verbose=False)
+        self.assertEqual(test_sim.mons['rnn.a'].shape, (50, K, n_h))
+        with self.assertRaises(ValueError):
+            sim.run(self.data, learn_alg=Population_RFLO(population, 0.5),
+                    optimizer=Adam(lr=0.01, clip_norm=1), verbose=False)
+
+    def test_accumulate_grads(self):
+        """Verifies that accumulated gradients are averaged over each update
+        interval, for output weights whose training leaves the network state
+        unchanged."""
+
+        data = {'train': {'X': self.data['train']['X'][:20],
+                          'Y': self.data['train']['Y'][:20],
+                          'trial_type': None, 'trial_switch': None,
+                          'loss_mask': None}}
+        a_initial = np.zeros(8)
+        sim = Simulation(self.get_rnn())
+        sim.run(data, learn_alg=Only_Output_Weights(sim.rnn),
+                optimizer=Stochastic_Gradient_Descent(lr=0.1),
+                update_interval=4, accumulate_grads='mean',
+                a_initial=a_initial, monitors=['rnn.a'], verbose=False)
+
+        rnn = self.get_rnn()
+        W_o = np.concatenate([rnn.W_out, rnn.b_out[:, np.newaxis]], axis=1)
+        grads, n_grads = 0, 0
+        for i_t in range(20):
+            a_ = np.append(sim.mons['rnn.a'][i_t], 1)
+            error = rnn.loss.f_prime(W_o.dot(a_), data['train']['Y'][i_t])
+            grads, n_grads = grads + np.multiply.outer(error, a_), n_grads + 1
+            if i_t % 4 == 0:
+                W_o -= 0.1 * grads / n_grads
+                grads, n_grads = 0, 0
+        assert_allclose(sim.rnn.out_params, W_o)
+
+        with self.assertRaises(ValueError):
+            sim.run(data, learn_alg=Only_Output_Weights(sim.rnn),
+                    optimizer=Stochastic_Gradient_Descent(lr=0.1),
+                    accumulate_grads='max', verbose=False)
+
+    def test_fresh_grads(self):
+        """Verifies that the optimizer state is kept across time steps whose
+        gradients are fresh arrays rather than views of a flat buffer."""
+
+        class Copying_RFLO(RFLO):
+
+            def __call__(self):
+                grads_list = super().__call__()
+                self.i_call = getattr(self, 'i_call', -1) + 1
+                if self.i_call % 2 == 0:
+                    return grads_list
+                return [np.copy(grad) for grad in grads_list]
+
+        data = {'train': {'X': self.data['train']['X'][:20],
+                          'Y': self.data['train']['Y'][:20],
+                          'trial_type': None, 'trial_switch': None,
+                          'loss_mask': None}}
+        params = []
+        for learn_alg_class in [RFLO, Copying_RFLO]:
+            sim = Simulation(self.get_rnn())
+            sim.run(data, learn_alg=learn_alg_class(sim.rnn, alpha=0.5),
+                    optimizer=Adam(lr=0.01), a_initial=np.zeros(8),
+                    verbose=False)
+            params.append(sim.rnn.theta)
+        assert_allclose(params[1], params[0])
+
+        with self.assertRaises(ValueError):
+            sim.optimizer.step_(sim.rnn.params, sim.grads_list)
+
+    def test_trial_loop(self):
+        """Verifies that training with an offline learning algorithm applies
+        one update per batch of equal-length trials, starting each trial
+        from a fresh random state."""
+
+        X, Y = self.data['train']['X'][:20], self.data['train']['Y'][:20]
+        trial_switch = np.zeros(20)
+        trial_switch[[0, 4, 8, 14]] = 1
+        data = {'train': {'X': X, 'Y': Y, 'trial_type': None,
+                          'trial_switch': trial_switch, 'loss_mask': None}}
+
+        np.random.seed(7)
+        sim = Simulation(self.get_rnn(), reset_sigma=0.5)
+        sim.run(data, learn_alg=Trial_BPTT(sim.rnn, trials_per_batch=3),
+                optimizer=Stochastic_Gradient_Descent(lr=0.1),
+                monitors=['rnn.loss_', 'learn_alg.trial_loss'],
+                verbose=False)
+        self.assertEqual(sim.i_trial, 4)
+        self.assertEqual(len(sim.mons['learn_alg.trial_loss']), 2)
+
+        # Trials of 4 steps are batched together, those of 6 steps as well
+        np.random.seed(7)
+        rnn = self.get_rnn()
+        learn_alg = Trial_BPTT(rnn)
+        optimizer = Stochastic_Gradient_Descent(lr=0.1)
+        for batch in [[0, 4], [8, 14]]:
+            a_initial = []
+            for i0 in batch:
+                rnn.reset_network(sigma=0.5)
+                a_initial.append(rnn.a)
+            T = batch[1] - batch[0]
+            i_steps = np.array([np.arange(i0, i0 + T) for i0 in batch]).T
+            grads = learn_alg.get_trial_grads(X[i_steps], Y[i_steps],
+                                              a_initial=np.array(a_initial))
+            rnn.params = optimizer.get_updated_params(rnn.params, grads)
+            rnn.W_rec, rnn.W_in, rnn.b_rec, rnn.W_out, rnn.b_out = rnn.params
+        for param, correct_param in zip(sim.rnn.params, rnn.params):
+            assert_allclose(param, correct_param)
+        assert_allclose(sim.rnn.a, rnn.a)
+
+        with self.assertRaises(ValueError):
+            data['train']['trial_switch'] = None
+            sim.run(data, learn_alg=Trial_BPTT(sim.rnn),
+                    optimizer=Stochastic_Gradient_Descent(lr=0.1),
+                    verbose=False)
+
+    def test_compare_algorithms(self):
+        """Verifies that a sampled BPTT_Oracle aligns with RTRL on the time
+        steps it is sampled, and that lagged algorithms are aligned with the
+        others at the time step of their gradients."""
+
+        rnn = self.get_rnn()
+        sim = Simulation(rnn)
+        comp_algs = [BPTT_Oracle(rnn, T_truncation=100, sample_interval=5),
+                     Future_BPTT(rnn, T_truncation=3)]
+        sim.run(self.data, learn_alg=RTRL(rnn),
+                optimizer=Stochastic_Gradient_Descent(lr=0.001),
+                comp_algs=comp_algs, monitors=['alignment_matrix'],
+                verbose=False)
+        alignment = sim.mons['alignment_matrix']
+        self.assertEqual(alignment.shape, (100, 3, 3))
+
+        # Gradients are compared 2 time steps late, at the lag of F-BPTT
+        sampled = (np.arange(100) - 2) % 5 == 0
+        sampled[:2] = False
+        self.assertTrue(np.isnan(alignment[~sampled]).all())
+        self.assertFalse(np.isnan(alignment[sampled]).any())
+        assert_allclose(alignment[sampled, 0, 1], 1, atol=1e-4)
+
+    def test_profiling(self):
+        """Verifies that a profiled run counts the calls of each phase, with
+        comparison algorithms broken down by name, and that runs are not
+        profiled by default."""
+
+        rnn = self.get_rnn()
+        sim = Simulation(rnn)
+        sim.run(self.data, learn_alg=Only_Output_Weights(rnn),
+                optimizer=Stochastic_Gradient_Descent(lr=0.001),
+                comp_algs=[RFLO(rnn, alpha=0.5)], update_interval=2,
+                monitors=['rnn.loss_'], profiling=True, verbose=False)
+        profile = sim.profile
+        for phase, calls in [('forward_pass', 100), ('learn_alg', 100),
+                             ('compare_algorithms', 100),
+                             ('compare_algorithms/RFLO', 100),
+                             ('optimizer', 50), ('update_monitors', 100),
+                             ('checkpoint_model', 1)]:
+            self.assertEqual(profile[phase]['calls'], calls)
+            self.assertGreater(profile[phase]['time'], 0)
+        self.assertGreaterEqual(profile['compare_algorithms']['time'],
+                                profile['compare_algorithms/RFLO']['time'])
+        self.assertIn('forward_pass', sim.profiler.summary())
+
+        sim.run(self.data, mode='test', verbose=False)
+        self.assertIsNone(sim.profile)
+
+
+class Test_Monitor_Buffer(unittest.TestCase):
+    """Tests methods from the Monitor_Buffer.py module."""
+
+    def test_append(self):
+        """Verifies that values are stored in a preallocated array, which
+        grows if needed."""
+
+        buffer = Monitor_Buffer(2)
+        for i in range(3):
+            buffer.append(np.ones(4) * i)
+
+        self.assertEqual(len(buffer), 3)
+        assert_allclose(buffer[-1], np.ones(4) * 2)
+        assert_allclose(buffer.array(), np.outer(np.arange(3), np.ones(4)))
+
+    def test_irregular_values(self):
+        """Verifies that values of changing shape fall back to a list."""
+
+        buffer = Monitor_Buffer(3)
+        buffer.append(np.zeros(2))
+        buffer.append(np.zeros(3))
+
+        self.assertIsInstance(buffer.array(), list)
+        self.assertEqual(len(buffer), 2)
+
+        # Ragged values, e.g. parameter lists, are copied
+        buffer = Monitor_Buffer(3)
+        params = [np.zeros(2), np.zeros(3)]
+        buffer.append(params)
+        params[0] += 1
+        buffer.append(params)
+        self.assertEqual(len(buffer), 2)
+        assert_allclose(buffer[0][0], 0)
+        assert_allclose(buffer[1][0], 1)
+
+    def test_policies(self):
+        """Verifies that appending values one at a time and extending by all
+        of them at once give the same result for each recording policy."""
+
+        values = np.random.normal(0, 1, (25, 3))
+        for key in ['x', 'x@every4', 'x@mean5', 'x@welford6', 'x@welford']:
+            _, policy, k = parse_monitor_key(key)
+            buffers = [Monitor_Buffer(25, policy=policy, k=k)
+                       for _ in range(3)]
+            for value in values:
+                buffers[0].append(value)
+            buffers[1].extend(values)
+            buffers[2].extend(values[:12])
+            buffers[2].extend(values[12:])
+            for buffer in buffers[1:]:
+                assert_allclose(buffer.array(), buffers[0].array())
+
+        self.assertEqual(buffers[0].array().shape, (2, 3))
+        with self.assertRaises(ValueError):
+            parse_monitor_key('x@mean')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -36,10 +36,10 @@ def classification_accuracy(data, y_hat):
 
     y_hat = np.array(y_hat)
 
-    i_label = np.argmax(data['test']['Y'], axis=1)
-    i_pred = np.argmax(y_hat, axis=1)
+    i_label = np.argmax(data['test']['Y'], axis=-1)
+    i_pred = np.argmax(y_hat, axis=-1)
 
-    acc = np.sum(i_label == i_pred) / len(i_label)
+    acc = np.mean(i_label == i_pred)
 
     return acc
 
@@ -1,4 +1,7 @@
 import itertools
+import os
+import tempfile
+import weakref
 from functools import reduce
 
 import numpy as np
@@ -79,3 +82,45 @@ def get_param_values_from_list_of_config_strings(key_iterable, root_name):
         param_values[k] = sorted(list(param_values[k]))
 
     return param_values, key_order
+
+
+default_dtype = np.float64
+
+
+def set_default_dtype(dtype):
+    """Sets the dtype used by default for network parameters and state,
+    learning algorithm and optimizer variables, and task data, e.g. np.float32
+    to halve their memory and bandwidth. Only affects objects created after
+    calling.
+
+    Args:
+        dtype (numpy dtype): The new default floating point dtype."""
+
+    global default_dtype
+    default_dtype = np.dtype(dtype).type
+
+
+def get_default_dtype():
+    """Returns the default floating point dtype set by set_default_dtype."""
+
+    return default_dtype
+
+
+def temporary_memmap(shape, dtype, dir=None, prefix='tmp_'):
+    """Creates a zero-initialized np.memmap of given shape and dtype, backed
+    by a temporary file in dir that does not outlive the array.
+
+    The file is removed from dir as soon as it is mapped, which on POSIX
+    systems keeps the mapping valid until the array is garbage collected.
+    Where an open file cannot be removed, it is removed once the array is
+    garbage collected instead."""
+
+    fd, path = tempfile.mkstemp(suffix='.dat', dir=dir, prefix=prefix)
+    os.close(fd)
+    array = np.memmap(path, dtype=dtype, mode='w+', shape=shape)
+    try:
+        os.remove(path)
+    except OSError:
+        weakref.finalize(array, os.remove, path)
+
+    return array
@@ -1,6 +1,7 @@
 import pickle
 from math import ceil
 
+from core import Run_Directory
 from dynamics import *
 
 
@@ -28,18 +29,29 @@ def analyze_training_run(saved_run_name, FP_args, test_args, graph_args,
     else:
         saved_runs_dir = os.path.join(notebook_dir, 'saved_runs')
 
-    with open(os.path.join(saved_runs_dir, saved_run_name), 'rb') as f:
-        saved_run = pickle.load(f)
+    # Saved runs in the run directory format are opened without loading any
+    # checkpoints; pickled runs are loaded whole.
+    saved_run_path = os.path.join(saved_runs_dir, saved_run_name)
+    if os.path.isdir(saved_run_path):
+        checkpoints = Run_Directory(saved_run_path)
+        task = checkpoints.load_task()
+        indices = checkpoints.indices
+    else:
+        with open(saved_run_path, 'rb') as f:
+            saved_run = pickle.load(f)
+
+        sim = saved_run['sim']
+        task = saved_run['task']
+        checkpoints = sim.checkpoints
 
-    sim = saved_run['sim']
-    task = saved_run['task']
+        if type(sim.checkpoint_interval) is int:
+            indices = list(range(0, sim.total_time_steps,
+                                 sim.checkpoint_interval))
+        elif type(sim.checkpoint_interval) is list:
+            indices = sim.checkpoint_interval
 
     ### --- Determine which checkpoints to analyze for this job id --- ###
 
-    if type(sim.checkpoint_interval) is int:
-        indices = list(range(0, sim.total_time_steps, sim.checkpoint_interval))
-    elif type(sim.checkpoint_interval) is list:
-        indices = sim.checkpoint_interval
     n_checkpoints = len(indices)
     if n_checkpoints_per_job_ is None:
         n_checkpoints_per_job = ceil(n_checkpoints / 1000)
@@ -47,7 +59,7 @@ def analyze_training_run(saved_run_name, FP_args, test_args, graph_args,
         n_checkpoints_per_job = n_checkpoints_per_job_
     i_job = int(os.environ['SLURM_ARRAY_TASK_ID']) - 1
     i_index_start = n_checkpoints_per_job * i_job
-    i_index_end = n_checkpoints_per_job * (i_job + 1)
+    i_index_end = min(n_checkpoints_per_job * (i_job + 1), n_checkpoints)
 
     ### --- Analyze each checkpoint --- ###
 
@@ -62,7 +74,7 @@ def analyze_training_run(saved_run_name, FP_args, test_args, graph_args,
             f.write('Analyzing chekpoint {}\n'.format(i_checkpoint))
 
         try:
-            checkpoint = sim.checkpoints[i_checkpoint]
+            checkpoint = checkpoints[i_checkpoint]
         except KeyError:
             continue
 
@@ -1,6 +1,7 @@
 import pickle
 
 from cluster import unpack_analysis_results
+from core import Run_Directory
 from dynamics import *
 
 
@@ -41,9 +42,12 @@ def compare_analyzed_checkpoints(analysis_job_name,
     else:
         saved_runs_dir = os.path.join(notebook_dir, 'saved_runs')
     saved_run_path = os.path.join(saved_runs_dir, saved_run_name)
-    with open(saved_run_path, 'rb') as f:
-        saved_run = pickle.load(f)
-    task = saved_run['task']
+    if os.path.isdir(saved_run_path):  # Run directory
+        task = Run_Directory(saved_run_path).load_task()
+    else:
+        with open(saved_run_path, 'rb') as f:
+            saved_run = pickle.load(f)
+        task = saved_run['task']
 
     compare_job_name = 'compare_{}'.format(saved_run_name)
     log_path = os.path.join(project_dir, 'logs/' + compare_job_name) + '.log'
@@ -4,6 +4,7 @@ from math import ceil
 from scipy import sparse
 
 from cluster import unpack_analysis_results
+from core import Run_Directory
 from dynamics import *
 
 
@@ -62,9 +63,12 @@ def cross_compare_analyzed_checkpoints(saved_run_root_name,
 
         saved_run_name = analysis_job_name.split('analyze_')[-1]
         saved_run_path = os.path.join(saved_runs_dir, saved_run_name)
-        with open(saved_run_path, 'rb') as f:
-            saved_run = pickle.load(f)
-        task = saved_run['task']
+        if os.path.isdir(saved_run_path):  # Run directory
+            task = Run_Directory(saved_run_path).load_task()
+        else:
+            with open(saved_run_path, 'rb') as f:
+                saved_run = pickle.load(f)
+            task = saved_run['task']
 
         compare_job_name = 'compare_{}'.format(saved_run_name)
         log_path = os.path.join(project_dir, 'logs/' + compare_job_name) + '.log'
@@ -1,3 +1,4 @@
+import json
 import os
 import pickle
 from math import ceil
@@ -53,14 +54,21 @@ def cross_topological_analysis(saved_run_root_name,
 
             ### --- Calculate number of total jobs needed for analysis --- ###
 
-            with open(os.path.join('saved_runs', saved_run_name), 'rb') as f:
-                saved_run = pickle.load(f)
-
-            sim = saved_run['sim']
-            if type(sim.checkpoint_interval) is int:
-                indices = list(range(0, sim.total_time_steps, sim.checkpoint_interval))
-            elif type(sim.checkpoint_interval) is list:
-                indices = sim.checkpoint_interval
+            saved_run_path = os.path.join('saved_runs', saved_run_name)
+            if os.path.isdir(saved_run_path):  # Run directory
+                with open(os.path.join(saved_run_path, 'manifest.json'),
+                          'r') as f:
+                    indices = json.load(f)['indices']
+            else:
+                with open(saved_run_path, 'rb') as f:
+                    saved_run = pickle.load(f)
+
+                sim = saved_run['sim']
+                if type(sim.checkpoint_interval) is int:
+                    indices = list(range(0, sim.total_time_steps,
+                                         sim.checkpoint_interval))
+                elif type(sim.checkpoint_interval) is list:
+                    indices = sim.checkpoint_interval
             n_checkpoints = len(indices)
             if n_checkpoints_per_job_ is None:
                 n_checkpoints_per_job = ceil(n_checkpoints / 1000)